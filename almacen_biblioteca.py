@@ -0,0 +1,429 @@
+"""
+Almacenes de la biblioteca de exámenes: dónde se guardan, listan, cargan y eliminan.
+
+Todos comparten la interfaz de AlmacenBiblioteca y el mismo modelo de datos: cada examen tiene
+una ruta "biblioteca/<nombre>.json", el SHA del blob de git de su JSON y una entrada de índice
+(entrada_indice de indice_biblioteca.py) con sus metadatos.
+
+    - AlmacenGithub: la carpeta biblioteca/ de un repositorio (cliente compartido de
+      cliente_github, caché de cache_github e índice biblioteca/index.json).
+    - AlmacenLocal: la misma estructura biblioteca/*.json + index.json en una carpeta del disco
+      (la que genera ingesta_lote.py), sin ninguna petición de red.
+    - AlmacenSQLite: una base de datos SQLite con los metadatos en columnas indexadas y el JSON
+      de cada examen.
+
+crear_almacen elige el almacén con BIBLIOTECA_BACKEND ("github", "local" o "sqlite") y sus
+parámetros (BIBLIOTECA_DIRECTORIO, BIBLIOTECA_SQLITE, GITHUB_TOKEN, REPO_NAME; con GitHub,
+BIBLIOTECA_ESPEJO_DIR y BIBLIOTECA_ESPEJO_MAX_MB para el espejo en disco de espejo_blobs,
+0 lo desactiva). Los exámenes
+se escriben en el formato FORMATO_EXAMENES ("clasico", por defecto, o "columnar", ver examenes.py),
+comprimidos con gzip si COMPRIMIR_EXAMENES está activado; se leen en cualquier formato.
+"""
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from cache_github import TTL_CACHE_GITHUB, abrir_blob, configurar_espejo, leer_blobs
+from cliente_github import obtener_repositorio
+from espejo_blobs import DIRECTORIO_ESPEJO_POR_DEFECTO, MAX_BYTES_ESPEJO_POR_DEFECTO
+from examenes import (
+    CARPETA_BIBLIOTECA,
+    FORMATO_EXAMEN_POR_DEFECTO,
+    FORMATOS_EXAMEN,
+    nombre_archivo_examen,
+    codificar_examen,
+    decodificar_examen,
+    decodificar_examen_flujo,
+)
+from indice_biblioteca import (
+    NOMBRE_INDICE,
+    cargar_indice,
+    entrada_indice,
+    poner_entrada,
+    quitar_entrada,
+    examenes_del_indice,
+    serializar_indice,
+    sha_blob_git,
+    leer_indice_github,
+    reconstruir_indice_github,
+    reconstruir_indice_local,
+)
+from publicacion_github import eliminar_examen_github, publicar_examenes_github
+
+
+BACKENDS_BIBLIOTECA = ("github", "local", "sqlite")
+BACKEND_POR_DEFECTO = "github"
+RUTA_SQLITE_POR_DEFECTO = "biblioteca.db"
+
+
+class AlmacenBiblioteca(ABC):
+    """
+    Interfaz común de los almacenes. Los métodos lanzan excepciones en caso de error
+    (FileNotFoundError si el examen no existe); la app las convierte en mensajes.
+    Un almacén que no implementa todos los métodos abstractos falla al crearlo.
+    """
+    
+    # Formato en el que se escriben los exámenes (codificar_examen)
+    formato = FORMATO_EXAMEN_POR_DEFECTO
+    comprimir = False
+    
+    def _codificar(self, examen_data: Dict) -> bytes:
+        return codificar_examen(examen_data, self.formato, self.comprimir)
+    
+    def _preparar(self, examenes_data: List[Dict], nombres: Optional[List[str]] = None) -> List[tuple[Dict, bytes]]:
+        """(entrada de índice, contenido codificado) de cada examen a publicar."""
+        if nombres is None:
+            nombres = [f"{nombre_archivo_examen(examen_data['titulo'])}.json" for examen_data in examenes_data]
+        preparados = []
+        for nombre_archivo, examen_data in zip(nombres, examenes_data):
+            contenido = self._codificar(examen_data)
+            entrada = entrada_indice(nombre_archivo, f"{CARPETA_BIBLIOTECA}/{nombre_archivo}",
+                                     sha_blob_git(contenido), examen_data)
+            preparados.append((entrada, contenido))
+        return preparados
+    
+    @abstractmethod
+    def descripcion(self) -> str:
+        """Texto para mostrar dónde está la biblioteca."""
+    
+    @abstractmethod
+    def listar(self) -> List[Dict]:
+        """Entradas de índice de todos los exámenes, más recientes primero."""
+    
+    @abstractmethod
+    def cargar(self, ruta: str, sha: Optional[str] = None) -> Dict:
+        """JSON completo de un examen (sha, si se conoce, permite servirlo de caché)."""
+    
+    def cargar_varios(self, examenes: List[tuple[str, Optional[str]]]) -> List[Any]:
+        """
+        cargar de varios (ruta, sha). Retorna en el mismo orden el JSON de cada examen o la
+        excepción con la que falló, sin que un fallo interrumpa a los demás.
+        """
+        resultados = []
+        for ruta, sha in examenes:
+            try:
+                resultados.append(self.cargar(ruta, sha))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+    
+    def guardar(self, examen_data: Dict) -> Dict:
+        """Guarda (o reemplaza) un examen de construir_examen y retorna su entrada de índice."""
+        return self.publicar_lote([examen_data])[0]
+    
+    @abstractmethod
+    def publicar_lote(self, examenes_data: List[Dict], nombres: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Guarda varios exámenes en una sola operación (un commit en GitHub, una transacción en
+        SQLite) con el índice actualizado una vez. nombres son los nombres de archivo
+        ("<nombre>.json"); por defecto salen del título. Retorna sus entradas de índice.
+        """
+    
+    @abstractmethod
+    def eliminar(self, ruta: str, sha: Optional[str] = None):
+        """Elimina un examen; si se da sha y el examen cambió desde entonces, falla."""
+    
+    @abstractmethod
+    def reconstruir_indice(self) -> int:
+        """Regenera el índice desde los exámenes guardados y retorna cuántos hay."""
+
+
+class AlmacenGithub(AlmacenBiblioteca):
+    """Carpeta biblioteca/ de un repositorio de GitHub."""
+    
+    def __init__(self, token: str, nombre_repo: str, ttl: float = TTL_CACHE_GITHUB):
+        self.token = token
+        self.nombre_repo = nombre_repo
+        self.ttl = ttl
+    
+    @property
+    def repo(self):
+        # Cliente compartido por el proceso: no hay petición salvo la primera vez
+        return obtener_repositorio(self.token, self.nombre_repo)
+    
+    def descripcion(self) -> str:
+        return f"GitHub ({self.nombre_repo})"
+    
+    def listar(self) -> List[Dict]:
+        repo = self.repo
+        indice, _ = leer_indice_github(repo, self.ttl)
+        if indice is None:
+            # Listar no escribe: el índice se construye en memoria desde la carpeta (los
+            # exámenes quedan en la caché de blobs, así que repetirlo no vuelve a descargarlos)
+            indice, _ = reconstruir_indice_github(repo, escribir=False)
+        return examenes_del_indice(indice)
+    
+    def cargar(self, ruta: str, sha: Optional[str] = None) -> Dict:
+        # Por trozos: los exámenes grandes se interpretan mientras se descargan
+        trozos, _ = abrir_blob(self.repo, ruta, sha)
+        return decodificar_examen_flujo(trozos)
+    
+    def cargar_varios(self, examenes: List[tuple[str, Optional[str]]]) -> List[Any]:
+        resultados = leer_blobs(self.repo, examenes, procesar=decodificar_examen_flujo)
+        return [resultado if isinstance(resultado, Exception) else resultado[0] for resultado in resultados]
+    
+    def publicar_lote(self, examenes_data: List[Dict], nombres: Optional[List[str]] = None) -> List[Dict]:
+        # Exámenes e índice en un único commit (API de datos de git), sin leer antes cada archivo
+        preparados = self._preparar(examenes_data, nombres)
+        return publicar_examenes_github(self.repo, [(entrada['nombre_archivo'], contenido, examen_data)
+                                                    for (entrada, contenido), examen_data
+                                                    in zip(preparados, examenes_data)])
+    
+    def eliminar(self, ruta: str, sha: Optional[str] = None):
+        # Examen e índice en un único commit: no puede quedar uno actualizado y el otro no
+        eliminar_examen_github(self.repo, ruta, sha)
+    
+    def reconstruir_indice(self) -> int:
+        indice, _ = reconstruir_indice_github(self.repo)
+        return len(indice['examenes'])
+
+
+class AlmacenLocal(AlmacenBiblioteca):
+    """
+    Carpeta del disco con la estructura de biblioteca/ (exámenes JSON + index.json).
+    El índice leído se guarda en memoria mientras index.json no cambie (mismo mtime y tamaño).
+    """
+    
+    def __init__(self, directorio: str = CARPETA_BIBLIOTECA):
+        self.directorio = directorio
+        self._cerrojo = threading.Lock()
+        self._indice = None
+        self._firma_indice = None
+    
+    def descripcion(self) -> str:
+        return f"carpeta local ({os.path.abspath(self.directorio)})"
+    
+    def _ruta_local(self, ruta: str) -> str:
+        # Las rutas son "biblioteca/<nombre>.json" como en GitHub: solo cuenta el nombre
+        return os.path.join(self.directorio, os.path.basename(ruta))
+    
+    def _leer_indice(self) -> Dict:
+        ruta_indice = os.path.join(self.directorio, NOMBRE_INDICE)
+        try:
+            info = os.stat(ruta_indice)
+            firma = (info.st_mtime_ns, info.st_size)
+            if self._indice is not None and firma == self._firma_indice:
+                return self._indice
+            with open(ruta_indice, encoding="utf-8") as f:
+                indice = cargar_indice(f.read())
+        except (OSError, ValueError):
+            # Sin índice (o ilegible): construirlo desde la carpeta
+            os.makedirs(self.directorio, exist_ok=True)
+            indice, _ = reconstruir_indice_local(self.directorio)
+            info = os.stat(ruta_indice)
+            firma = (info.st_mtime_ns, info.st_size)
+        self._indice, self._firma_indice = indice, firma
+        return indice
+    
+    def _escribir(self, ruta: str, contenido: bytes):
+        ruta_temporal = ruta + ".tmp"
+        with open(ruta_temporal, "wb") as f:
+            f.write(contenido)
+        os.replace(ruta_temporal, ruta)
+    
+    def listar(self) -> List[Dict]:
+        with self._cerrojo:
+            return examenes_del_indice(self._leer_indice())
+    
+    def cargar(self, ruta: str, sha: Optional[str] = None) -> Dict:
+        with open(self._ruta_local(ruta), "rb") as f:
+            return decodificar_examen(f.read())
+    
+    def publicar_lote(self, examenes_data: List[Dict], nombres: Optional[List[str]] = None) -> List[Dict]:
+        preparados = self._preparar(examenes_data, nombres)
+        with self._cerrojo:
+            os.makedirs(self.directorio, exist_ok=True)
+            indice = self._leer_indice()
+            for entrada, contenido in preparados:
+                self._escribir(os.path.join(self.directorio, entrada['nombre_archivo']), contenido)
+                poner_entrada(indice, entrada)
+            # El índice se escribe una sola vez para todo el lote
+            self._escribir(os.path.join(self.directorio, NOMBRE_INDICE), serializar_indice(indice).encode('utf-8'))
+        return [entrada for entrada, _ in preparados]
+    
+    def eliminar(self, ruta: str, sha: Optional[str] = None):
+        ruta_local = self._ruta_local(ruta)
+        with self._cerrojo:
+            if sha is not None:
+                with open(ruta_local, "rb") as f:
+                    if sha_blob_git(f.read()) != sha:
+                        raise ValueError(f"{ruta} cambió desde que se listó")
+            os.remove(ruta_local)
+            self._escribir(os.path.join(self.directorio, NOMBRE_INDICE),
+                           serializar_indice(quitar_entrada(self._leer_indice(), os.path.basename(ruta))).encode('utf-8'))
+    
+    def reconstruir_indice(self) -> int:
+        with self._cerrojo:
+            os.makedirs(self.directorio, exist_ok=True)
+            indice, _ = reconstruir_indice_local(self.directorio)
+            self._indice = None
+            return len(indice['examenes'])
+
+
+class AlmacenSQLite(AlmacenBiblioteca):
+    """
+    Base de datos SQLite: metadatos en columnas (con índice por fecha para listar) y el JSON
+    del examen tal y como se guardaría en biblioteca/. Una conexión por hilo, en modo WAL para
+    que varias sesiones y procesos lean mientras otro escribe. El listado se guarda en memoria
+    mientras no haya escrituras (de este proceso o, según PRAGMA data_version, de otros).
+    """
+    
+    def __init__(self, ruta_db: str = RUTA_SQLITE_POR_DEFECTO):
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+        self._escrituras = 0
+        with self._conexion() as conexion:
+            conexion.executescript("""
+                CREATE TABLE IF NOT EXISTS examenes (
+                    nombre_archivo TEXT PRIMARY KEY,
+                    titulo TEXT NOT NULL,
+                    descripcion TEXT NOT NULL,
+                    fecha_creacion TEXT NOT NULL,
+                    num_preguntas INTEGER NOT NULL,
+                    sha TEXT NOT NULL,
+                    contenido BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_examenes_fecha ON examenes (fecha_creacion DESC);
+            """)
+    
+    def _conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            directorio = os.path.dirname(os.path.abspath(self.ruta_db))
+            os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.ruta_db, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+    
+    def descripcion(self) -> str:
+        return f"SQLite ({os.path.abspath(self.ruta_db)})"
+    
+    def listar(self) -> List[Dict]:
+        conexion = self._conexion()
+        # data_version cambia cuando otra conexión escribe; las de este proceso cuentan en _escrituras
+        version = (conexion.execute("PRAGMA data_version").fetchone()[0], self._escrituras)
+        if getattr(self._local, 'version_listado', None) != version:
+            self._local.listado = self._leer_listado(conexion)
+            self._local.version_listado = version
+        return [dict(entrada) for entrada in self._local.listado]
+    
+    def _leer_listado(self, conexion: sqlite3.Connection) -> List[Dict]:
+        filas = conexion.execute(
+            "SELECT nombre_archivo, sha, titulo, descripcion, fecha_creacion, num_preguntas "
+            "FROM examenes ORDER BY fecha_creacion DESC"
+        ).fetchall()
+        return [{
+            'nombre_archivo': nombre,
+            'ruta': f"{CARPETA_BIBLIOTECA}/{nombre}",
+            'sha': sha,
+            'titulo': titulo,
+            'descripcion': descripcion,
+            'fecha_creacion': fecha,
+            'num_preguntas': num_preguntas
+        } for nombre, sha, titulo, descripcion, fecha, num_preguntas in filas]
+    
+    def cargar(self, ruta: str, sha: Optional[str] = None) -> Dict:
+        fila = self._conexion().execute(
+            "SELECT contenido FROM examenes WHERE nombre_archivo = ?", (os.path.basename(ruta),)
+        ).fetchone()
+        if fila is None:
+            raise FileNotFoundError(ruta)
+        return decodificar_examen(fila[0])
+    
+    def _fila(self, entrada: Dict, contenido: bytes) -> tuple:
+        return (entrada['nombre_archivo'], entrada['titulo'], entrada['descripcion'], entrada['fecha_creacion'],
+                entrada['num_preguntas'], entrada['sha'], contenido)
+    
+    def publicar_lote(self, examenes_data: List[Dict], nombres: Optional[List[str]] = None) -> List[Dict]:
+        preparados = self._preparar(examenes_data, nombres)
+        # Una sola transacción: o se guardan todos o ninguno
+        with self._conexion() as conexion:
+            conexion.executemany("INSERT OR REPLACE INTO examenes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [self._fila(entrada, contenido) for entrada, contenido in preparados])
+        self._escrituras += 1
+        return [entrada for entrada, _ in preparados]
+    
+    def eliminar(self, ruta: str, sha: Optional[str] = None):
+        nombre_archivo = os.path.basename(ruta)
+        with self._conexion() as conexion:
+            if sha is None:
+                cursor = conexion.execute("DELETE FROM examenes WHERE nombre_archivo = ?", (nombre_archivo,))
+            else:
+                cursor = conexion.execute("DELETE FROM examenes WHERE nombre_archivo = ? AND sha = ?",
+                                          (nombre_archivo, sha))
+        self._escrituras += 1
+        if cursor.rowcount == 0:
+            raise FileNotFoundError(f"{ruta} no existe o cambió desde que se listó")
+    
+    def reconstruir_indice(self) -> int:
+        """Recalcula las columnas de metadatos y el SHA desde el JSON guardado de cada examen."""
+        conexion = self._conexion()
+        filas = conexion.execute("SELECT nombre_archivo, contenido FROM examenes").fetchall()
+        with conexion:
+            for nombre_archivo, contenido in filas:
+                entrada = entrada_indice(nombre_archivo, f"{CARPETA_BIBLIOTECA}/{nombre_archivo}",
+                                         sha_blob_git(contenido), decodificar_examen(contenido))
+                conexion.execute("INSERT OR REPLACE INTO examenes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 self._fila(entrada, contenido))
+        self._escrituras += 1
+        return len(filas)
+
+
+# Los almacenes locales se reutilizan entre reruns y sesiones (conexiones SQLite, índice leído)
+_cerrojo_almacenes = threading.Lock()
+_almacenes: Dict[tuple, AlmacenBiblioteca] = {}
+
+
+def crear_almacen(configuracion: Callable[[str, Any], Any]) -> AlmacenBiblioteca:
+    """
+    Crea el almacén configurado. configuracion(clave, por_defecto) lee los parámetros
+    (obtener_configuracion en la app, os.environ.get en scripts).
+    Lanza ValueError si el backend no existe o le falta configuración.
+    """
+    backend = str(configuracion("BIBLIOTECA_BACKEND", BACKEND_POR_DEFECTO)).strip().lower()
+    if backend == "github":
+        token = configuracion("GITHUB_TOKEN", None)
+        nombre_repo = configuracion("REPO_NAME", None)
+        if not token or not nombre_repo:
+            raise ValueError("Configuración incompleta: GITHUB_TOKEN o REPO_NAME no están definidos")
+        try:
+            ttl = max(0.0, float(configuracion("GITHUB_CACHE_TTL", TTL_CACHE_GITHUB)))
+        except (TypeError, ValueError):
+            ttl = float(TTL_CACHE_GITHUB)
+        try:
+            max_bytes_espejo = int(float(configuracion("BIBLIOTECA_ESPEJO_MAX_MB", None)) * 1024 * 1024)
+        except (TypeError, ValueError):
+            max_bytes_espejo = MAX_BYTES_ESPEJO_POR_DEFECTO
+        configurar_espejo(str(configuracion("BIBLIOTECA_ESPEJO_DIR", DIRECTORIO_ESPEJO_POR_DEFECTO)), max_bytes_espejo)
+        almacen = AlmacenGithub(token, nombre_repo, ttl)
+        _configurar_formato(almacen, configuracion)
+        return almacen
+    
+    if backend == "local":
+        clave = (backend, os.path.abspath(str(configuracion("BIBLIOTECA_DIRECTORIO", CARPETA_BIBLIOTECA))))
+        fabrica = AlmacenLocal
+    elif backend == "sqlite":
+        clave = (backend, os.path.abspath(str(configuracion("BIBLIOTECA_SQLITE", RUTA_SQLITE_POR_DEFECTO))))
+        fabrica = AlmacenSQLite
+    else:
+        raise ValueError(f"BIBLIOTECA_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS_BIBLIOTECA)})")
+    
+    with _cerrojo_almacenes:
+        if clave not in _almacenes:
+            _almacenes[clave] = fabrica(clave[1])
+        almacen = _almacenes[clave]
+    _configurar_formato(almacen, configuracion)
+    return almacen
+
+
+def _configurar_formato(almacen: AlmacenBiblioteca, configuracion: Callable[[str, Any], Any]):
+    """Aplica FORMATO_EXAMENES y COMPRIMIR_EXAMENES (ValueError si el formato no existe)."""
+    formato = str(configuracion("FORMATO_EXAMENES", FORMATO_EXAMEN_POR_DEFECTO)).strip().lower()
+    if formato not in FORMATOS_EXAMEN:
+        raise ValueError(f"FORMATO_EXAMENES desconocido: {formato} (opciones: {', '.join(FORMATOS_EXAMEN)})")
+    almacen.formato = formato
+    almacen.comprimir = str(configuracion("COMPRIMIR_EXAMENES", "")).strip().lower() in ("1", "true", "si", "sí")
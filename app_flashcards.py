@@ -1,15 +1,34 @@
 import streamlit as st
-import fitz  # PyMuPDF
 import re
 from typing import List, Dict, Optional
-import io
 import json
 from datetime import datetime
 import os
-import base64
 import random
-from github import Github
-from github.GithubException import GithubException
+import shutil
+import tempfile
+
+from extraccion_pdf import (
+    iterar_preguntas_pdf,
+    recopilar_preguntas,
+    analizar_layout,
+    PerfilExtraccion,
+    aprender_ruido_documento,
+    MAX_OPCIONES,
+    DETECTAR_VF,
+)
+from examenes import construir_examen, aplanar_preguntas_con_casos
+from duplicados import IndiceDuplicados, buscar_duplicados, indices_sin_duplicados
+from cliente_github import invalidar_si_fallo_autenticacion, estadisticas_cliente
+from cache_github import estadisticas_cache_github
+from almacen_biblioteca import AlmacenBiblioteca, crear_almacen
+from cache_extraccion import (
+    DIRECTORIO_CACHE_POR_DEFECTO,
+    MAX_BYTES_CACHE_POR_DEFECTO,
+    clave_cache_layout,
+    leer_cache_layout,
+    escribir_cache_layout,
+)
 
 # Configuración de la página
 st.set_page_config(
@@ -31,6 +50,20 @@ if 'pdf_cargado' not in st.session_state:
     st.session_state.pdf_cargado = False
 if 'modo_revision' not in st.session_state:
     st.session_state.modo_revision = True  # Inicia en modo revisión
+if 'ruido_aprendido' not in st.session_state:
+    st.session_state.ruido_aprendido = None  # ReglasRuidoDocumento.a_dict() del último PDF extraído
+if 'perfil_extraccion' not in st.session_state:
+    st.session_state.perfil_extraccion = None  # PerfilExtraccion.a_dict() de la última extracción perfilada
+if 'layout_pdf' not in st.session_state:
+    st.session_state.layout_pdf = None  # Maquetación (líneas visuales por página) del último PDF extraído
+if 'indice_duplicados_biblioteca' not in st.session_state:
+    st.session_state.indice_duplicados_biblioteca = None  # IndiceDuplicados con las preguntas de la biblioteca
+if 'duplicados_revision' not in st.session_state:
+    st.session_state.duplicados_revision = None  # (huella de las preguntas, duplicadas, en biblioteca) de la revisión
+if 'test_sin_duplicados' not in st.session_state:
+    st.session_state.test_sin_duplicados = False  # Omitir preguntas casi duplicadas en el modo test
+if 'ajustes_analisis' not in st.session_state:
+    st.session_state.ajustes_analisis = {'max_opciones': MAX_OPCIONES, 'detectar_vf': DETECTAR_VF}
 if 'mostrar_formulario_guardado' not in st.session_state:
     st.session_state.mostrar_formulario_guardado = False
 if 'revision_completada' not in st.session_state:
@@ -57,558 +90,326 @@ if 'mapeo_opciones_preguntas' not in st.session_state:
     st.session_state.mapeo_opciones_preguntas = {}  # {índice_pregunta: {índice_desordenado -> índice_original}}
 
 
-def es_ruido_pagina(texto: str) -> bool:
+def obtener_configuracion(clave: str, por_defecto=None):
     """
-    Detecta si una línea es ruido de página (header/footer) que debe ignorarse completamente.
-    Incluye detección de encabezados de examen, profesores, departamentos, etc.
+    Lee un parámetro de configuración desde st.secrets y, si no está definido allí,
+    desde las variables de entorno. Retorna por_defecto si no aparece en ninguno.
     """
-    if not texto:
-        return True
-    
-    texto_upper = texto.upper()
-    texto_stripped = texto.strip()
-    
-    # Patrones de ruido simples (búsqueda en mayúsculas)
-    patrones_ruido = [
-        "PAG.",
-        "PÁGINA",
-        "DESCARGADO POR",
-        "PROFESORAS:",
-        "PROFESORES:",
-        "DEPARTAMENTO DE MARKETING",
-        "DIRECCIÓN COMERCIAL",
-        "DIRECCIÓN COMERCIAL I",
-        "SISTEMA DE PUNTUACIÓN",
-        "□",  # Símbolo de cuadro
-        "JOSEFA PARREÑO SELVA",
-        "ENAR RUIZ CONDE",
-        "ADEGO!",
-        "VERDADERO FALSO",
-        "FICHA DE AUTOEVALUACIÓN",
-    ]
-    
-    for patron in patrones_ruido:
-        if patron in texto_upper:
-            return True
-    
-    # Detección de nombres de profesores (pueden aparecer solos o con variaciones)
-    if "JOSEFA" in texto_upper and "PARREÑO" in texto_upper:
-        return True
-    if "ENAR" in texto_upper and "RUIZ" in texto_upper and "CONDE" in texto_upper:
-        return True
-    
-    # Patrones regex para ruido más complejo
-    patrones_regex = [
-        r'^\s*SISTEMA DE PUNTUACIÓN.*',  # Sistema de puntuación (captura todo el párrafo)
-        r'^\s*Las preguntas tienen una única respuesta correcta.*',  # Continuación del sistema de puntuación
-        r'^\s*Los desaciertos puntúan.*',  # Continuación del sistema de puntuación
-        r'^\s*Para aprobar el examen será necesario obtener.*',  # Final del sistema de puntuación
-        r'^\s*Los desaciertos puntúan -0,2 puntos.*',  # Variante del sistema de puntuación
-        r'^\s*las preguntas no contestadas.*puntos.*',  # Variante del sistema de puntuación
-        r'^\s*EXAMEN.*DIRECCIÓN DE MARKETING.*',  # Encabezados de examen
-        r'^\s*PREGUNTAS EXÁMENES TIPO TEST',  # Título de preguntas
-        r'^\s*EXAMEN FINAL.*DIRECCIÓN DE MARKETING.*',  # Examen final
-        r'^\s*EXAMEN ENERO \d{4}',  # Examen enero año
-        r'^\s*Ficha de autoevaluación.*',  # Ficha de autoevaluación (con o sin Tema:)
-        r'^\s*Ficha de autoevaluación\s+Tema:.*',  # Ficha de autoevaluación con Tema
-        r'^\s*Dirección Comercial I.*',  # Dirección Comercial I (con o sin número y departamento)
-        r'^\s*Dirección Comercial I\s+\d+.*',  # Dirección Comercial I seguido de número
-        r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing.*',  # Completo
-        r'^\s*Departamento de Marketing.*',  # Solo Departamento de Marketing
-        r'^\s*Tema:\s+.*',  # Tema: seguido de cualquier texto
-        r'^\s*Tema\s+\d+.*',  # Tema seguido de número y posiblemente más texto
-        r'^\s*Código:\s*\d+',  # Código con número
-        r'^\s*PAG\.\d+',  # PAG. seguido de número
-        r'^\s*Página\s+\d+',  # Página seguido de número
-        r'^\s*Tema\s+\d+\s*$',  # Solo "Tema X"
-        r'^\s*Profesoras?:.*',  # Profesoras: o Profesores: seguido de texto
-        r'^\s*Verdadero\s*$',  # Solo "Verdadero" (encabezado de columna)
-        r'^\s*Falso\s*$',  # Solo "Falso" (encabezado de columna)
-        r'^\s*\d+\s+Verdadero\s+Falso\s*$',  # Número seguido de "Verdadero Falso" (ej: "3 Verdadero Falso")
-        r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing\s+Verdadero\s+Falso\s*$',  # Completo con Verdadero Falso
-        r'^\s*lOMoARcPSD\|.*',  # ID de documento (ej: "lOMoARcPSD|11624338")
-    ]
-    
-    # Detectar sistema de puntuación completo (incluso si está en una sola línea o fragmentado)
-    texto_upper_stripped = texto_upper.strip()
-    if "SISTEMA DE PUNTUACIÓN" in texto_upper_stripped:
-        # Verificar si contiene partes del sistema de puntuación
-        partes_sistema = [
-            "LAS PREGUNTAS TIENEN UNA ÚNICA RESPUESTA CORRECTA",
-            "LOS DESACIERTOS PUNTÚAN",
-            "LAS PREGUNTAS NO CONTESTADAS",
-            "PARA APROBAR EL EXAMEN",
-            "OBTENER 5 PUNTOS",
-            "0,4 PUNTOS",
-            "-0,2 PUNTOS"
-        ]
-        # Si contiene al menos 2 partes del sistema de puntuación, es ruido
-        partes_encontradas = sum(1 for parte in partes_sistema if parte in texto_upper_stripped)
-        if partes_encontradas >= 2:
-            return True
-    
-    # Detectar combinaciones de frases de ruido (pueden aparecer juntas en una línea)
-    # Dirección Comercial + Departamento de Marketing
-    if ("DIRECCIÓN COMERCIAL" in texto_upper_stripped and 
-        ("DEPARTAMENTO DE MARKETING" in texto_upper_stripped or "DEPARTAMENTO" in texto_upper_stripped)):
-        return True
-    
-    # Ficha de autoevaluación (con o sin Tema)
-    if "FICHA DE AUTOEVALUACIÓN" in texto_upper_stripped:
-        return True
-    
-    # Tema: seguido de texto (puede ser parte de ficha o encabezado)
-    if re.match(r'^\s*TEMA:\s+', texto_stripped, re.IGNORECASE):
-        return True
-    
-    # Detectar "Verdadero" o "Falso" solos (encabezados de columnas V/F)
-    # Pueden aparecer con o sin espacios, en mayúsculas o minúsculas
-    if re.match(r'^\s*(Verdadero|Falso)\s*$', texto_stripped, re.IGNORECASE):
-        return True
-    
-    # Detectar número seguido de "Verdadero Falso" (ej: "3 Verdadero Falso")
-    if re.match(r'^\s*\d+\s+Verdadero\s+Falso\s*$', texto_stripped, re.IGNORECASE):
-        return True
-    
-    # Detectar "Dirección Comercial I X Departamento de Marketing Verdadero Falso"
-    if re.match(r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing\s+Verdadero\s+Falso\s*$', texto_stripped, re.IGNORECASE):
-        return True
-    
-    # Detectar ID de documento (ej: "lOMoARcPSD|11624338")
-    if re.match(r'^\s*lOMoARcPSD\|.*', texto_stripped, re.IGNORECASE):
-        return True
-    
-    for patron in patrones_regex:
-        if re.match(patron, texto_stripped, re.IGNORECASE):
-            return True
-    
-    return False
+    try:
+        valor = st.secrets.get(clave)
+    except Exception:
+        # Sin archivo de secrets configurado
+        valor = None
+    if valor is None:
+        valor = os.environ.get(clave, por_defecto)
+    return valor
 
 
-def limpiar_ruido_sin_vf(texto: str) -> str:
+def obtener_num_workers_pdf() -> Optional[int]:
     """
-    Limpia texto de ruido EXCEPTO marcas V/F (para no interferir con detección de V/F en enunciados).
-    Se usa para limpiar el texto antes de determinar el tipo de pregunta.
-    
-    Reglas:
-    1. Elimina referencias de página al final (P\d+, P \d+, Página \d+)
-    2. Limpia códigos y referencias de página dentro del texto
-    3. NO elimina V/F (se procesará después según el tipo de pregunta)
+    Número de procesos para extraer PDFs (PDF_WORKERS en secrets o entorno).
+    Retorna None (todos los núcleos) si no está configurado o no es un entero válido.
     """
-    if not texto:
-        return texto
-    
-    texto_limpio = texto
-    
-    # 1. Eliminar referencias de página al final del texto (P\d+, P \d+, Página \d+)
-    # Incluye casos pegados a ":" o cualquier carácter final
-    # Patrón: P seguido de dígitos al final, con o sin espacio antes, incluso si está pegado a ":"
-    texto_limpio = re.sub(r'[:;]\s*P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Pegado a : o ;
-    texto_limpio = re.sub(r'\s+P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Con espacio
-    texto_limpio = re.sub(r'P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Sin espacio (pegado al final)
-    texto_limpio = re.sub(r'\s+Página\s+\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 2. Eliminar códigos dentro del texto (Código: \d+)
-    texto_limpio = re.sub(r'Código:\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 3. Eliminar referencias de página dentro del texto (PAG.\d+, Página \d+, P\d+)
-    # También eliminar referencias pegadas a ":" dentro del texto
-    texto_limpio = re.sub(r'[:;]\s*P\s*\d+', '', texto_limpio, flags=re.IGNORECASE)  # Pegado a : o ; dentro del texto
-    texto_limpio = re.sub(r'PAG\.\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
-    texto_limpio = re.sub(r'Página\s+\d+', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 4. Limpiar espacios múltiples y espacios al inicio/final
-    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
-    
-    return texto_limpio
+    try:
+        return int(obtener_configuracion("PDF_WORKERS"))
+    except (TypeError, ValueError):
+        return None
 
 
-def limpiar_ruido(texto: str) -> str:
+def obtener_umbral_baja_memoria() -> int:
     """
-    Limpia texto de ruido: referencias de página, marcas V/F en opciones múltiples,
-    códigos, y otros elementos basura que no deben aparecer en preguntas/respuestas.
-    
-    IMPORTANTE: Esta función se usa SOLO para opciones de preguntas múltiples.
-    Para enunciados de preguntas V/F, NO usar esta función (usar detectar_vf_en_enunciado).
-    
-    Reglas:
-    1. Elimina referencias de página al final (P\d+, P \d+, Página \d+)
-    2. Elimina marcas V/F aisladas al final de opciones múltiples
-    3. Elimina todo el contenido después de V/F si hay texto adicional
-    4. Limpia códigos y referencias de página dentro del texto
+    Tamaño (bytes) a partir del cual un PDF subido se procesa en modo de baja memoria
+    (EXTRACCION_BAJA_MEMORIA_MB en secrets o entorno, 64 MB por defecto; 0 = siempre).
     """
-    if not texto:
-        return texto
-    
-    texto_limpio = texto
-    
-    # 1. Eliminar referencias de página al final del texto (P\d+, P \d+, Página \d+)
-    # Incluye casos pegados a ":" o cualquier carácter final
-    # Patrón: P seguido de dígitos al final, con o sin espacio antes, incluso si está pegado a ":"
-    texto_limpio = re.sub(r'[:;]\s*P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Pegado a : o ;
-    texto_limpio = re.sub(r'\s+P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Con espacio
-    texto_limpio = re.sub(r'P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)  # Sin espacio (pegado al final)
-    texto_limpio = re.sub(r'\s+Página\s+\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 2. Eliminar marcas V/F aisladas al final de opciones múltiples
-    # Regla estricta: Si una opción termina en V o F aislada, eliminarla
-    # Si después de V/F hay más texto, eliminar todo desde V/F hasta el final
-    # Caso 1: V/F seguido de punto y más texto (ej: "F. Ver libro", "V. texto adicional")
-    patron_vf_punto = re.compile(r'\s+[VF]\.\s+.*$', re.IGNORECASE)
-    match_vf_punto = patron_vf_punto.search(texto_limpio)
-    if match_vf_punto:
-        # Eliminar desde la V/F hasta el final
-        texto_limpio = texto_limpio[:match_vf_punto.start()].strip()
-    else:
-        # Caso 2: V/F seguido de espacio y más texto (ej: "F Ver libro")
-        patron_vf_espacio = re.compile(r'\s+[VF]\s+[A-Za-z].*$', re.IGNORECASE)
-        match_vf_espacio = patron_vf_espacio.search(texto_limpio)
-        if match_vf_espacio:
-            texto_limpio = texto_limpio[:match_vf_espacio.start()].strip()
-        else:
-            # Caso 3: Solo V/F aislada al final (sin más texto)
-            texto_limpio = re.sub(r'\s+[VF]\.?\s*$', '', texto_limpio, flags=re.IGNORECASE)
-            texto_limpio = re.sub(r'\s+\([VF]\)\s*$', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 3. Eliminar códigos dentro del texto (Código: \d+)
-    texto_limpio = re.sub(r'Código:\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 4. Eliminar referencias de página dentro del texto (PAG.\d+, Página \d+, P\d+)
-    # También eliminar referencias pegadas a ":" dentro del texto
-    texto_limpio = re.sub(r'[:;]\s*P\s*\d+', '', texto_limpio, flags=re.IGNORECASE)  # Pegado a : o ; dentro del texto
-    texto_limpio = re.sub(r'PAG\.\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
-    texto_limpio = re.sub(r'Página\s+\d+', '', texto_limpio, flags=re.IGNORECASE)
-    
-    # 5. Limpiar espacios múltiples y espacios al inicio/final
-    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
-    
-    return texto_limpio
+    try:
+        return int(float(obtener_configuracion("EXTRACCION_BAJA_MEMORIA_MB", 64)) * 1024 * 1024)
+    except (TypeError, ValueError):
+        return 64 * 1024 * 1024
 
 
-def limpiar_tema_x(texto: str) -> str:
+def volcar_pdf_temporal(archivo) -> str:
     """
-    Elimina menciones de "Tema X" (Tema 1, Tema 2, etc.) del texto.
-    Si el texto contiene solo "Tema X", retorna cadena vacía.
-    Si está dentro de una frase, elimina la mención y limpia espacios extra.
+    Copia por bloques un archivo subido a un fichero temporal en disco y retorna su ruta,
+    sin crear una copia completa en memoria como haría archivo.read().
+    El llamador debe borrar el fichero al terminar.
     """
-    if not texto:
-        return texto
-    
-    # Patrón para detectar "Tema X" (case-insensitive)
-    # Captura "Tema" seguido de espacios y uno o más dígitos
-    patron_tema = re.compile(r'(?i)Tema\s+\d+', re.IGNORECASE)
-    
-    # Si el texto completo es solo "Tema X", retornar cadena vacía
-    texto_limpio = texto.strip()
-    if re.match(r'^\s*Tema\s+\d+\s*$', texto_limpio, re.IGNORECASE):
-        return ""
-    
-    # Eliminar "Tema X" del texto y limpiar espacios extra
-    texto_limpio = patron_tema.sub('', texto)
-    # Limpiar espacios múltiples y espacios al inicio/final
-    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
-    
-    return texto_limpio
+    archivo.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="flashcards_", suffix=".pdf", delete=False) as destino:
+        shutil.copyfileobj(archivo, destino, 1024 * 1024)
+    return destino.name
 
 
-def detectar_subrayado_resaltado(span: dict) -> bool:
+def extraer_preguntas_pdf(pdf, al_avanzar=None, baja_memoria: bool = False, perfil: Optional[PerfilExtraccion] = None,
+                          al_aprender_ruido=None, ajustes: Optional[Dict] = None):
     """
-    Detecta si un span está subrayado o resaltado (incluyendo colores de fondo como verde).
-    Busca específicamente underline (línea por debajo) y resaltado (fondo de color).
-    Retorna True si está marcado de alguna forma.
+    Extrae las preguntas de un PDF en dos etapas: maquetación (PyMuPDF, cacheada en disco) y
+    análisis de las líneas con la máquina de estados (milisegundos).
+    pdf: bytes del PDF o ruta a un archivo (modo de baja memoria).
+    Si el mismo PDF ya se maquetó con la versión actual (VERSION_LAYOUT), no se abre con PyMuPDF.
+    Configuración: EXTRACCION_CACHE_DIR y EXTRACCION_CACHE_MAX_MB (0 desactiva la caché).
+    La maquetación queda en st.session_state.layout_pdf para re-analizarla con otros ajustes.
+    
+    al_avanzar: función opcional llamada tras cada página con
+    (paginas_procesadas, num_paginas, preguntas_cerradas) para mostrar el progreso
+    y las preguntas terminadas mientras se procesa el resto (no se llama si hay acierto de caché).
+    
+    baja_memoria: vacía la caché de PyMuPDF cada pocas páginas (ver extraer_texto_con_subrayado).
+    perfil: PerfilExtraccion opcional; si se pasa, no se lee la caché (para medir la extracción real).
+    al_aprender_ruido: función opcional que recibe el resumen (ReglasRuidoDocumento.a_dict(), o None)
+    de los encabezados y pies repetidos aprendidos del PDF.
+    ajustes: argumentos de analizar_layout (max_opciones, detectar_vf); por defecto los de la sesión.
+    
+    Retorna: (lista de preguntas, diccionario de subrayado por pregunta)
     """
+    if ajustes is None:
+        ajustes = st.session_state.ajustes_analisis
     
-    flags = span.get("flags", 0)
-    
-    # Detectar underline (flag 4 y 8388608) - línea por debajo del texto
-    is_underlined = (flags & 4) != 0 or (flags & 8388608) != 0
-                    
-    # Buscar atributo s_line o underline explícito
-    if "s_line" in span or "underline" in span:
-        is_underlined = True
-    
-    # Detectar resaltado por color de fondo
-    back_color = span.get("back_color", None)
-    is_highlighted = False
-    
-    if back_color is not None:
-        try:
-            if isinstance(back_color, (list, tuple)) and len(back_color) >= 3:
-                r, g, b = float(back_color[0]), float(back_color[1]), float(back_color[2])
-                # Verificar si NO es blanco (1,1,1) ni negro/transparente (0,0,0)
-                if not (abs(r - 1.0) < 0.01 and abs(g - 1.0) < 0.01 and abs(b - 1.0) < 0.01):
-                    if not (abs(r) < 0.01 and abs(g) < 0.01 and abs(b) < 0.01):
-                        is_highlighted = True
-            elif isinstance(back_color, (int, float)):
-                # Formato entero: 16777215 es blanco (0xFFFFFF)
-                if back_color != 16777215 and back_color != 0:
-                    is_highlighted = True
-        except (ValueError, TypeError):
-            pass
-    
-    return is_underlined or is_highlighted
-
-
-def limpiar_texto(texto: str) -> str:
-    """
-    Limpia espacios extra y normaliza el texto.
-    Preserva espacios simples entre palabras, pero elimina múltiples espacios consecutivos.
-    """
-    if not texto:
-        return ""
-    # Reemplazar múltiples espacios/tabs/newlines por un solo espacio
-    texto = re.sub(r'[\s\t\n\r]+', ' ', texto)
-    # Eliminar espacios al inicio y final
-    texto = texto.strip()
-    return texto
-
-
-def limpiar_etiqueta_opcion(texto: str) -> str:
-    """
-    Elimina la etiqueta de opción (a., b), A-, etc.) del inicio del texto.
-    Ejemplo: "a. Texto de la opción" → "Texto de la opción"
-    """
-    if not texto:
-        return ""
-    # Eliminar patrón de letra seguida de punto, paréntesis o guion al inicio
-    texto_limpio = re.sub(r'^\s*[a-eA-E][\.\)\-]\s*', '', texto)
-    return texto_limpio.strip()
+    directorio = obtener_configuracion("EXTRACCION_CACHE_DIR", DIRECTORIO_CACHE_POR_DEFECTO)
+    try:
+        max_bytes = int(float(obtener_configuracion("EXTRACCION_CACHE_MAX_MB")) * 1024 * 1024)
+    except (TypeError, ValueError):
+        max_bytes = MAX_BYTES_CACHE_POR_DEFECTO
+    
+    clave = clave_cache_layout(pdf)
+    if max_bytes > 0 and perfil is None:
+        cacheado = leer_cache_layout(clave, directorio)
+        if cacheado is not None:
+            paginas, ruido = cacheado
+            if al_aprender_ruido is not None:
+                al_aprender_ruido(ruido)
+            st.session_state.layout_pdf = paginas
+            return analizar_layout(paginas, **ajustes)
+    
+    reglas_ruido = aprender_ruido_documento(pdf, perfil)
+    ruido = reglas_ruido.a_dict() if reglas_ruido else None
+    if al_aprender_ruido is not None:
+        al_aprender_ruido(ruido)
+    
+    paginas = []
+    lotes = []
+    for paginas_procesadas, num_paginas, preguntas_cerradas in iterar_preguntas_pdf(
+        pdf, num_workers=obtener_num_workers_pdf(), baja_memoria=baja_memoria, perfil=perfil,
+        reglas_ruido=reglas_ruido, layout=paginas, **ajustes
+    ):
+        lotes.append(preguntas_cerradas)
+        if al_avanzar is not None:
+            al_avanzar(paginas_procesadas, num_paginas, preguntas_cerradas)
+    
+    st.session_state.layout_pdf = paginas
+    if any(paginas):
+        escribir_cache_layout(clave, paginas, ruido, directorio, max_bytes)
+    return recopilar_preguntas(lotes)
+
+
+def cargar_preguntas_extraidas(preguntas_extraidas: List[Dict], subrayado_info: Dict[int, bool]):
+    """Carga en la sesión las preguntas recién extraídas de un PDF y reinicia la revisión."""
+    st.session_state.preguntas = preguntas_extraidas
+    st.session_state.subrayado_detectado = subrayado_info
+    st.session_state.pregunta_actual = 0
+    st.session_state.respuestas_usuario = {}
+    st.session_state.verificaciones = {}
+    st.session_state.pdf_cargado = True
+    st.session_state.examen_subido_por_usuario = True
+    st.session_state.modo_revision = True
+    st.session_state.revision_completada = False
+    st.session_state.examen_guardado_exitosamente = False
+    st.session_state.preguntas_desordenadas_test = []
 
 
-def detectar_vf_en_enunciado(enunciado: str) -> tuple[str, Optional[int]]:
+def mostrar_ajustes_analisis():
     """
-    Detecta si al final del enunciado hay una marca V/F (Verdadero/Falso).
-    Busca patrones como "(V)", "- F", " V", etc.
-    
-    Retorna: (enunciado_limpio, respuesta_vf)
-    - enunciado_limpio: El enunciado sin la marca V/F
-    - respuesta_vf: 0 si es Verdadero (V), 1 si es Falso (F), None si no se encontró
+    Ajustes de la máquina de estados (límite de opciones, detección de V/F) en la barra lateral.
+    Con la maquetación del PDF en la sesión, "Re-analizar" aplica los ajustes sin volver a abrir
+    el PDF (descarta las correcciones hechas en la revisión).
     """
-    if not enunciado:
-        return enunciado, None
-    
-    # Patrón para detectar V o F al final: \s*[\(\-\s]*(V|F)[\)\s]*$
-    patron_vf = re.compile(r'\s*[\(\-\s]*(V|F)[\)\s]*$', re.IGNORECASE)
-    match = patron_vf.search(enunciado)
-    
-    if match:
-        vf_encontrado = match.group(1).upper()
-        # Eliminar la marca del enunciado
-        enunciado_limpio = patron_vf.sub('', enunciado).strip()
-        # Retornar respuesta: 0 = Verdadero (V), 1 = Falso (F)
-        respuesta = 0 if vf_encontrado == 'V' else 1
-        return enunciado_limpio, respuesta
-    
-    return enunciado, None
+    ajustes = st.session_state.ajustes_analisis
+    with st.expander("⚙️ Ajustes de análisis"):
+        max_opciones = st.number_input(
+            "Máximo de opciones por pregunta",
+            min_value=1, max_value=5, value=int(ajustes['max_opciones']), step=1,
+            help="Las opciones siguientes se fusionan con la última (etiquetas a-e)",
+            key="ajuste_max_opciones"
+        )
+        detectar_vf = st.checkbox(
+            "Detectar V/F al final del enunciado",
+            value=bool(ajustes['detectar_vf']),
+            help="En preguntas sin opciones, toma la respuesta de una V/F al final del enunciado",
+            key="ajuste_detectar_vf"
+        )
+        st.session_state.ajustes_analisis = {'max_opciones': int(max_opciones), 'detectar_vf': detectar_vf}
+        
+        if st.session_state.layout_pdf is not None:
+            if st.button("🔁 Re-analizar PDF", use_container_width=True, key="btn_reanalizar_pdf",
+                         help="Aplica los ajustes sin volver a procesar el PDF (se pierden los cambios de la revisión)"):
+                preguntas_extraidas, subrayado_info = analizar_layout(
+                    st.session_state.layout_pdf, **st.session_state.ajustes_analisis
+                )
+                if preguntas_extraidas:
+                    cargar_preguntas_extraidas(preguntas_extraidas, subrayado_info)
+                    st.rerun()
+                else:
+                    st.error("❌ No se pudieron extraer preguntas con estos ajustes")
 
 
-def obtener_repositorio_github():
+def obtener_almacen_biblioteca() -> Optional[AlmacenBiblioteca]:
     """
-    Obtiene el repositorio de GitHub usando las credenciales de st.secrets.
-    Retorna el objeto Repository o None si hay error.
+    Obtiene el almacén de la biblioteca configurado con BIBLIOTECA_BACKEND en secrets o entorno:
+    "github" (por defecto, carpeta biblioteca/ del repositorio REPO_NAME), "local" (carpeta
+    BIBLIOTECA_DIRECTORIO) o "sqlite" (base de datos BIBLIOTECA_SQLITE). Ver almacen_biblioteca.py.
+    Retorna el almacén o None si la configuración no es válida.
     """
     try:
-        token = st.secrets.get("GITHUB_TOKEN")
-        repo_name = st.secrets.get("REPO_NAME")
-        
-        if not token or not repo_name:
-            st.error("❌ Configuración incompleta: GITHUB_TOKEN o REPO_NAME no están definidos en st.secrets")
-            return None
-        
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        return repo
-    except GithubException as e:
-        st.error(f"❌ Error de GitHub API: {str(e)}")
+        return crear_almacen(obtener_configuracion)
+    except ValueError as e:
+        st.error(f"❌ {str(e)}")
         return None
-    except Exception as e:
-        st.error(f"❌ Error al conectar con GitHub: {str(e)}")
-        return None
-
-
-def sanitizar_nombre_archivo(titulo: str) -> str:
-    """
-    Sanitiza el título para usarlo como nombre de archivo.
-    Elimina caracteres especiales y espacios.
-    """
-    # Reemplazar espacios y caracteres especiales
-    nombre = re.sub(r'[^\w\s-]', '', titulo)
-    nombre = re.sub(r'[-\s]+', '_', nombre)
-    return nombre.strip('_')
 
 
 def guardar_examen_github(titulo: str, descripcion: str, preguntas: List[Dict]) -> bool:
     """
-    Guarda un examen en GitHub como archivo JSON en la carpeta /biblioteca.
+    Guarda un examen en la biblioteca (en GitHub, como archivo JSON en la carpeta /biblioteca,
+    o en el almacén configurado).
     Retorna True si se guardó correctamente, False en caso contrario.
     """
     try:
-        repo = obtener_repositorio_github()
-        if not repo:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
             return False
         
-        # Crear estructura del examen con metadata
-        examen_data = {
-            'titulo': titulo,
-            'descripcion': descripcion,
-            'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'num_preguntas': len(preguntas),
-            'preguntas': preguntas
-        }
-        
-        # Convertir a JSON
-        examen_json = json.dumps(examen_data, ensure_ascii=False, indent=2)
-        
-        # Sanitizar nombre de archivo
-        nombre_archivo = sanitizar_nombre_archivo(titulo)
-        if not nombre_archivo:
-            nombre_archivo = f"examen_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        ruta_archivo = f"biblioteca/{nombre_archivo}.json"
-        
-        # Verificar si el archivo ya existe
-        try:
-            contenido_actual = repo.get_contents(ruta_archivo)
-            # Si existe, actualizarlo
-            repo.update_file(
-                path=ruta_archivo,
-                message=f"Actualizar examen: {titulo}",
-                content=examen_json,
-                sha=contenido_actual.sha
-            )
-        except GithubException:
-            # Si no existe, crearlo
-            try:
-                # Verificar si la carpeta biblioteca existe, si no, crearla
-                try:
-                    repo.get_contents("biblioteca")
-                except GithubException:
-                    # Crear carpeta biblioteca con un archivo README
-                    repo.create_file(
-                        path="biblioteca/README.md",
-                        message="Crear carpeta biblioteca",
-                        content="# Biblioteca de Exámenes\n\nEsta carpeta contiene los exámenes guardados."
-                    )
-                
-                # Crear el archivo del examen
-                repo.create_file(
-                    path=ruta_archivo,
-                    message=f"Agregar examen: {titulo}",
-                    content=examen_json
-                )
-            except Exception as e:
-                st.error(f"❌ Error al crear el archivo: {str(e)}")
-                return False
+        # Examen e índice juntos (en GitHub, un único commit)
+        almacen.guardar(construir_examen(titulo, descripcion, preguntas))
         
+        # La biblioteca cambió: el índice de duplicados se reconstruye cuando se vuelva a pedir
+        st.session_state.indice_duplicados_biblioteca = None
         return True
     except Exception as e:
-        st.error(f"❌ Error al guardar el examen en GitHub: {str(e)}")
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al guardar el examen en la biblioteca: {str(e)}")
         return False
 
 
 def obtener_examenes_github() -> List[Dict]:
     """
-    Obtiene todos los exámenes guardados en GitHub desde la carpeta /biblioteca.
+    Obtiene los exámenes guardados en la biblioteca leyendo solo su índice, sin cargar cada
+    examen. En GitHub es biblioteca/index.json (ver indice_biblioteca.py) a través de la caché
+    de cache_github: dentro del TTL no hay petición y después se revalida con su ETag.
     """
     try:
-        repo = obtener_repositorio_github()
-        if not repo:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
             return []
         
-        examenes = []
-        
-        try:
-            # Obtener contenido de la carpeta biblioteca
-            contenido = repo.get_contents("biblioteca")
-            
-            # Si es un solo archivo, convertirlo a lista
-            if not isinstance(contenido, list):
-                contenido = [contenido]
-            
-            # Filtrar solo archivos JSON (excluir README.md)
-            archivos_json = [f for f in contenido if f.name.endswith('.json') and f.name != 'metadata.json']
-            
-            for archivo in archivos_json:
-                try:
-                    # Obtener contenido del archivo
-                    contenido_archivo = archivo.decoded_content.decode('utf-8')
-                    examen_data = json.loads(contenido_archivo)
-                    
-                    examenes.append({
-                        'nombre_archivo': archivo.name,
-                        'ruta': archivo.path,
-                        'sha': archivo.sha,
-                        'titulo': examen_data.get('titulo', archivo.name.replace('.json', '')),
-                        'descripcion': examen_data.get('descripcion', 'Sin descripción'),
-                        'fecha_creacion': examen_data.get('fecha_creacion', 'Fecha desconocida'),
-                        'num_preguntas': examen_data.get('num_preguntas', len(examen_data.get('preguntas', [])))
-                    })
-                except Exception as e:
-                    # Si hay error al leer un archivo, continuar con los demás
-                    continue
-            
-            # Ordenar por fecha de creación (más recientes primero)
-            examenes.sort(key=lambda x: x['fecha_creacion'], reverse=True)
-            
-        except GithubException as e:
-            if e.status == 404:
-                # La carpeta biblioteca no existe aún
-                return []
-            else:
-                st.error(f"❌ Error al acceder a la carpeta biblioteca: {str(e)}")
-                return []
-        
-        return examenes
+        # Ordenados por fecha de creación (más recientes primero)
+        return almacen.listar()
     except Exception as e:
-        st.error(f"❌ Error al obtener exámenes de GitHub: {str(e)}")
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al obtener los exámenes de la biblioteca: {str(e)}")
         return []
 
 
-def cargar_examen_github(ruta_archivo: str) -> Optional[List[Dict]]:
+def reconstruir_indice_biblioteca() -> Optional[int]:
     """
-    Carga un examen específico desde GitHub.
+    Reconstruye el índice de la biblioteca desde los exámenes guardados (si se desincronizó).
+    Retorna el número de exámenes indexados o None si hay error.
+    """
+    try:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
+            return None
+        num_examenes = almacen.reconstruir_indice()
+        st.session_state.indice_duplicados_biblioteca = None
+        return num_examenes
+    except Exception as e:
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al reconstruir el índice de la biblioteca: {str(e)}")
+        return None
+
+
+def cargar_examen_github(ruta_archivo: str, sha: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    Carga un examen específico de la biblioteca.
+    sha: SHA del blob del examen (del índice); en GitHub, si ya se descargó no se vuelve a pedir.
     Retorna la lista de preguntas o None si hay error.
     """
     try:
-        repo = obtener_repositorio_github()
-        if not repo:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
             return None
         
-        contenido = repo.get_contents(ruta_archivo)
-        examen_data = json.loads(contenido.decoded_content.decode('utf-8'))
-        
         # Retornar solo las preguntas
-        return examen_data.get('preguntas', [])
+        return almacen.cargar(ruta_archivo, sha).get('preguntas', [])
     except Exception as e:
-        st.error(f"❌ Error al cargar el examen desde GitHub: {str(e)}")
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al cargar el examen de la biblioteca: {str(e)}")
         return None
 
 
+def cargar_examenes_github(examenes: List[Dict]) -> List[Optional[List[Dict]]]:
+    """
+    Carga varios exámenes de la biblioteca a la vez (en GitHub, con el pool de hilos acotado
+    de cache_github).
+    Retorna las preguntas de cada examen en el mismo orden, o None en los que fallaron
+    (un examen que falla no impide cargar los demás).
+    """
+    try:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
+            return [None] * len(examenes)
+        
+        resultados = almacen.cargar_varios([(examen['ruta'], examen.get('sha')) for examen in examenes])
+    except Exception as e:
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al cargar los exámenes de la biblioteca: {str(e)}")
+        return [None] * len(examenes)
+    
+    fallidos = [examen['titulo'] for examen, resultado in zip(examenes, resultados) if isinstance(resultado, Exception)]
+    if fallidos:
+        st.warning(f"⚠️ No se pudieron cargar {len(fallidos)} exámenes: {', '.join(fallidos)}")
+    return [None if isinstance(resultado, Exception) else resultado.get('preguntas', []) for resultado in resultados]
+
+
 def eliminar_examen_github(ruta_archivo: str, sha: str) -> bool:
     """
-    Elimina un examen de GitHub.
+    Elimina un examen de la biblioteca.
     Retorna True si se eliminó correctamente, False en caso contrario.
     """
     try:
-        repo = obtener_repositorio_github()
-        if not repo:
+        almacen = obtener_almacen_biblioteca()
+        if not almacen:
             return False
         
-        # Obtener el nombre del archivo para el mensaje
-        nombre_archivo = os.path.basename(ruta_archivo)
-        
-        repo.delete_file(
-            path=ruta_archivo,
-            message=f"Eliminar examen: {nombre_archivo}",
-            sha=sha
-        )
+        almacen.eliminar(ruta_archivo, sha)
         
+        st.session_state.indice_duplicados_biblioteca = None
         return True
     except Exception as e:
-        st.error(f"❌ Error al eliminar el examen de GitHub: {str(e)}")
+        invalidar_si_fallo_autenticacion(e)
+        st.error(f"❌ Error al eliminar el examen de la biblioteca: {str(e)}")
         return False
 
 
+def obtener_indice_duplicados_biblioteca() -> IndiceDuplicados:
+    """
+    Índice de preguntas casi duplicadas con todas las preguntas de la biblioteca.
+    Se construye una vez por sesión (descarga los exámenes a la vez) y se descarta al guardar
+    o eliminar. Las claves son (título del examen, número de pregunta).
+    """
+    if st.session_state.indice_duplicados_biblioteca is None:
+        preguntas_biblioteca = []
+        claves = []
+        examenes = obtener_examenes_github()
+        for examen, preguntas_examen in zip(examenes, cargar_examenes_github(examenes)):
+            if not preguntas_examen:
+                continue
+            preguntas_planas = aplanar_preguntas_con_casos(preguntas_examen)
+            preguntas_biblioteca.extend(preguntas_planas)
+            claves.extend((examen['titulo'], numero) for numero in range(1, len(preguntas_planas) + 1))
+        indice = IndiceDuplicados()
+        indice.agregar(preguntas_biblioteca, claves)
+        st.session_state.indice_duplicados_biblioteca = indice
+    return st.session_state.indice_duplicados_biblioteca
+
+
 def tiene_patrones_opcion_en_texto(texto: str) -> bool:
     """
     Detecta si un texto contiene patrones de opciones (a., b), etc.).
@@ -704,435 +505,12 @@ def es_fragmento_texto(texto: str) -> bool:
     return False
 
 
-def extraer_spans_con_formato(page):
-    """
-    Extrae todos los spans de texto de una página con su información de formato.
-    NO descarta textos cortos - conserva todo el texto que sea parte de preguntas/respuestas.
-    Filtra ruido de página (headers/footers).
-    Retorna una lista de diccionarios con: texto, subrayado/resaltado, posición Y, posición X
-    Ordenados por posición Y (arriba a abajo) y luego por X (izquierda a derecha)
-    """
-    texto_dict = page.get_text("dict")
-    spans_info = []
-            
-    for block in texto_dict.get("blocks", []):
-        if "lines" in block:
-            for line in block["lines"]:
-                # Construir texto completo de la línea para verificar ruido
-                texto_linea_completo = ""
-                spans_linea = []
-        
-                for span in line.get("spans", []):
-                    texto = span.get("text", "").strip()
-                    if texto:
-                        texto_linea_completo += texto + " "
-                        bbox = span.get("bbox", [0, 0, 0, 0])
-                        y_pos = bbox[1]
-                        x_pos = bbox[0]
-                        is_marked = detectar_subrayado_resaltado(span)
-                        spans_linea.append({
-                            'texto': texto,
-                            'marcado': is_marked,
-                            'y': y_pos,
-                            'x': x_pos
-                        })
-                
-                # Filtrar ruido de página (solo si toda la línea es ruido)
-                texto_linea_completo = texto_linea_completo.strip()
-                if texto_linea_completo and not es_ruido_pagina(texto_linea_completo):
-                    # Agregar todos los spans de la línea (sin descartar textos cortos)
-                    spans_info.extend(spans_linea)
-    
-    # Ordenar por Y (arriba a abajo) y luego por X (izquierda a derecha)
-    spans_info.sort(key=lambda s: (s['y'], s['x']))
-    
-    return spans_info
-
 
-def extraer_texto_con_subrayado(pdf_bytes: bytes):
-    """
-    Extrae preguntas y opciones del PDF con lógica de contenedores robusta.
-    
-    LÓGICA DE CONTENEDORES:
-    - Pregunta: Empieza con patrón numérico, frase anclaje específica o texto nuevo tras cerrar pregunta anterior
-    - Captura Total: Todo el texto siguiente pertenece a la pregunta hasta que aparezca opción "a)"
-    - Opción: Una vez detectada "a)", todo el texto siguiente pertenece a esa opción hasta "b)", etc.
-    - Límite estricto: Solo se aceptan 4 opciones (a, b, c, d). La opción "e" o posteriores se fusionan con "d"
-    - Cierre automático: Después de la opción "d)", la pregunta se cierra automáticamente
-    
-    REGLAS:
-    1. NO descarta textos cortos (eliminado límite de 10 caracteres)
-    2. Filtra ruido de página (headers/footers)
-    3. Elimina V/F de opciones y lo usa para marcar respuesta correcta
-    4. Detecta subrayado específicamente (underline, no solo resaltado)
-    5. Detección por frase anclaje: Frases específicas fuerzan creación de nueva pregunta
-    
-    Retorna: (lista de preguntas, diccionario con índices de preguntas que tienen subrayado detectado)
-    """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    todas_las_preguntas = []
-    subrayado_por_pregunta = {}
-    
-    # Patrones de detección
-    patron_pregunta = re.compile(r'^\s*(\d+)[\.\-\s]')  # Número seguido de punto, guion o espacio
-    patron_opcion = re.compile(r'^\s*([a-eA-E])[\.\)\-]\s*')  # Letra a-e seguida de punto, paréntesis o guion
-    
-    # Estado actual de la pregunta que estamos procesando
-    pregunta_actual = None
-    opciones_actuales = []
-    opciones_marcadas = []  # Lista de booleanos indicando si cada opción está marcada
-    pregunta_idx = 0
-    estado_actual = "enunciado"  # "enunciado" o "opciones"
-    pregunta_cerrada = False  # Indica si la pregunta ya está cerrada
-    
-    # Ya no se detectan casos automáticamente - el usuario los creará manualmente
-    
-    # Procesar cada página
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        spans_info = extraer_spans_con_formato(page)
-        
-        if not spans_info:
-            continue
-        
-        # Agrupar spans por líneas visuales (misma Y aproximadamente)
-        TOLERANCIA_Y = 5  # píxeles
-        
-        lineas_visuales = []
-        if spans_info:
-            linea_actual = []
-            y_actual = spans_info[0]['y']
-            
-            for span in spans_info:
-                y_pos = span['y']
-                if abs(y_pos - y_actual) <= TOLERANCIA_Y:
-                    linea_actual.append(span)
-                else:
-                    if linea_actual:
-                        lineas_visuales.append(linea_actual)
-                    linea_actual = [span]
-                    y_actual = y_pos
-            
-            if linea_actual:
-                lineas_visuales.append(linea_actual)
-        
-        # Procesar cada línea visual
-        for linea_visual in lineas_visuales:
-            # Ordenar spans dentro de la línea por X (izquierda a derecha)
-            linea_visual.sort(key=lambda s: s['x'])
-            
-            # Unir todos los textos de la línea
-            textos_linea = [span['texto'] for span in linea_visual]
-            texto_completo = " ".join(textos_linea)
-            texto_completo = texto_completo.strip()
-            
-            # FILTRADO DE RUIDO: Aplicar limpieza (SIN eliminar V/F) antes de procesar
-            # IMPORTANTE: NO eliminamos V/F aquí porque necesitamos detectarlo después
-            # según el tipo de pregunta (V/F vs opción múltiple)
-            # 1. Limpiar "Tema X"
-            texto_completo = limpiar_tema_x(texto_completo)
-            
-            # 2. Limpiar ruido general (referencias de página, códigos, etc.) PERO NO V/F
-            texto_completo = limpiar_ruido_sin_vf(texto_completo)
-            
-            # Si después de limpiar el texto está vacío, saltar esta línea
-            if not texto_completo:
-                continue
-            
-            # Si alguna parte está marcada, toda la línea está marcada
-            marcado_linea = any(span['marcado'] for span in linea_visual)
-            
-            # Verificar si es pregunta u opción (después de la limpieza)
-            es_pregunta = patron_pregunta.match(texto_completo)
-            es_opcion = patron_opcion.match(texto_completo)
-            
-            # NO DESCARTAR TEXTOS CORTOS - Si es parte de una pregunta/respuesta iniciada, conservarlo siempre
-            
-            # Si la pregunta ya está cerrada, solo procesar si es nueva pregunta
-            if pregunta_cerrada:
-                # Si es ruido, descartarlo
-                if es_ruido_pagina(texto_completo):
-                    continue
-                # Si es nueva pregunta, reiniciar
-                if es_pregunta:
-                    pregunta_cerrada = False
-                    # Continuar con la lógica de nueva pregunta más abajo
-                else:
-                    # Texto después de pregunta cerrada que no es ruido ni nueva pregunta
-                    # NO hacer nada, esperar a nueva pregunta
-                    continue
-            
-            # 1. IDENTIFICADOR DE PREGUNTA: Si empieza por número, crear nueva pregunta
-            if es_pregunta:
-                # Guardar pregunta anterior si existe (CLASIFICACIÓN FINAL)
-                if pregunta_actual and not pregunta_cerrada:
-                    if len(opciones_actuales) > 0:
-                        # Pregunta con opciones → Opción Múltiple
-                        # Limitar a máximo 4 opciones si hay más
-                        if len(opciones_actuales) > 4:
-                            # Fusionar opciones adicionales con la última (opción d)
-                            texto_extra = " ".join(opciones_actuales[4:])
-                            opciones_actuales[3] += " " + texto_extra
-                            opciones_actuales = opciones_actuales[:4]
-                            opciones_marcadas = opciones_marcadas[:4]
-                        
-                        respuesta_correcta = 0
-                        tiene_subrayado = False
-                        for idx, esta_marcada in enumerate(opciones_marcadas):
-                            if esta_marcada:
-                                respuesta_correcta = idx
-                                tiene_subrayado = True
-                                break
-                        
-                        # Limpiar etiquetas, V/F y ruido de todas las opciones
-                        opciones_limpias = []
-                        for op in opciones_actuales:
-                            op_limpia = limpiar_etiqueta_opcion(limpiar_texto(op))
-                            # Aplicar limpieza de ruido (P139, V/F, referencias de página, etc.)
-                            op_limpia = limpiar_ruido(op_limpia)
-                            # Eliminar V/F al final de opciones (solo para opciones múltiples)
-                            op_limpia = re.sub(r'\s*[\(\-\s]*(V|F)[\)\s]*$', '', op_limpia, flags=re.IGNORECASE).strip()
-                            opciones_limpias.append(op_limpia)
-                        
-                        pregunta_guardada = {
-                            'pregunta': limpiar_texto(pregunta_actual),
-                            'opciones': opciones_limpias,
-                            'correcta': respuesta_correcta,
-                            'tipo': 'opcion_multiple'
-                        }
-                        todas_las_preguntas.append({
-                            'pregunta': limpiar_texto(pregunta_actual),
-                            'opciones': opciones_limpias,
-                            'correcta': respuesta_correcta,
-                            'tipo': 'opcion_multiple'
-                        })
-                        subrayado_por_pregunta[pregunta_idx] = tiene_subrayado
-                        pregunta_idx += 1
-                    else:
-                        # Pregunta sin opciones → Verdadero/Falso
-                        # ORDEN: 1) Detectar V/F, 2) Limpiar ruido del enunciado (sin V/F)
-                        enunciado_limpio, respuesta_vf = detectar_vf_en_enunciado(limpiar_texto(pregunta_actual))
-                        # Aplicar limpieza de ruido al enunciado (sin V/F, ya fue eliminado)
-                        enunciado_limpio = limpiar_ruido_sin_vf(enunciado_limpio)
-                        respuesta_correcta = respuesta_vf if respuesta_vf is not None else 0
-                        vf_detectado_enunciado = respuesta_vf is not None
-                        
-                        todas_las_preguntas.append({
-                            'pregunta': enunciado_limpio,
-                            'opciones': [],
-                            'correcta': respuesta_correcta,
-                            'tipo': 'V/F',
-                            'vf_detectado_enunciado': vf_detectado_enunciado
-                        })
-                        subrayado_por_pregunta[pregunta_idx] = False
-                        pregunta_idx += 1
-                
-                # Nueva pregunta (resetear estado)
-                pregunta_actual = texto_completo
-                opciones_actuales = []
-                opciones_marcadas = []
-                estado_actual = "enunciado"
-                pregunta_cerrada = False
-                continue
-            
-            # 2. IDENTIFICADOR DE OPCIÓN: Si empieza por letra a-e, añadir a opciones
-            if es_opcion:
-                # Extraer la letra de la opción
-                match_opcion = patron_opcion.match(texto_completo)
-                if match_opcion:
-                    letra_opcion = match_opcion.group(1).lower()
-                    
-                    # LÍMITE ESTRICTO DE 4 OPCIONES: Solo aceptar a, b, c, d
-                    if letra_opcion == 'e' or (letra_opcion.isalpha() and ord(letra_opcion) > ord('d')):
-                        # Si ya tenemos 4 opciones, fusionar con la última (opción d)
-                        if len(opciones_actuales) >= 4:
-                            # Fusionar el texto con la opción d (índice 3)
-                            opcion_limpia = limpiar_etiqueta_opcion(texto_completo)
-                            opciones_actuales[3] += " " + opcion_limpia
-                            # Si está marcada, también marcar la opción d
-                            if marcado_linea:
-                                opciones_marcadas[3] = True
-                            continue
-                    
-                    # Cambiar a estado "opciones" si aún estábamos en "enunciado"
-                    if estado_actual == "enunciado":
-                        estado_actual = "opciones"
-                        # Si no había pregunta iniciada, ignorar esta opción
-                        # (Todas las preguntas deben empezar con número)
-                        if not pregunta_actual:
-                            continue
-                    
-                    # Nueva opción - Limpiar etiqueta (a., b), etc.)
-                    opcion_limpia = limpiar_etiqueta_opcion(texto_completo)
-                    
-                    # Detectar y limpiar V/F al final de la línea de la opción
-                    # Buscar V/F al final del texto de la opción
-                    vf_match = re.search(r'\s*[\(\-\s]*(V|F)[\)\s]*$', opcion_limpia, re.IGNORECASE)
-                    respuesta_vf_opcion = None
-                    if vf_match:
-                        vf_encontrado = vf_match.group(1).upper()
-                        opcion_limpia = opcion_limpia[:vf_match.start()].strip()
-                        # Marcar respuesta correcta: 0=a, 1=b, 2=c, 3=d
-                        # V corresponde a índice 0, F a índice 1 (pero esto es para V/F, no para opciones múltiples)
-                        # En opciones múltiples, si encontramos V/F, lo ignoramos o lo usamos como marcador
-                        # Por ahora, solo limpiamos el texto
-                    
-                    opciones_actuales.append(opcion_limpia)
-                    opciones_marcadas.append(marcado_linea)
-                    
-                    # NO CERRAR AUTOMÁTICAMENTE: La opción d) no cierra la pregunta
-                    # La pregunta solo se cerrará cuando se detecte una nueva pregunta válida
-                    continue
-            
-            # 3. ACUMULACIÓN PRIORITARIA: Si ya tenemos 4 opciones (incluyendo d), acumular a la opción d)
-            # REGLA DE ORO: Todo el texto después de la opción d) se acumula a ella a menos que sea nueva pregunta válida
-            if pregunta_actual and len(opciones_actuales) == 4 and estado_actual == "opciones":
-                # Verificar si es una nueva pregunta válida (patrón de número)
-                es_nueva_pregunta_valida = es_pregunta
-                
-                # Si NO es nueva pregunta válida, SIEMPRE acumular a la opción d)
-                if not es_nueva_pregunta_valida:
-                    # Acumular a opción d) sin excepciones (fuera o dentro del bloque)
-                    opciones_actuales[3] += " " + texto_completo
-                    # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
-                    if marcado_linea:
-                        opciones_marcadas[3] = True
-                    # La limpieza de ruido se aplicará al guardar la pregunta final
-                    continue
-                # Si es nueva pregunta válida, continuar con la lógica de guardar pregunta anterior
-            
-            # 4. ACUMULACIÓN DE TEXTO: Captura total según estado
-            # Solo procesar si no se procesó en las secciones anteriores
-            if pregunta_actual and not pregunta_cerrada:
-                # Si ya tenemos 4 opciones, solo acumular si no es nueva pregunta válida
-                # (esto evita duplicar el procesamiento de la sección 3)
-                if estado_actual == "opciones" and len(opciones_actuales) > 0:
-                    # Ya encontramos opciones → añadir a la última opción (CAPTURA TOTAL)
-                    # Si ya tenemos 4 opciones, añadir a la última (opción d) - FUSIÓN DE HUÉRFANOS
-                    if len(opciones_actuales) >= 4:
-                        # Solo acumular si no es nueva pregunta válida (ya se procesó en sección 3)
-                        if not es_pregunta:
-                            opciones_actuales[3] += " " + texto_completo
-                            # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
-                            if marcado_linea:
-                                opciones_marcadas[3] = True
-                    else:
-                        opciones_actuales[-1] += " " + texto_completo
-                        # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
-                        if marcado_linea:
-                            opciones_marcadas[-1] = True
-                else:
-                    # Aún no hay opciones → añadir al enunciado (CAPTURA TOTAL)
-                    pregunta_actual += " " + texto_completo
-    
-    # Guardar última pregunta (CLASIFICACIÓN FINAL)
-    if pregunta_actual and not pregunta_cerrada:
-        if len(opciones_actuales) > 0:
-            # Pregunta con opciones → Opción Múltiple
-            # Limitar a máximo 4 opciones si hay más
-            if len(opciones_actuales) > 4:
-                # Fusionar opciones adicionales con la última (opción d)
-                texto_extra = " ".join(opciones_actuales[4:])
-                opciones_actuales[3] += " " + texto_extra
-                opciones_actuales = opciones_actuales[:4]
-                opciones_marcadas = opciones_marcadas[:4]
-            
-            respuesta_correcta = 0
-            tiene_subrayado = False
-            for idx, esta_marcada in enumerate(opciones_marcadas):
-                if esta_marcada:
-                    respuesta_correcta = idx
-                    tiene_subrayado = True
-                    break
-            
-            # Limpiar etiquetas, V/F y ruido de todas las opciones
-            # También detectar V/F al final de cada opción para marcar respuesta correcta
-            opciones_limpias = []
-            for idx, op in enumerate(opciones_actuales):
-                op_limpia = limpiar_etiqueta_opcion(limpiar_texto(op))
-                # Aplicar limpieza de ruido (P139, V/F, referencias de página, etc.)
-                op_limpia = limpiar_ruido(op_limpia)
-                # Detectar V/F al final de la opción
-                vf_match = re.search(r'\s*[\(\-\s]*(V|F)[\)\s]*$', op_limpia, re.IGNORECASE)
-                if vf_match:
-                    # Si encontramos V/F, marcar esta opción como correcta
-                    # (aunque normalmente V/F se usa para preguntas V/F, aquí lo usamos como marcador)
-                    # Por ahora, solo limpiamos el texto
-                    op_limpia = op_limpia[:vf_match.start()].strip()
-                else:
-                    # Eliminar V/F al final de opciones (limpieza adicional)
-                    op_limpia = re.sub(r'\s*[\(\-\s]*(V|F)[\)\s]*$', '', op_limpia, flags=re.IGNORECASE).strip()
-                opciones_limpias.append(op_limpia)
-            
-            pregunta_guardada = {
-                'pregunta': limpiar_texto(pregunta_actual),
-                'opciones': opciones_limpias,
-                'correcta': respuesta_correcta,
-                'tipo': 'opcion_multiple'
-            }
-            todas_las_preguntas.append({
-                'pregunta': limpiar_texto(pregunta_actual),
-                'opciones': opciones_limpias,
-                'correcta': respuesta_correcta,
-                'tipo': 'opcion_multiple'
-            })
-            subrayado_por_pregunta[pregunta_idx] = tiene_subrayado
-        else:
-            # Pregunta sin opciones → Verdadero/Falso
-            # ORDEN: 1) Detectar V/F, 2) Limpiar ruido del enunciado (sin V/F)
-            enunciado_limpio, respuesta_vf = detectar_vf_en_enunciado(limpiar_texto(pregunta_actual))
-            # Aplicar limpieza de ruido al enunciado (sin V/F, ya fue eliminado)
-            enunciado_limpio = limpiar_ruido_sin_vf(enunciado_limpio)
-            respuesta_correcta = respuesta_vf if respuesta_vf is not None else 0
-            vf_detectado_enunciado = respuesta_vf is not None
-            
-            todas_las_preguntas.append({
-                'pregunta': enunciado_limpio,
-                'opciones': [],
-                'correcta': respuesta_correcta,
-                'tipo': 'V/F',
-                'vf_detectado_enunciado': vf_detectado_enunciado
-            })
-            subrayado_por_pregunta[pregunta_idx] = False
-    
-    doc.close()
-    
-    # Normalizar: asegurar que todas las preguntas tengan un tipo asignado
-    for pregunta in todas_las_preguntas:
-        if 'tipo' not in pregunta:
-            if len(pregunta.get('opciones', [])) > 0:
-                pregunta['tipo'] = 'opcion_multiple'
-            else:
-                pregunta['tipo'] = 'V/F'
-    
-    # Ya no se reorganizan casos automáticamente - el usuario los creará y agrupará manualmente
-    return todas_las_preguntas, subrayado_por_pregunta
-
-
-def aplanar_preguntas_con_casos(preguntas_estructuradas):
-    """
-    Convierte la estructura de preguntas con casos agrupados en una lista plana.
-    Útil para contar preguntas totales, etc.
-    Asigna el campo 'caso' a cada pregunta que pertenece a un caso.
-    """
-    preguntas_planas = []
-    for item in preguntas_estructuradas:
-        if item.get('tipo') == 'caso':
-            numero_caso = item.get('numero_caso', '')
-            # Asegurar que cada pregunta del caso tenga el campo 'caso' asignado
-            for pregunta in item.get('preguntas_caso', []):
-                # Asignar el campo 'caso' si no existe o actualizarlo si es necesario
-                if 'caso' not in pregunta or pregunta.get('caso') != numero_caso:
-                    pregunta['caso'] = numero_caso
-                preguntas_planas.append(pregunta)
-        else:
-            preguntas_planas.append(item)
-    return preguntas_planas
-
-
-def desordenar_preguntas_para_test(preguntas_planas: List[Dict]) -> tuple:
+def desordenar_preguntas_para_test(preguntas_planas: List[Dict], sin_duplicados: bool = False) -> tuple:
     """
     Desordena solo las preguntas para el modo test (NO desordena las opciones).
+    sin_duplicados: deja solo la primera de cada grupo de preguntas casi duplicadas
+    (ver duplicados.buscar_duplicados); el mapeo sigue apuntando a los índices originales.
     Retorna:
     - preguntas_desordenadas: lista de preguntas desordenadas (opciones sin desordenar)
     - mapeo_indices: dict {índice_desordenado: índice_original}
@@ -1143,7 +521,10 @@ def desordenar_preguntas_para_test(preguntas_planas: List[Dict]) -> tuple:
     preguntas_copia = copy.deepcopy(preguntas_planas)
     
     # Desordenar solo las preguntas (NO las opciones)
-    indices_originales = list(range(len(preguntas_copia)))
+    if sin_duplicados:
+        indices_originales = indices_sin_duplicados(preguntas_copia)
+    else:
+        indices_originales = list(range(len(preguntas_copia)))
     random.shuffle(indices_originales)
     
     preguntas_desordenadas = [preguntas_copia[i] for i in indices_originales]
@@ -1155,6 +536,102 @@ def desordenar_preguntas_para_test(preguntas_planas: List[Dict]) -> tuple:
     return preguntas_desordenadas, mapeo_indices, mapeo_opciones
 
 
+def mostrar_pregunta_vista_previa(pregunta_data, numero: int, tiene_subrayado: bool):
+    """
+    Muestra una pregunta recién extraída en modo solo lectura mientras el PDF se sigue procesando.
+    La revisión editable completa se muestra al terminar la extracción.
+    """
+    es_vf = pregunta_data.get('tipo') == 'V/F' or len(pregunta_data.get('opciones', [])) == 0
+    emoji_tipo = "✓/✗" if es_vf else "A/B/C/D"
+    tiene_respuesta = tiene_subrayado or pregunta_data.get('vf_detectado_enunciado', False)
+    estado_emoji = "✅" if tiene_respuesta else "⚠️"
+    
+    st.markdown(f"{estado_emoji} **Pregunta {numero}** [{emoji_tipo}] {pregunta_data.get('pregunta', '')}")
+    for opcion_idx, opcion_texto in enumerate(pregunta_data.get('opciones', [])):
+        letra_opcion = chr(65 + opcion_idx)
+        if tiene_subrayado and opcion_idx == pregunta_data.get('correcta'):
+            st.markdown(f"- **{letra_opcion}. {opcion_texto}**")
+        else:
+            st.markdown(f"- {letra_opcion}. {opcion_texto}")
+
+
+def mostrar_panel_ruido_aprendido(datos_ruido: Dict):
+    """
+    Panel de la barra lateral con los encabezados y pies aprendidos del último PDF
+    (ReglasRuidoDocumento.a_dict()), que se han descartado además del ruido conocido.
+    """
+    with st.expander(f"🧹 Encabezados/pies detectados ({len(datos_ruido['lineas'])})", expanded=False):
+        st.caption(f"Líneas repetidas en los márgenes de {datos_ruido['paginas_muestra']} páginas analizadas")
+        for linea in datos_ruido['lineas']:
+            zona = "Encabezado" if linea['zona'] == 'sup' else "Pie"
+            st.markdown(f"- **{zona}** ({linea['paginas']} págs.): `{linea['ejemplo']}`")
+
+
+def mostrar_panel_perfil_extraccion(datos_perfil: Dict):
+    """
+    Panel de la barra lateral con el perfil de la última extracción (PerfilExtraccion.a_dict()):
+    tiempo y llamadas por etapa, páginas más lentas y descarga del perfil completo en JSON.
+    """
+    with st.expander("⏱️ Perfil de extracción", expanded=False):
+        total = sum(valores['segundos'] for valores in datos_perfil['etapas'].values())
+        st.caption(f"{datos_perfil['num_paginas']} páginas · {total:.2f} s en etapas · "
+                   f"agrupado de líneas: {datos_perfil['motor_lineas']}")
+        st.table([
+            {
+                'Etapa': etapa,
+                'Segundos': f"{valores['segundos']:.3f}",
+                '%': f"{100 * valores['segundos'] / total:.1f}" if total else "0.0",
+                'Llamadas': valores['llamadas'],
+            }
+            for etapa, valores in datos_perfil['etapas'].items()
+        ])
+        if datos_perfil['paginas_mas_lentas']:
+            st.markdown("**Páginas más lentas**")
+            st.table([
+                {'Página': pagina['pagina'], 'Segundos': f"{pagina['segundos']:.3f}"}
+                for pagina in datos_perfil['paginas_mas_lentas']
+            ])
+        st.download_button(
+            label="⬇️ Descargar perfil JSON",
+            data=json.dumps(datos_perfil, ensure_ascii=False, indent=2),
+            file_name=f"perfil_extraccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            use_container_width=True,
+            key="btn_descargar_perfil_extraccion"
+        )
+
+
+def huella_preguntas(preguntas_planas: List[Dict]) -> int:
+    """Huella de los textos que compara buscar_duplicados (enunciado y opciones de cada pregunta)."""
+    return hash(tuple((p.get('pregunta') or '', tuple(p.get('opciones') or ())) for p in preguntas_planas))
+
+
+def obtener_duplicados_revision(preguntas_planas: List[Dict]) -> tuple[Dict[int, List[int]], Dict[int, List[tuple]]]:
+    """
+    Preguntas casi duplicadas del examen en revisión: (índice -> otras preguntas de su grupo,
+    índice -> [((título, número), similitud)] en la biblioteca si ya se indexó).
+    Se guardan en la sesión con la huella de las preguntas y el índice de la biblioteca con que
+    se calcularon: solo se recalculan cuando una edición o un nuevo análisis cambia los textos
+    (o cambia el índice), no en cada rerun de Streamlit.
+    """
+    huella = huella_preguntas(preguntas_planas)
+    indice_biblioteca = st.session_state.indice_duplicados_biblioteca
+    guardado = st.session_state.duplicados_revision
+    if guardado is not None and guardado[0] == huella and guardado[1] is indice_biblioteca:
+        return guardado[2], guardado[3]
+    
+    duplicadas_de = {}
+    for grupo in buscar_duplicados(preguntas_planas):
+        for idx in grupo:
+            duplicadas_de[idx] = [otro for otro in grupo if otro != idx]
+    en_biblioteca = {}
+    if indice_biblioteca is not None:
+        similares = indice_biblioteca.similares(preguntas_planas)
+        en_biblioteca = {idx: encontradas for idx, encontradas in enumerate(similares) if encontradas}
+    st.session_state.duplicados_revision = (huella, indice_biblioteca, duplicadas_de, en_biblioteca)
+    return duplicadas_de, en_biblioteca
+
+
 def mostrar_modo_revision():
     """
     Interfaz compacta de revisión con vista por defecto optimizada.
@@ -1169,8 +646,11 @@ def mostrar_modo_revision():
         st.warning("No hay preguntas para revisar.")
         return
     
+    # Preguntas casi duplicadas dentro del examen y, si ya se pidió, en la biblioteca
+    duplicadas_de, en_biblioteca = obtener_duplicados_revision(preguntas_planas)
+    
     # Estadísticas rápidas compactas
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Total", len(preguntas_planas))
     with col2:
@@ -1179,6 +659,19 @@ def mostrar_modo_revision():
     with col3:
         preguntas_opcion_multiple = sum(1 for p in preguntas_planas if len(p.get('opciones', [])) > 0)
         st.metric("A/B/C/D", preguntas_opcion_multiple)
+    with col4:
+        st.metric("🔁 Repetidas", len(duplicadas_de),
+                  help="Preguntas casi iguales a otra del examen (enunciado y opciones)")
+    
+    if st.session_state.indice_duplicados_biblioteca is None:
+        if st.button("🔎 Buscar repetidas en la biblioteca", key="btn_duplicados_biblioteca",
+                     help="Compara cada pregunta con todas las de los exámenes guardados"):
+            with st.spinner("Indexando las preguntas de la biblioteca..."):
+                obtener_indice_duplicados_biblioteca()
+            st.rerun()
+    else:
+        st.caption(f"🔎 {len(en_biblioteca)} pregunta(s) ya están en la biblioteca "
+                   f"({len(st.session_state.indice_duplicados_biblioteca)} preguntas indexadas)")
     
     # Lista de preguntas con diseño compacto usando expanders (todos abiertos por defecto)
     preguntas_sin_respuesta = []
@@ -1234,22 +727,29 @@ def mostrar_modo_revision():
                 # Mostrar todas las preguntas del caso
                 for pregunta_idx_local, pregunta_data in enumerate(preguntas_caso):
                     pregunta_global_idx += 1
-                    mostrar_pregunta_revision(pregunta_data, pregunta_global_idx - 1, pregunta_idx_local, numero_caso, preguntas)
+                    mostrar_pregunta_revision(pregunta_data, pregunta_global_idx - 1, pregunta_idx_local, numero_caso, preguntas,
+                                              duplicadas_de.get(pregunta_global_idx - 1),
+                                              en_biblioteca.get(pregunta_global_idx - 1))
         else:
             # Pregunta normal (sin caso)
             pregunta_data = item
             pregunta_global_idx += 1
-            mostrar_pregunta_revision(pregunta_data, pregunta_global_idx - 1, None, None, preguntas)
+            mostrar_pregunta_revision(pregunta_data, pregunta_global_idx - 1, None, None, preguntas,
+                                      duplicadas_de.get(pregunta_global_idx - 1),
+                                      en_biblioteca.get(pregunta_global_idx - 1))
     
     # Mostrar resumen y acciones finales
     mostrar_modo_revision_completo()
 
 
-def mostrar_pregunta_revision(pregunta_data, idx_global, idx_local, numero_caso, preguntas=None):
+def mostrar_pregunta_revision(pregunta_data, idx_global, idx_local, numero_caso, preguntas=None,
+                              duplicada_de: Optional[List[int]] = None, en_biblioteca: Optional[List[tuple]] = None):
     """
     Muestra una pregunta individual en el modo revisión.
     Si idx_local y numero_caso no son None, la pregunta pertenece a un caso.
     preguntas: referencia a la lista de preguntas para poder modificarla.
+    duplicada_de: índices globales de las preguntas del examen casi iguales a esta.
+    en_biblioteca: ((título, número), similitud) de las preguntas casi iguales de la biblioteca.
     """
     if preguntas is None:
         preguntas = st.session_state.preguntas
@@ -1271,6 +771,8 @@ def mostrar_pregunta_revision(pregunta_data, idx_global, idx_local, numero_caso,
     enunciado_preview = enunciado[:60] + "..." if len(enunciado) > 60 else enunciado
     emoji_tipo = "✓/✗" if es_vf else "A/B/C/D"
     estado_emoji = "✅" if tiene_respuesta else "⚠️"
+    if duplicada_de or en_biblioteca:
+        estado_emoji += "🔁"
     
     # Si pertenece a un caso, mostrar numeración relativa
     if numero_caso and idx_local is not None:
@@ -1281,6 +783,13 @@ def mostrar_pregunta_revision(pregunta_data, idx_global, idx_local, numero_caso,
     
     # TODOS LOS EXPANDERS ABIERTOS POR DEFECTO
     with st.expander(titulo_expander, expanded=True):
+        if duplicada_de:
+            st.warning("🔁 Posible duplicada de la(s) pregunta(s) " + ", ".join(str(idx + 1) for idx in duplicada_de))
+        if en_biblioteca:
+            st.info("📚 Ya en la biblioteca: " + "; ".join(
+                f"{titulo} (pregunta {numero}, {similitud:.0%})" for (titulo, numero), similitud in en_biblioteca[:3]
+            ))
+        
         # Botones de acción: Editar, Borrar, Añadir antes, Añadir después, Crear caso
         col_edit, col_delete, col_add_before, col_add_after, col_crear_caso, col_spacer = st.columns([1, 1, 1, 1, 1, 1])
         with col_edit:
@@ -1637,11 +1146,11 @@ def mostrar_modo_revision_completo():
             elif len(preguntas_planas) == 0:
                 st.error("❌ No hay preguntas para guardar.")
             else:
-                with st.spinner("📤 Subiendo examen a GitHub..."):
+                with st.spinner("📤 Subiendo examen a la biblioteca..."):
                     if guardar_examen_github(titulo, descripcion, preguntas_planas):
-                        st.success(f"✅ Examen '{titulo}' guardado exitosamente en GitHub!")
+                        st.success(f"✅ Examen '{titulo}' guardado exitosamente en la biblioteca!")
                         st.balloons()
-                        st.info("💡 El examen se ha subido a la carpeta /biblioteca de tu repositorio de GitHub.")
+                        st.info(f"💡 El examen se ha guardado en {obtener_almacen_biblioteca().descripcion()}.")
                         # Marcar que el examen se guardó exitosamente y volver al inicio
                         st.session_state.examen_guardado_exitosamente = True
                         # Limpiar estado y volver al inicio
@@ -1656,7 +1165,7 @@ def mostrar_modo_revision_completo():
                         st.session_state.vista_actual = 'inicio'
                         st.rerun()
                     else:
-                        st.error("❌ Error al guardar el examen en GitHub. Verifica la configuración de st.secrets.")
+                        st.error("❌ Error al guardar el examen en la biblioteca. Verifica la configuración de st.secrets.")
                         st.session_state.examen_guardado_exitosamente = False
     
     # Botón de exportación JSON
@@ -1676,11 +1185,30 @@ def mostrar_modo_revision_completo():
 
 def mostrar_biblioteca():
     """
-    Muestra la biblioteca de exámenes guardados en GitHub con opción de cargar.
+    Muestra la biblioteca de exámenes guardados (GitHub o el almacén configurado) con opción de cargar.
     """
-    with st.spinner("📥 Cargando exámenes desde GitHub..."):
+    # El índice se mantiene al guardar/eliminar; si se editó la carpeta a mano puede desincronizarse
+    if st.button("🔄 Reconstruir índice", key="btn_reconstruir_indice",
+                 help="Vuelve a leer los exámenes guardados y regenera el índice de la biblioteca"):
+        with st.spinner("Reconstruyendo el índice de la biblioteca..."):
+            num_examenes = reconstruir_indice_biblioteca()
+        if num_examenes is not None:
+            st.success(f"✅ Índice reconstruido: {num_examenes} exámenes")
+    
+    with st.spinner("📥 Cargando exámenes de la biblioteca..."):
         examenes = obtener_examenes_github()
     
+    estadisticas_github = estadisticas_cliente()
+    if estadisticas_github['creados']:
+        estadisticas_cache = estadisticas_cache_github()
+        st.caption(f"🔌 Cliente de GitHub compartido: {estadisticas_github['creados']} clientes creados, "
+                   f"reutilizado {estadisticas_github['reutilizados']} veces · "
+                   f"🗄️ Caché: índice {estadisticas_cache['aciertos_ttl']} aciertos + "
+                   f"{estadisticas_cache['no_modificadas_304']} revalidados (304) / "
+                   f"{estadisticas_cache['descargas_api']} descargas · exámenes {estadisticas_cache['aciertos_blob']} "
+                   f"aciertos ({estadisticas_cache['aciertos_espejo']} del espejo en disco) / "
+                   f"{estadisticas_cache['fallos_blob']} descargas")
+    
     if not examenes:
         st.markdown("---")
         st.warning("📭 **No hay exámenes guardados en la biblioteca aún.**")
@@ -1703,6 +1231,9 @@ def mostrar_biblioteca():
             Asegúrate de tener configurado en **Streamlit Secrets**:
             - `GITHUB_TOKEN`: Tu Personal Access Token
             - `REPO_NAME`: Nombre completo del repositorio
+            
+            O guarda la biblioteca en este servidor con `BIBLIOTECA_BACKEND`
+            = `local` (`BIBLIOTECA_DIRECTORIO`) o `sqlite` (`BIBLIOTECA_SQLITE`).
             """)
     else:
         # Estadísticas generales
@@ -1730,7 +1261,7 @@ def mostrar_biblioteca():
                 # Botón de acción (solo cargar)
                 if st.button("📥 Cargar Examen", key=f"cargar_{idx}", use_container_width=True, type="primary"):
                     with st.spinner("Cargando examen..."):
-                        preguntas_cargadas = cargar_examen_github(examen['ruta'])
+                        preguntas_cargadas = cargar_examen_github(examen['ruta'], examen['sha'])
                     if preguntas_cargadas:
                         st.session_state.preguntas = preguntas_cargadas
                         st.session_state.pregunta_actual = 0
@@ -1745,7 +1276,9 @@ def mostrar_biblioteca():
                         # Desordenar preguntas al cargar desde biblioteca
                         preguntas_estructuradas = preguntas_cargadas
                         preguntas_planas_para_test = aplanar_preguntas_con_casos(preguntas_estructuradas)
-                        preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(preguntas_planas_para_test)
+                        preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(
+                            preguntas_planas_para_test, st.session_state.test_sin_duplicados
+                        )
                         st.session_state.preguntas_desordenadas_test = preguntas_desordenadas
                         st.session_state.mapeo_indices_preguntas = mapeo_indices
                         st.session_state.mapeo_opciones_preguntas = mapeo_opciones
@@ -1753,7 +1286,7 @@ def mostrar_biblioteca():
                         st.session_state.vista_actual = 'test'
                         st.rerun()
                     else:
-                        st.error("❌ Error al cargar el examen desde GitHub.")
+                        st.error("❌ Error al cargar el examen de la biblioteca.")
 
 
 def mostrar_vista_revision():
@@ -1785,13 +1318,23 @@ def mostrar_vista_revision():
         mostrar_modo_revision()
 
 
+def reiniciar_test_desordenado():
+    """Reinicia el test para que se vuelva a desordenar (p. ej. al omitir o no las duplicadas)."""
+    st.session_state.preguntas_desordenadas_test = []
+    st.session_state.pregunta_actual = 0
+    st.session_state.respuestas_usuario = {}
+    st.session_state.verificaciones = {}
+
+
 def mostrar_vista_test():
     """
     Muestra la vista del modo test.
     """
     # Actualizar estadísticas del progreso en el sidebar (solo si se puede realizar el test)
     with st.sidebar:
-        preguntas_planas_stats = aplanar_preguntas_con_casos(st.session_state.preguntas)
+        # Las del test en curso (sin las duplicadas omitidas) o, si aún no se ha desordenado, todas
+        preguntas_planas_stats = (st.session_state.preguntas_desordenadas_test
+                                  or aplanar_preguntas_con_casos(st.session_state.preguntas))
         total = len(preguntas_planas_stats)
         idx_actual = st.session_state.pregunta_actual
         
@@ -1814,7 +1357,7 @@ def mostrar_vista_test():
         respuestas_completadas = len([k for k in st.session_state.respuestas_usuario.keys() 
                                          if k < total])
         st.metric("Respondidas", respuestas_completadas)
-            
+        
         if respuestas_completadas > 0:
             verificadas = len(st.session_state.verificaciones)
             correctas = sum(1 for v in st.session_state.verificaciones.values() if v)
@@ -1833,6 +1376,13 @@ def mostrar_vista_test():
             st.session_state.respuestas_usuario = {}
             st.session_state.verificaciones = {}
             st.rerun()
+        
+        st.checkbox(
+            "🔁 Omitir preguntas repetidas",
+            key="test_sin_duplicados",
+            on_change=reiniciar_test_desordenado,
+            help="Deja una sola pregunta de cada grupo de preguntas casi iguales (reinicia el test)"
+        )
     
     # Área principal
     if not st.session_state.preguntas:
@@ -1853,7 +1403,9 @@ def mostrar_vista_test():
         # Aplanar preguntas para el test (incluye preguntas de casos)
         preguntas_planas_originales = aplanar_preguntas_con_casos(preguntas_estructuradas)
         # Desordenar las preguntas
-        preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(preguntas_planas_originales)
+        preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(
+            preguntas_planas_originales, st.session_state.test_sin_duplicados
+        )
         st.session_state.preguntas_desordenadas_test = preguntas_desordenadas
         st.session_state.mapeo_indices_preguntas = mapeo_indices
         st.session_state.mapeo_opciones_preguntas = mapeo_opciones
@@ -2026,7 +1578,9 @@ def mostrar_vista_test():
             with col_reiniciar:
                 if st.button("🔄 Reiniciar y Desordenar de Nuevo", use_container_width=True, type="primary"):
                     preguntas_planas_originales = aplanar_preguntas_con_casos(preguntas_estructuradas)
-                    preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(preguntas_planas_originales)
+                    preguntas_desordenadas, mapeo_indices, mapeo_opciones = desordenar_preguntas_para_test(
+                        preguntas_planas_originales, st.session_state.test_sin_duplicados
+                    )
                     st.session_state.preguntas_desordenadas_test = preguntas_desordenadas
                     st.session_state.mapeo_indices_preguntas = mapeo_indices
                     st.session_state.mapeo_opciones_preguntas = mapeo_opciones
@@ -2045,7 +1599,7 @@ def mostrar_vista_test():
                         st.rerun()
                     else:
                         st.info("📝 Has llegado al final del examen.")
-            
+        
         
         # Resumen al final (solo si todas las preguntas están contestadas)
         if todas_contestadas and idx_actual == len(preguntas_planas) - 1:
@@ -2136,6 +1690,9 @@ def main():
         # Vista de revisión: cargar PDF y revisar
         st.title("📝 Revisión de Examen")
         
+        # Contenedor para ir mostrando las preguntas mientras se procesa el PDF
+        vista_previa = st.container()
+        
         # Sidebar solo para cargar PDF
         with st.sidebar:
             st.header("📁 Cargar PDF")
@@ -2145,32 +1702,69 @@ def main():
                 help="PDF con preguntas de opción múltiple",
                 key="file_uploader_revision"
             )
+            perfilar = st.checkbox(
+                "⏱️ Perfilar extracción",
+                value=str(obtener_configuracion("PERFILAR_EXTRACCION", "")).lower() in ("1", "true", "si", "sí"),
+                help="Mide el tiempo de cada etapa y página (ignora la caché de extracción)",
+                key="perfilar_extraccion"
+            )
             
             if uploaded_file is not None:
                 if not st.session_state.pdf_cargado or st.session_state.preguntas == []:
-                    with st.spinner("Procesando PDF..."):
+                    barra_progreso = st.progress(0.0, text="Procesando PDF...")
+                    preguntas_mostradas = []
+                    perfil = PerfilExtraccion() if perfilar else None
+                    st.session_state.ruido_aprendido = None
+                    st.session_state.layout_pdf = None
+                    
+                    def al_aprender_ruido(ruido):
+                        st.session_state.ruido_aprendido = ruido
+                    
+                    def al_avanzar(paginas_procesadas, num_paginas, preguntas_cerradas):
+                        # Progreso por páginas y vista previa de las preguntas ya terminadas
+                        barra_progreso.progress(
+                            paginas_procesadas / max(num_paginas, 1),
+                            text=f"Procesando página {paginas_procesadas}/{num_paginas}..."
+                        )
+                        with vista_previa:
+                            for pregunta_data, tiene_subrayado in preguntas_cerradas:
+                                preguntas_mostradas.append(pregunta_data)
+                                mostrar_pregunta_vista_previa(pregunta_data, len(preguntas_mostradas), tiene_subrayado)
+                    
+                    if uploaded_file.size >= obtener_umbral_baja_memoria():
+                        # PDF grande: trabajar desde un fichero temporal, página a página
+                        ruta_pdf = volcar_pdf_temporal(uploaded_file)
+                        try:
+                            preguntas_extraidas, subrayado_info = extraer_preguntas_pdf(
+                                ruta_pdf, al_avanzar=al_avanzar, baja_memoria=True, perfil=perfil,
+                                al_aprender_ruido=al_aprender_ruido
+                            )
+                        finally:
+                            os.remove(ruta_pdf)
+                    else:
                         pdf_bytes = uploaded_file.read()
-                        preguntas_extraidas, subrayado_info = extraer_texto_con_subrayado(pdf_bytes)
-                        
-                        if preguntas_extraidas:
-                            st.session_state.preguntas = preguntas_extraidas
-                            st.session_state.subrayado_detectado = subrayado_info
-                            st.session_state.pregunta_actual = 0
-                            st.session_state.respuestas_usuario = {}
-                            st.session_state.verificaciones = {}
-                            st.session_state.pdf_cargado = True
-                            st.session_state.examen_subido_por_usuario = True
-                            st.session_state.modo_revision = True
-                            st.session_state.revision_completada = False
-                            st.session_state.examen_guardado_exitosamente = False
-                            st.session_state.preguntas_desordenadas_test = []
-                            st.rerun()
-                        else:
-                            st.error("❌ No se pudieron extraer preguntas")
+                        preguntas_extraidas, subrayado_info = extraer_preguntas_pdf(
+                            pdf_bytes, al_avanzar=al_avanzar, perfil=perfil, al_aprender_ruido=al_aprender_ruido
+                        )
+                    barra_progreso.empty()
+                    st.session_state.perfil_extraccion = perfil.a_dict() if perfil is not None else None
+                    
+                    if preguntas_extraidas:
+                        cargar_preguntas_extraidas(preguntas_extraidas, subrayado_info)
+                        st.rerun()
+                    else:
+                        st.error("❌ No se pudieron extraer preguntas")
+            
+            mostrar_ajustes_analisis()
+            if st.session_state.ruido_aprendido:
+                mostrar_panel_ruido_aprendido(st.session_state.ruido_aprendido)
+            if st.session_state.perfil_extraccion:
+                mostrar_panel_perfil_extraccion(st.session_state.perfil_extraccion)
             
             # Botón para volver al inicio
             if st.button("🏠 Volver al Inicio", use_container_width=True, key="btn_volver_inicio_revision"):
                 st.session_state.vista_actual = 'inicio'
+                st.session_state.layout_pdf = None
                 st.session_state.preguntas = []
                 st.session_state.pregunta_actual = 0
                 st.session_state.respuestas_usuario = {}
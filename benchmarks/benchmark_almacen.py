@@ -0,0 +1,108 @@
+"""
+Benchmark de los almacenes locales de la biblioteca (almacen_biblioteca.py).
+
+Llena un AlmacenLocal y un AlmacenSQLite en un directorio temporal con copias del examen de
+biblioteca/ (o exámenes sintéticos si no está) y, para cada número de exámenes, mide:
+    - listar: la vista de la biblioteca (solo metadatos)
+    - cargar: el JSON completo de un examen, como el botón "Cargar Examen"
+    - guardar: publicar un examen (escritura + índice)
+Con el almacén de GitHub cada una de estas operaciones es al menos una petición HTTPS.
+
+Uso:
+    python benchmarks/benchmark_almacen.py [--examenes 10 100 1000] [--repeticiones 200]
+        [--salida resultados_benchmark_almacen.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+from almacen_biblioteca import AlmacenLocal, AlmacenSQLite  # noqa: E402
+from examenes import CARPETA_BIBLIOTECA, construir_examen  # noqa: E402
+from indice_biblioteca import es_archivo_examen  # noqa: E402
+
+
+def preguntas_de_ejemplo() -> list:
+    """Preguntas del primer examen de biblioteca/, o 300 sintéticas si no hay ninguno."""
+    for ruta in sorted(glob.glob(os.path.join(RAIZ_REPO, CARPETA_BIBLIOTECA, "*.json"))):
+        if es_archivo_examen(os.path.basename(ruta)):
+            with open(ruta, encoding="utf-8") as f:
+                return json.load(f).get('preguntas', [])
+    return [{'pregunta': f"{n}. Enunciado de la pregunta {n}", 'opciones': ["a", "b", "c", "d"],
+             'correcta': n % 4, 'tipo': 'opcion_multiple'} for n in range(1, 301)]
+
+
+def _medir(funcion, repeticiones: int) -> float:
+    """Mediana de la duración de funcion() en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir_almacen(almacen, num_examenes: int, preguntas: list, repeticiones: int) -> dict:
+    t0 = time.perf_counter()
+    for n in range(num_examenes):
+        almacen.guardar(construir_examen(f"Examen {n:05d}", f"Copia {n}", preguntas))
+    segundos_llenar = time.perf_counter() - t0
+
+    examenes = almacen.listar()
+    assert len(examenes) == num_examenes
+    examen = examenes[len(examenes) // 2]
+    return {
+        "examenes": num_examenes,
+        "segundos_llenar": segundos_llenar,
+        "ms_listar": _medir(almacen.listar, repeticiones),
+        "ms_cargar": _medir(lambda: almacen.cargar(examen['ruta'], examen['sha']), repeticiones),
+        "ms_guardar": _medir(lambda: almacen.guardar(construir_examen("Examen extra", "Extra", preguntas)),
+                             max(1, repeticiones // 10)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examenes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Número de exámenes de cada medida")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones de cada operación")
+    parser.add_argument("--salida", default="resultados_benchmark_almacen.json", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    preguntas = preguntas_de_ejemplo()
+    resultados = []
+    for num_examenes in args.examenes:
+        with tempfile.TemporaryDirectory() as directorio:
+            almacenes = {
+                "local": AlmacenLocal(os.path.join(directorio, CARPETA_BIBLIOTECA)),
+                "sqlite": AlmacenSQLite(os.path.join(directorio, "biblioteca.db")),
+            }
+            for nombre, almacen in almacenes.items():
+                medidas = medir_almacen(almacen, num_examenes, preguntas, args.repeticiones)
+                medidas["almacen"] = nombre
+                resultados.append(medidas)
+                print(f"{nombre:>6} {num_examenes:>5} exámenes: listar {medidas['ms_listar']:.3f} ms | "
+                      f"cargar {medidas['ms_cargar']:.3f} ms | guardar {medidas['ms_guardar']:.3f} ms")
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "preguntas_por_examen": len(preguntas),
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark de la detección de preguntas casi duplicadas (duplicados.py) sobre preguntas sintéticas.
+
+Genera preguntas con el vocabulario de benchmark_extraccion (opción múltiple y V/F) y añade
+variantes de una fracción de ellas con pequeños cambios de redacción (una palabra cambiada,
+mayúsculas, otra numeración y signos de puntuación), como las preguntas de años anteriores
+que reaparecen en los exámenes. Para cada tamaño mide:
+    - buscar_duplicados sobre todas las preguntas (firmas + LSH + verificación)
+    - consulta de las variantes contra un IndiceDuplicados con las originales (la biblioteca)
+y comprueba cuántas de las variantes se detectan y cuántos grupos sobran (falsos positivos).
+
+Uso:
+    python benchmarks/benchmark_duplicados.py [--preguntas 1000 10000 50000] [--fraccion-variantes 0.1]
+        [--salida resultados_benchmark_duplicados.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+import duplicados  # noqa: E402
+from duplicados import IndiceDuplicados, buscar_duplicados  # noqa: E402
+from benchmark_extraccion import PALABRAS  # noqa: E402
+
+
+def _frase(rng: random.Random, minimo: int, maximo: int) -> str:
+    return " ".join(rng.choice(PALABRAS) for _ in range(rng.randint(minimo, maximo)))
+
+
+def generar_preguntas(num_preguntas: int, fraccion_variantes: float, semilla: int) -> tuple:
+    """
+    Retorna (originales, variantes, pares): las variantes son copias retocadas de una pregunta
+    original y pares los (índice original, índice de la variante en originales + variantes).
+    """
+    rng = random.Random(semilla)
+    originales = []
+    for numero in range(1, num_preguntas + 1):
+        opciones = [_frase(rng, 3, 12) for _ in range(4)] if rng.random() < 0.7 else []
+        originales.append({'pregunta': f"{numero}. {_frase(rng, 10, 28)}:", 'opciones': opciones})
+
+    variantes = []
+    pares = []
+    for idx in rng.sample(range(num_preguntas), int(num_preguntas * fraccion_variantes)):
+        palabras = originales[idx]['pregunta'].split()[1:]
+        palabras[rng.randrange(len(palabras))] = rng.choice(PALABRAS)
+        variantes.append({
+            'pregunta': f"{rng.randint(1, 60)}- " + " ".join(palabras).upper().rstrip(":") + "?",
+            'opciones': [op.capitalize() + "." for op in originales[idx]['opciones']],
+        })
+        pares.append((idx, num_preguntas + len(variantes) - 1))
+    return originales, variantes, pares
+
+
+def medir_tamano(num_preguntas: int, args) -> dict:
+    originales, variantes, pares = generar_preguntas(num_preguntas, args.fraccion_variantes, args.semilla)
+    todas = originales + variantes
+
+    t0 = time.perf_counter()
+    grupos = buscar_duplicados(todas)
+    segundos_grupos = time.perf_counter() - t0
+    grupo_de = {idx: n for n, grupo in enumerate(grupos) for idx in grupo}
+    detectadas = sum(1 for i, j in pares if i in grupo_de and grupo_de.get(i) == grupo_de.get(j))
+
+    t0 = time.perf_counter()
+    indice = IndiceDuplicados()
+    indice.agregar(originales)
+    segundos_indice = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    similares = indice.similares(variantes)
+    segundos_consulta = time.perf_counter() - t0
+    encontradas = sum(1 for (i, _), encontradas in zip(pares, similares) if any(c == i for c, _ in encontradas))
+
+    return {
+        "preguntas": len(todas),
+        "variantes": len(variantes),
+        "segundos_buscar_duplicados": segundos_grupos,
+        "variantes_agrupadas": detectadas,
+        "grupos": len(grupos),
+        "grupos_sin_variante": len(grupos) - detectadas,
+        "segundos_indexar_originales": segundos_indice,
+        "segundos_consultar_variantes": segundos_consulta,
+        "variantes_encontradas_en_indice": encontradas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preguntas", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Número de preguntas originales de cada medida")
+    parser.add_argument("--fraccion-variantes", type=float, default=0.1,
+                        help="Fracción de preguntas de las que se añade una variante (0-1)")
+    parser.add_argument("--semilla", type=int, default=7, help="Semilla del generador")
+    parser.add_argument("--salida", default="resultados_benchmark_duplicados.json", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    if not 0 <= args.fraccion_variantes <= 1:
+        parser.error("--fraccion-variantes debe estar entre 0 y 1")
+
+    resultados = []
+    for num_preguntas in args.preguntas:
+        medidas = medir_tamano(num_preguntas, args)
+        resultados.append(medidas)
+        print(f"{medidas['preguntas']:>6} preguntas: buscar_duplicados {medidas['segundos_buscar_duplicados']:.3f}s | "
+              f"variantes agrupadas {medidas['variantes_agrupadas']}/{medidas['variantes']} | "
+              f"grupos de más {medidas['grupos_sin_variante']}")
+        print(f"        índice {medidas['segundos_indexar_originales']:.3f}s | "
+              f"consulta {medidas['segundos_consultar_variantes']:.3f}s | "
+              f"encontradas {medidas['variantes_encontradas_en_indice']}/{medidas['variantes']}")
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "numpy": duplicados.np is not None,
+        "parametros": {
+            "num_permutaciones": duplicados.NUM_PERMUTACIONES,
+            "filas_por_banda": duplicados.FILAS_POR_BANDA,
+            "umbral": duplicados.UMBRAL_DUPLICADO,
+            "fraccion_variantes": args.fraccion_variantes,
+            "semilla": args.semilla,
+        },
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark de la carga de exámenes grandes (bancos de preguntas de varios años en un examen).
+
+Para exámenes de --preguntas preguntas en cada formato (examenes.codificar_examen) compara:
+    - antes: la API de contenidos (el texto base64 entero, decodificado a bytes y json.loads)
+    - flujo: el blob en crudo por trozos de TAM_TROZO_DESCARGA, interpretado a medida que llega
+      (examenes.decodificar_examen_flujo, como abrir_blob de cache_github)
+midiendo el tiempo y el pico de memoria (tracemalloc) de construir la lista de preguntas. El
+pico incluye el examen construido, que es igual en los dos casos, y no cuenta lo recibido
+antes de empezar (el texto base64 de la respuesta en un caso, los trozos en el otro).
+
+Uso:
+    python benchmarks/benchmark_examen_grande.py [--preguntas 1000 10000 50000]
+        [--salida resultados_benchmark_examen_grande.json]
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+from cache_github import TAM_TROZO_DESCARGA  # noqa: E402
+from examenes import FORMATOS_EXAMEN, construir_examen, codificar_examen, decodificar_examen, decodificar_examen_flujo  # noqa: E402
+
+
+def examen_sintetico(num_preguntas: int) -> dict:
+    preguntas = [{
+        'pregunta': f"{n}. ¿Enunciado de la pregunta {n} del banco de preguntas? " + "Texto del enunciado. " * 10,
+        'opciones': [f"Opción {letra} de la pregunta {n}" for letra in "abcd"],
+        'correcta': n % 4,
+        'tipo': 'opcion_multiple',
+    } for n in range(1, num_preguntas + 1)]
+    return construir_examen(f"Banco de {num_preguntas} preguntas", "Sintético", preguntas)
+
+
+def _medir(funcion) -> tuple[float, float]:
+    """(segundos, pico de memoria en MB) de funcion()."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preguntas", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Número de preguntas de cada examen")
+    parser.add_argument("--salida", default="resultados_benchmark_examen_grande.json", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    for num_preguntas in args.preguntas:
+        examen = examen_sintetico(num_preguntas)
+        for formato in FORMATOS_EXAMEN:
+            for comprimir in (False, True):
+                contenido = codificar_examen(examen, formato, comprimir)
+                texto_base64 = base64.b64encode(contenido).decode('ascii')
+                trozos = [contenido[i:i + TAM_TROZO_DESCARGA] for i in range(0, len(contenido), TAM_TROZO_DESCARGA)]
+                del contenido
+                if decodificar_examen_flujo(iter(trozos)) != examen:
+                    raise AssertionError(f"{formato} (gzip={comprimir}) no reproduce el examen")
+
+                # Cada forma parte de lo que tendría en memoria al recibir la respuesta
+                segundos_antes, mb_antes = _medir(lambda: decodificar_examen(base64.b64decode(texto_base64)))
+                segundos_flujo, mb_flujo = _medir(lambda: decodificar_examen_flujo(iter(trozos)))
+                medida = {
+                    "preguntas": num_preguntas,
+                    "formato": formato + ("+gzip" if comprimir else ""),
+                    "bytes": sum(len(trozo) for trozo in trozos),
+                    "segundos_antes": segundos_antes,
+                    "mb_pico_antes": mb_antes,
+                    "segundos_flujo": segundos_flujo,
+                    "mb_pico_flujo": mb_flujo,
+                }
+                resultados.append(medida)
+                print(f"{num_preguntas:>6} preguntas {medida['formato']:>14} ({medida['bytes'] / 1e6:.1f} MB): "
+                      f"antes {segundos_antes:.2f} s, pico {mb_antes:.1f} MB | "
+                      f"flujo {segundos_flujo:.2f} s, pico {mb_flujo:.1f} MB")
+                del texto_base64, trozos
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "tam_trozo": TAM_TROZO_DESCARGA,
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Benchmark de la extracción de preguntas (extraer_texto_con_subrayado) sobre PDFs sintéticos.
+
+Genera con PyMuPDF, sin red ni ficheros de entrada, exámenes con el mismo aspecto que los
+reales: encabezados y pies de página de los que filtra es_ruido_pagina, preguntas de opción
+múltiple y V/F mezcladas, y la respuesta correcta subrayada con un trazo dibujado o
+resaltada con una anotación. Para cada tamaño mide:
+    - páginas/segundo de extremo a extremo (con los workers indicados)
+    - pico de memoria residente (RSS) del proceso que extrae
+    - tiempo por etapa en serie (PerfilExtraccion: get_text, índices de marcado, ruido,
+      recorrido de spans, agrupado de líneas, limpieza y máquina de estados)
+    - tiempo de re-analizar la maquetación ya extraída (analizar_layout, sin abrir el PDF)
+y comprueba cuántas preguntas y respuestas marcadas se recuperan.
+
+Con --imagenes cada página lleva además una imagen de escaneo (ruido aleatorio, no comprimible),
+como los cuadernillos escaneados con capa de texto. Con --baja-memoria el PDF se escribe a un
+fichero temporal y se extrae por ruta con baja_memoria=True, como hace la app con PDFs grandes.
+
+Cada tamaño se mide en un proceso hijo nuevo para que el pico de RSS no arrastre el de
+tamaños anteriores. Los resultados se escriben en JSON para comparar ejecuciones.
+
+Uso:
+    python benchmarks/benchmark_extraccion.py [--paginas 5 50 500 2000] [--preguntas-por-pagina 6]
+        [--proporcion-vf 0.3] [--marcado mixto] [--imagenes] [--baja-memoria] [--workers 1]
+        [--salida resultados.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+import fitz  # noqa: E402
+
+from extraccion_pdf import (  # noqa: E402
+    MOTOR_LINEAS,
+    PerfilExtraccion,
+    analizar_layout,
+    extraer_layout_pdf,
+    extraer_texto_con_subrayado,
+)
+
+
+# Vocabulario para enunciados y opciones (solo importa que parezca texto de examen)
+PALABRAS = (
+    "la empresa mercado precio producto distribución canal marca cliente consumidor estrategia "
+    "segmentación posicionamiento demanda oferta competencia coste margen venta publicidad "
+    "comunicación promoción fabricante minorista mayorista calidad valor servicio ciclo vida "
+    "análisis entorno objetivo política decisión nivel cuota crecimiento innovación imagen "
+    "según respecto relación entre tanto como sobre cuando siempre puede debe tiene"
+).split()
+
+MAX_PREGUNTAS_POR_PAGINA = 8
+ALTO_LINEA = 13
+TAM_FUENTE = 10
+
+
+def _frase(rng: random.Random, minimo: int, maximo: int) -> str:
+    return " ".join(rng.choice(PALABRAS) for _ in range(rng.randint(minimo, maximo)))
+
+
+def _lineas_envueltas(texto: str, ancho: int = 80) -> list:
+    """Parte el texto en líneas de como mucho ~ancho caracteres, como haría el PDF original."""
+    lineas, actual = [], []
+    for palabra in texto.split():
+        actual.append(palabra)
+        if len(" ".join(actual)) > ancho:
+            lineas.append(" ".join(actual))
+            actual = []
+    if actual:
+        lineas.append(" ".join(actual))
+    return lineas
+
+
+def _imagen_escaneo(rng: random.Random) -> "fitz.Pixmap":
+    """Imagen en escala de grises de ruido aleatorio (no se comprime: pesa como un escaneo)."""
+    ancho, alto = 600, 400
+    return fitz.Pixmap(fitz.csGRAY, ancho, alto, rng.randbytes(ancho * alto), False)
+
+
+def generar_pdf_examen(num_paginas: int, preguntas_por_pagina: int = 6, proporcion_vf: float = 0.3,
+                       marcado: str = "mixto", semilla: int = 7, imagenes: bool = False) -> tuple[bytes, dict]:
+    """
+    Genera un examen sintético de exactamente num_paginas páginas.
+    marcado: "linea" (subrayado dibujado), "anotacion" (resaltado), "mixto" o "ninguno".
+    imagenes: añade a cada página una imagen distinta detrás del texto.
+    Retorna (pdf_bytes, resumen) con el número de preguntas generadas y de respuestas marcadas.
+    """
+    rng = random.Random(semilla)
+    doc = fitz.open()
+    num_pregunta = 0
+    num_marcadas = 0
+    num_vf = 0
+
+    for num_pagina in range(1, num_paginas + 1):
+        page = doc.new_page()
+        if imagenes:
+            page.insert_image(page.rect, pixmap=_imagen_escaneo(rng), overlay=False)
+        # Encabezados y pies que es_ruido_pagina debe descartar
+        page.insert_text((40, 30), "lOMoARcPSD|11624338", fontsize=8)
+        page.insert_text((40, 45), f"Dirección Comercial I {num_pagina} Departamento de Marketing", fontsize=9)
+        page.insert_text((500, 820), f"PAG.{num_pagina}", fontsize=8)
+        y = 70
+
+        def linea(texto, x=50, marca=None):
+            nonlocal y
+            page.insert_text((x, y), texto, fontsize=TAM_FUENTE)
+            if marca is not None:
+                ancho = fitz.get_text_length(texto, fontsize=TAM_FUENTE)
+                if marca == "linea":
+                    page.draw_line((x, y + 2), (x + ancho, y + 2), width=0.6)
+                else:
+                    page.add_highlight_annot(fitz.Rect(x, y - TAM_FUENTE, x + ancho, y + 2))
+            y += ALTO_LINEA
+
+        for _ in range(preguntas_por_pagina):
+            num_pregunta += 1
+            es_vf = rng.random() < proporcion_vf
+            lineas_enunciado = _lineas_envueltas(f"{num_pregunta}. " + _frase(rng, 8, 22))
+            if es_vf:
+                num_vf += 1
+                lineas_enunciado[-1] += " " + rng.choice(["V", "F", "(V)", "- F"])
+            lineas_enunciado[-1] += rng.choice(["", "", " P139"])
+            for texto in lineas_enunciado:
+                linea(texto)
+            if es_vf:
+                continue
+
+            correcta = rng.randrange(4)
+            if marcado == "mixto":
+                marca_pregunta = ("linea", "anotacion", None)[num_pregunta % 3]
+            elif marcado == "ninguno":
+                marca_pregunta = None
+            else:
+                marca_pregunta = marcado
+            if marca_pregunta is not None:
+                num_marcadas += 1
+            for i in range(4):
+                etiqueta = "abcd"[i] + rng.choice([")", "."])
+                marca_opcion = marca_pregunta if i == correcta else None
+                lineas_opcion = _lineas_envueltas(f"{etiqueta} " + _frase(rng, 3, 12))
+                linea(lineas_opcion[0], x=60, marca=marca_opcion)
+                for texto in lineas_opcion[1:]:
+                    linea(texto, x=70, marca=marca_opcion)
+
+        if num_pagina % 5 == 0:
+            linea("Tema 3")
+
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes, {
+        "preguntas": num_pregunta,
+        "preguntas_vf": num_vf,
+        "respuestas_marcadas": num_marcadas,
+        "bytes_pdf": len(pdf_bytes),
+    }
+
+
+def medir_etapas(pdf) -> tuple:
+    """
+    Extrae en serie con un PerfilExtraccion (pdf: bytes o ruta).
+    Retorna (segundos de cada etapa, segundos de re-analizar la maquetación con otros ajustes).
+    """
+    perfil = PerfilExtraccion()
+    layout = extraer_layout_pdf(pdf, 1, perfil=perfil)
+    analizar_layout(layout, perfil)
+    etapas = {etapa: valores["segundos"] for etapa, valores in perfil.a_dict()["etapas"].items()}
+
+    t0 = time.perf_counter()
+    analizar_layout(layout, max_opciones=5, detectar_vf=False)
+    return etapas, time.perf_counter() - t0
+
+
+def rss_pico_proceso() -> int:
+    """
+    Pico de RSS (bytes) del proceso actual.
+    En Linux se lee VmHWM, que empieza de cero tras el exec del proceso hijo; ru_maxrss conserva
+    el pico del padre (que tiene el PDF generado en memoria) y falsearía la medida.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    escala = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala
+
+
+def _medir_tamano(pdf, workers: int, baja_memoria: bool, cola):
+    """Cuerpo del proceso hijo: extracción completa + desglose por etapas (pdf: bytes o ruta)."""
+    t0 = time.perf_counter()
+    preguntas, subrayado = extraer_texto_con_subrayado(pdf, workers, baja_memoria)
+    segundos = time.perf_counter() - t0
+
+    # Pico de RSS de la extracción, antes del desglose por etapas
+    rss_propio = rss_pico_proceso()
+    escala = 1 if sys.platform == "darwin" else 1024
+    rss_workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * escala
+
+    etapas, segundos_reanalisis = medir_etapas(pdf)
+    cola.put({
+        "segundos": segundos,
+        "preguntas_extraidas": len(preguntas),
+        "respuestas_marcadas_detectadas": sum(1 for v in subrayado.values() if v),
+        "rss_pico_bytes": rss_propio,
+        "rss_pico_worker_bytes": rss_workers,
+        "etapas_segundos": etapas,
+        "segundos_reanalisis": segundos_reanalisis,
+    })
+
+
+def medir_tamano(num_paginas: int, args) -> dict:
+    pdf_bytes, resumen = generar_pdf_examen(num_paginas, args.preguntas_por_pagina, args.proporcion_vf,
+                                            args.marcado, args.semilla, args.imagenes)
+    ruta_pdf = None
+    pdf = pdf_bytes
+    if args.baja_memoria:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(pdf_bytes)
+            ruta_pdf = pdf = f.name
+        del pdf_bytes
+
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_tamano, args=(pdf, args.workers, args.baja_memoria, cola))
+    try:
+        proceso.start()
+        medidas = None
+        while medidas is None:
+            try:
+                medidas = cola.get(timeout=1)
+            except queue.Empty:
+                if not proceso.is_alive():
+                    raise RuntimeError(f"El proceso de medida terminó con código {proceso.exitcode}")
+        proceso.join()
+    finally:
+        if ruta_pdf is not None:
+            os.remove(ruta_pdf)
+
+    medidas["paginas"] = num_paginas
+    medidas["paginas_por_segundo"] = num_paginas / medidas["segundos"] if medidas["segundos"] else None
+    medidas["generado"] = resumen
+    return medidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[5, 50, 500, 2000], help="Tamaños (páginas) a medir")
+    parser.add_argument("--preguntas-por-pagina", type=int, default=6,
+                        help=f"Preguntas por página (1-{MAX_PREGUNTAS_POR_PAGINA})")
+    parser.add_argument("--proporcion-vf", type=float, default=0.3, help="Fracción de preguntas V/F (0-1)")
+    parser.add_argument("--marcado", choices=["linea", "anotacion", "mixto", "ninguno"], default="mixto",
+                        help="Cómo se marca la respuesta correcta")
+    parser.add_argument("--imagenes", action="store_true", help="Añadir una imagen de escaneo a cada página")
+    parser.add_argument("--baja-memoria", action="store_true",
+                        help="Extraer desde un fichero temporal con baja_memoria=True")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos para la extracción (PDF_WORKERS)")
+    parser.add_argument("--semilla", type=int, default=7, help="Semilla del generador")
+    parser.add_argument("--salida", default="resultados_benchmark_extraccion.json", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    if not 1 <= args.preguntas_por_pagina <= MAX_PREGUNTAS_POR_PAGINA:
+        parser.error(f"--preguntas-por-pagina debe estar entre 1 y {MAX_PREGUNTAS_POR_PAGINA}")
+    if not 0 <= args.proporcion_vf <= 1:
+        parser.error("--proporcion-vf debe estar entre 0 y 1")
+
+    resultados = []
+    for num_paginas in args.paginas:
+        medidas = medir_tamano(num_paginas, args)
+        resultados.append(medidas)
+        etapas = medidas["etapas_segundos"]
+        print(f"{num_paginas:>5} páginas: {medidas['paginas_por_segundo']:,.1f} pág/s | "
+              f"RSS pico {medidas['rss_pico_bytes'] / 2**20:,.0f} MB | "
+              f"preguntas {medidas['preguntas_extraidas']}/{medidas['generado']['preguntas']} | "
+              f"marcadas {medidas['respuestas_marcadas_detectadas']}/{medidas['generado']['respuestas_marcadas']}")
+        print("        " + " | ".join(f"{etapa} {segundos:.3f}s" for etapa, segundos in etapas.items()))
+        print(f"        re-análisis de la maquetación {medidas['segundos_reanalisis'] * 1000:.1f} ms")
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "motor_lineas": MOTOR_LINEAS,
+        "parametros": {
+            "preguntas_por_pagina": args.preguntas_por_pagina,
+            "proporcion_vf": args.proporcion_vf,
+            "marcado": args.marcado,
+            "imagenes": args.imagenes,
+            "baja_memoria": args.baja_memoria,
+            "workers": args.workers,
+            "semilla": args.semilla,
+        },
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark de los formatos de archivo de examen (examenes.codificar_examen / decodificar_examen).
+
+Con el examen de biblioteca/ (y, con --copias, un examen que lo repite N veces, como un banco
+de preguntas de varios años) compara el formato clásico y el columnar, con y sin gzip:
+    - bytes del archivo y bytes en base64 (lo que viaja por la API de contenidos de GitHub)
+    - tiempo de codificar (publicar) y de decodificar (cargar), mediana de --repeticiones
+y comprueba que cada formato devuelve exactamente el mismo examen.
+
+Uso:
+    python benchmarks/benchmark_formato_examen.py [--examen biblioteca/X.json] [--copias 1 10]
+        [--repeticiones 50] [--salida resultados_benchmark_formato_examen.json]
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+from examenes import CARPETA_BIBLIOTECA, FORMATOS_EXAMEN, codificar_examen, decodificar_examen  # noqa: E402
+from indice_biblioteca import es_archivo_examen  # noqa: E402
+
+
+def _mediana_ms(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir_examen(examen_data: dict, repeticiones: int) -> list:
+    medidas = []
+    for formato in FORMATOS_EXAMEN:
+        for comprimir in (False, True):
+            contenido = codificar_examen(examen_data, formato, comprimir)
+            if decodificar_examen(contenido) != examen_data:
+                raise AssertionError(f"{formato} (gzip={comprimir}) no reproduce el examen")
+            medidas.append({
+                "formato": formato + ("+gzip" if comprimir else ""),
+                "bytes": len(contenido),
+                "bytes_base64": len(base64.b64encode(contenido)),
+                "ms_codificar": _mediana_ms(lambda: codificar_examen(examen_data, formato, comprimir), repeticiones),
+                "ms_decodificar": _mediana_ms(lambda: decodificar_examen(contenido), repeticiones),
+            })
+    return medidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examen", help="Examen a medir (por defecto, el primero de biblioteca/)")
+    parser.add_argument("--copias", type=int, nargs="+", default=[1, 10],
+                        help="Veces que se repiten las preguntas del examen en cada medida")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones de cada operación")
+    parser.add_argument("--salida", default="resultados_benchmark_formato_examen.json",
+                        help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    ruta = args.examen
+    if ruta is None:
+        rutas = [r for r in sorted(glob.glob(os.path.join(RAIZ_REPO, CARPETA_BIBLIOTECA, "*.json")))
+                 if es_archivo_examen(os.path.basename(r))]
+        if not rutas:
+            parser.error("No hay exámenes en biblioteca/; indica uno con --examen")
+        ruta = rutas[0]
+    with open(ruta, "rb") as f:
+        examen = decodificar_examen(f.read())
+
+    resultados = []
+    for copias in args.copias:
+        examen_copias = dict(examen, preguntas=examen['preguntas'] * copias)
+        medidas = medir_examen(examen_copias, args.repeticiones)
+        base = medidas[0]
+        print(f"{os.path.basename(ruta)} x{copias} ({len(examen_copias['preguntas'])} elementos):")
+        for medida in medidas:
+            print(f"  {medida['formato']:>14}: {medida['bytes']:>9} bytes ({base['bytes'] / medida['bytes']:.1f}x) | "
+                  f"codificar {medida['ms_codificar']:.2f} ms | decodificar {medida['ms_decodificar']:.2f} ms "
+                  f"({base['ms_decodificar'] / medida['ms_decodificar']:.1f}x)")
+        resultados.append({"copias": copias, "elementos": len(examen_copias['preguntas']), "formatos": medidas})
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "examen": os.path.relpath(ruta, RAIZ_REPO),
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Regresión y micro-benchmark del pipeline de limpieza de texto.
+
+Compara las funciones de limpieza de extraccion_pdf (limpiar_tema_x, limpiar_ruido_sin_vf,
+limpiar_ruido, limpiar_texto, limpiar_etiqueta_opcion y los pipelines fusionados
+limpiar_linea_visual / limpiar_opcion_multiple) con las implementaciones originales, copiadas
+abajo como referencia, sobre los textos de los exámenes de biblioteca/. Además de los textos
+tal cual, se prueban variantes con el ruido que aparece en los PDFs (referencias de página,
+"Tema X", marcas V/F, etiquetas de opción y espacios irregulares).
+
+Sale con código 1 si alguna salida no es idéntica byte a byte.
+
+Uso:
+    python benchmarks/benchmark_limpieza.py [--repeticiones N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extraccion_pdf  # noqa: E402
+from benchmark_ruido import cargar_lineas_biblioteca  # noqa: E402
+
+
+# --- Implementaciones de referencia (originales) ---
+
+def limpiar_ruido_sin_vf_referencia(texto: str) -> str:
+    if not texto:
+        return texto
+    texto_limpio = texto
+    texto_limpio = re.sub(r'[:;]\s*P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+Página\s+\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'Código:\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'[:;]\s*P\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'PAG\.\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'Página\s+\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
+    return texto_limpio
+
+
+def limpiar_ruido_referencia(texto: str) -> str:
+    if not texto:
+        return texto
+    texto_limpio = texto
+    texto_limpio = re.sub(r'[:;]\s*P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'P\s*\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+Página\s+\d+\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    patron_vf_punto = re.compile(r'\s+[VF]\.\s+.*$', re.IGNORECASE)
+    match_vf_punto = patron_vf_punto.search(texto_limpio)
+    if match_vf_punto:
+        texto_limpio = texto_limpio[:match_vf_punto.start()].strip()
+    else:
+        patron_vf_espacio = re.compile(r'\s+[VF]\s+[A-Za-z].*$', re.IGNORECASE)
+        match_vf_espacio = patron_vf_espacio.search(texto_limpio)
+        if match_vf_espacio:
+            texto_limpio = texto_limpio[:match_vf_espacio.start()].strip()
+        else:
+            texto_limpio = re.sub(r'\s+[VF]\.?\s*$', '', texto_limpio, flags=re.IGNORECASE)
+            texto_limpio = re.sub(r'\s+\([VF]\)\s*$', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'Código:\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'[:;]\s*P\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'PAG\.\s*\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'Página\s+\d+', '', texto_limpio, flags=re.IGNORECASE)
+    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
+    return texto_limpio
+
+
+def limpiar_tema_x_referencia(texto: str) -> str:
+    if not texto:
+        return texto
+    patron_tema = re.compile(r'(?i)Tema\s+\d+', re.IGNORECASE)
+    texto_limpio = texto.strip()
+    if re.match(r'^\s*Tema\s+\d+\s*$', texto_limpio, re.IGNORECASE):
+        return ""
+    texto_limpio = patron_tema.sub('', texto)
+    texto_limpio = re.sub(r'\s+', ' ', texto_limpio).strip()
+    return texto_limpio
+
+
+def limpiar_texto_referencia(texto: str) -> str:
+    if not texto:
+        return ""
+    texto = re.sub(r'[\s\t\n\r]+', ' ', texto)
+    return texto.strip()
+
+
+def limpiar_etiqueta_opcion_referencia(texto: str) -> str:
+    if not texto:
+        return ""
+    texto_limpio = re.sub(r'^\s*[a-eA-E][\.\)\-]\s*', '', texto)
+    return texto_limpio.strip()
+
+
+def limpiar_linea_visual_referencia(texto: str) -> str:
+    return limpiar_ruido_sin_vf_referencia(limpiar_tema_x_referencia(texto))
+
+
+def limpiar_opcion_multiple_referencia(texto: str) -> str:
+    op_limpia = limpiar_etiqueta_opcion_referencia(limpiar_texto_referencia(texto))
+    op_limpia = limpiar_ruido_referencia(op_limpia)
+    return re.sub(r'\s*[\(\-\s]*(V|F)[\)\s]*$', '', op_limpia, flags=re.IGNORECASE).strip()
+
+
+PARES = [
+    ("limpiar_tema_x", limpiar_tema_x_referencia),
+    ("limpiar_ruido_sin_vf", limpiar_ruido_sin_vf_referencia),
+    ("limpiar_ruido", limpiar_ruido_referencia),
+    ("limpiar_texto", limpiar_texto_referencia),
+    ("limpiar_etiqueta_opcion", limpiar_etiqueta_opcion_referencia),
+    ("limpiar_linea_visual", limpiar_linea_visual_referencia),
+    ("limpiar_opcion_multiple", limpiar_opcion_multiple_referencia),
+]
+
+# Ruido que se añade a los textos del corpus para ejercitar todas las reglas
+PREFIJOS = ["", "a) ", "B. ", "c- ", "  d)", "12. ", "Tema 3 ", "Código: 991 "]
+SUFIJOS = [
+    "", " P139", ": P 12", ";P4", "P7", " Página 3", " PAG.5", " V", " F.", " (V)", " - F",
+    " F. Ver libro", " V texto adicional", "  \t ", " Tema 2", "\nP12 ", " Código: 4 V",
+]
+
+
+def generar_corpus(lineas: list = None) -> list:
+    """
+    Textos de biblioteca/ (o las líneas dadas) con todas las combinaciones de prefijo y sufijo
+    de ruido.
+    """
+    corpus = []
+    for texto in cargar_lineas_biblioteca() if lineas is None else lineas:
+        for prefijo in PREFIJOS:
+            for sufijo in SUFIJOS:
+                corpus.append(prefijo + texto + sufijo)
+        # Fragmentos cortos, como los spans que llegan desde el PDF
+        corpus.extend(texto.split(" ")[:5])
+    return corpus + ["", " ", "Tema 4", "  tema 12  ", "Página 3", "V", "(F)"]
+
+
+def medir(funcion, textos: list, repeticiones: int) -> float:
+    """Retorna textos/segundo de la mejor de las repeticiones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for texto in textos:
+            funcion(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(textos) / mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=1, help="Repeticiones por implementación")
+    args = parser.parse_args()
+    
+    corpus = generar_corpus()
+    print(f"Textos: {len(corpus)}")
+    
+    errores = 0
+    for nombre, referencia in PARES:
+        funcion = getattr(extraccion_pdf, nombre)
+        distintos = [t for t in corpus if funcion(t) != referencia(t)]
+        if distintos:
+            errores += len(distintos)
+            print(f"❌ {nombre}: {len(distintos)} salida(s) distinta(s), p.ej. {distintos[0]!r}")
+            continue
+        antes = medir(referencia, corpus, args.repeticiones)
+        despues = medir(funcion, corpus, args.repeticiones)
+        print(f"✅ {nombre:<25} idéntica  {antes:>10,.0f} → {despues:>10,.0f} textos/s  (x{despues / antes:.2f})")
+    
+    if errores:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
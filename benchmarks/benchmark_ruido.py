@@ -0,0 +1,199 @@
+"""
+Micro-benchmark del clasificador de ruido (es_ruido_pagina).
+
+Compara la implementación compilada de extraccion_pdf con la implementación original
+(batería de búsquedas y re.match por línea, copiada abajo como referencia) sobre las
+líneas de los exámenes de la carpeta biblioteca/, más una muestra de encabezados reales.
+Verifica que ambas toman las mismas decisiones y muestra líneas/segundo de cada una.
+
+Uso:
+    python benchmarks/benchmark_ruido.py [--repeticiones N]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+from extraccion_pdf import es_ruido_pagina  # noqa: E402
+
+
+# Encabezados y pies de página tal y como aparecen en los PDFs de examen
+LINEAS_RUIDO_MUESTRA = [
+    "lOMoARcPSD|11624338",
+    "Dirección Comercial I 3 Departamento de Marketing",
+    "Dirección Comercial I 12 Departamento de Marketing Verdadero Falso",
+    "PAG.14",
+    "Página 7",
+    "Tema 4",
+    "Tema: Producto",
+    "Ficha de autoevaluación Tema: 5",
+    "Profesoras: Josefa Parreño Selva y Enar Ruiz Conde",
+    "Josefa Parreño",
+    "Conde, Ruiz y Enar",
+    "SISTEMA DE PUNTUACIÓN: Las preguntas tienen una única respuesta correcta",
+    "Los desaciertos puntúan -0,2 puntos",
+    "las preguntas no contestadas no restan puntos",
+    "EXAMEN ENERO 2023",
+    "PREGUNTAS EXÁMENES TIPO TEST",
+    "Verdadero",
+    "  falso ",
+    "3 Verdadero Falso",
+    "Código: 1234",
+    "Descargado por alumno",
+    "□ □",
+]
+
+
+def es_ruido_pagina_referencia(texto: str) -> bool:
+    """Implementación original de es_ruido_pagina (antes de compilar las reglas)."""
+    if not texto:
+        return True
+    
+    texto_upper = texto.upper()
+    texto_stripped = texto.strip()
+    
+    patrones_ruido = [
+        "PAG.", "PÁGINA", "DESCARGADO POR", "PROFESORAS:", "PROFESORES:",
+        "DEPARTAMENTO DE MARKETING", "DIRECCIÓN COMERCIAL", "DIRECCIÓN COMERCIAL I",
+        "SISTEMA DE PUNTUACIÓN", "□", "JOSEFA PARREÑO SELVA", "ENAR RUIZ CONDE",
+        "ADEGO!", "VERDADERO FALSO", "FICHA DE AUTOEVALUACIÓN",
+    ]
+    for patron in patrones_ruido:
+        if patron in texto_upper:
+            return True
+    
+    if "JOSEFA" in texto_upper and "PARREÑO" in texto_upper:
+        return True
+    if "ENAR" in texto_upper and "RUIZ" in texto_upper and "CONDE" in texto_upper:
+        return True
+    
+    patrones_regex = [
+        r'^\s*SISTEMA DE PUNTUACIÓN.*',
+        r'^\s*Las preguntas tienen una única respuesta correcta.*',
+        r'^\s*Los desaciertos puntúan.*',
+        r'^\s*Para aprobar el examen será necesario obtener.*',
+        r'^\s*Los desaciertos puntúan -0,2 puntos.*',
+        r'^\s*las preguntas no contestadas.*puntos.*',
+        r'^\s*EXAMEN.*DIRECCIÓN DE MARKETING.*',
+        r'^\s*PREGUNTAS EXÁMENES TIPO TEST',
+        r'^\s*EXAMEN FINAL.*DIRECCIÓN DE MARKETING.*',
+        r'^\s*EXAMEN ENERO \d{4}',
+        r'^\s*Ficha de autoevaluación.*',
+        r'^\s*Ficha de autoevaluación\s+Tema:.*',
+        r'^\s*Dirección Comercial I.*',
+        r'^\s*Dirección Comercial I\s+\d+.*',
+        r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing.*',
+        r'^\s*Departamento de Marketing.*',
+        r'^\s*Tema:\s+.*',
+        r'^\s*Tema\s+\d+.*',
+        r'^\s*Código:\s*\d+',
+        r'^\s*PAG\.\d+',
+        r'^\s*Página\s+\d+',
+        r'^\s*Tema\s+\d+\s*$',
+        r'^\s*Profesoras?:.*',
+        r'^\s*Verdadero\s*$',
+        r'^\s*Falso\s*$',
+        r'^\s*\d+\s+Verdadero\s+Falso\s*$',
+        r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing\s+Verdadero\s+Falso\s*$',
+        r'^\s*lOMoARcPSD\|.*',
+    ]
+    
+    texto_upper_stripped = texto_upper.strip()
+    if "SISTEMA DE PUNTUACIÓN" in texto_upper_stripped:
+        partes_sistema = [
+            "LAS PREGUNTAS TIENEN UNA ÚNICA RESPUESTA CORRECTA", "LOS DESACIERTOS PUNTÚAN",
+            "LAS PREGUNTAS NO CONTESTADAS", "PARA APROBAR EL EXAMEN", "OBTENER 5 PUNTOS",
+            "0,4 PUNTOS", "-0,2 PUNTOS",
+        ]
+        partes_encontradas = sum(1 for parte in partes_sistema if parte in texto_upper_stripped)
+        if partes_encontradas >= 2:
+            return True
+    
+    if ("DIRECCIÓN COMERCIAL" in texto_upper_stripped and
+        ("DEPARTAMENTO DE MARKETING" in texto_upper_stripped or "DEPARTAMENTO" in texto_upper_stripped)):
+        return True
+    if "FICHA DE AUTOEVALUACIÓN" in texto_upper_stripped:
+        return True
+    if re.match(r'^\s*TEMA:\s+', texto_stripped, re.IGNORECASE):
+        return True
+    if re.match(r'^\s*(Verdadero|Falso)\s*$', texto_stripped, re.IGNORECASE):
+        return True
+    if re.match(r'^\s*\d+\s+Verdadero\s+Falso\s*$', texto_stripped, re.IGNORECASE):
+        return True
+    if re.match(r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing\s+Verdadero\s+Falso\s*$', texto_stripped, re.IGNORECASE):
+        return True
+    if re.match(r'^\s*lOMoARcPSD\|.*', texto_stripped, re.IGNORECASE):
+        return True
+    
+    for patron in patrones_regex:
+        if re.match(patron, texto_stripped, re.IGNORECASE):
+            return True
+    
+    return False
+
+
+def cargar_lineas_biblioteca() -> list:
+    """Reúne enunciados, opciones y textos de caso de todos los exámenes de biblioteca/."""
+    lineas = []
+    
+    def agregar_pregunta(pregunta):
+        lineas.append(pregunta.get('pregunta', ''))
+        lineas.extend(pregunta.get('opciones', []))
+    
+    for ruta in sorted(glob.glob(os.path.join(RAIZ_REPO, "biblioteca", "*.json"))):
+        with open(ruta, encoding="utf-8") as f:
+            examen = json.load(f)
+        for item in examen.get('preguntas', []):
+            if item.get('tipo') == 'caso':
+                lineas.append(item.get('texto_caso', ''))
+                for pregunta in item.get('preguntas_caso', []):
+                    agregar_pregunta(pregunta)
+            else:
+                agregar_pregunta(item)
+    
+    return lineas + LINEAS_RUIDO_MUESTRA
+
+
+def medir(funcion, lineas: list, repeticiones: int) -> float:
+    """Retorna líneas/segundo de la mejor de las repeticiones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for linea in lineas:
+            funcion(linea)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(lineas) / mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20, help="Repeticiones por implementación")
+    args = parser.parse_args()
+    
+    lineas = cargar_lineas_biblioteca()
+    
+    discrepancias = [l for l in lineas if es_ruido_pagina(l) != es_ruido_pagina_referencia(l)]
+    if discrepancias:
+        print(f"❌ {len(discrepancias)} línea(s) con decisión distinta:")
+        for linea in discrepancias[:20]:
+            print(f"   {linea!r}")
+        sys.exit(1)
+    
+    num_ruido = sum(1 for l in lineas if es_ruido_pagina(l))
+    print(f"Líneas: {len(lineas)} ({num_ruido} ruido) - decisiones idénticas")
+    
+    antes = medir(es_ruido_pagina_referencia, lineas, args.repeticiones)
+    despues = medir(es_ruido_pagina, lineas, args.repeticiones)
+    print(f"Antes (referencia):  {antes:,.0f} líneas/s")
+    print(f"Después (compilado): {despues:,.0f} líneas/s")
+    print(f"Aceleración: x{despues / antes:.2f}")
+
+
+if __name__ == "__main__":
+    main()
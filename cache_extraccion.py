@@ -0,0 +1,178 @@
+"""
+Caché persistente en disco de maquetaciones de PDF.
+
+Cada entrada se direcciona por el SHA-256 de los bytes del PDF y VERSION_LAYOUT, y guarda la
+maquetación (extraer_layout_pdf: líneas visuales por página) como JSON comprimido con gzip.
+Con ella el PDF se re-analiza con otros ajustes o reglas de la máquina de estados sin abrirlo
+de nuevo. El tamaño total está acotado con desalojo LRU (por fecha de último acceso).
+
+Es segura para varios procesos de Streamlit compartiendo el mismo directorio:
+las escrituras son atómicas (archivo temporal + os.replace) y las lecturas/desalojos
+toleran que otro proceso borre o reemplace una entrada al mismo tiempo.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import List, Dict, Optional, Union
+
+from extraccion_pdf import VERSION_LAYOUT
+
+
+DIRECTORIO_CACHE_POR_DEFECTO = os.path.join(tempfile.gettempdir(), "flashcards_cache_extraccion")
+MAX_BYTES_CACHE_POR_DEFECTO = 256 * 1024 * 1024  # 256 MB
+
+EXTENSION_CACHE = ".json.gz"
+
+
+TAM_BLOQUE_HASH = 1024 * 1024  # 1 MB
+
+
+def _sha256_pdf(pdf: Union[bytes, str]) -> str:
+    """SHA-256 del PDF (bytes o ruta a un archivo, que se lee por bloques sin cargarlo entero)."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf).hexdigest()
+    resumen = hashlib.sha256()
+    with open(pdf, "rb") as f:
+        for bloque in iter(lambda: f.read(TAM_BLOQUE_HASH), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def clave_cache_layout(pdf: Union[bytes, str]) -> str:
+    """
+    Calcula la clave de la maquetación de un PDF: SHA-256 del contenido + VERSION_LAYOUT.
+    pdf: bytes del PDF o ruta a un archivo (se lee por bloques, sin cargarlo entero).
+    Cambiar la máquina de estados no la invalida.
+    """
+    return f"{_sha256_pdf(pdf)}.layout{VERSION_LAYOUT}"
+
+
+def _ruta_entrada(directorio: str, clave: str) -> str:
+    return os.path.join(directorio, clave + EXTENSION_CACHE)
+
+
+def _leer_entrada(clave: str, directorio: str) -> Optional[Dict]:
+    """Lee el JSON de una entrada y la marca como usada. None si no existe o está corrupta."""
+    ruta = _ruta_entrada(directorio, clave)
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError):
+        # Entrada corrupta o truncada: descartarla
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+        return None
+    
+    # Marcar como usada recientemente (para el desalojo LRU)
+    try:
+        os.utime(ruta, None)
+    except OSError:
+        pass
+    return datos
+
+
+def leer_cache_layout(clave: str, directorio: str = DIRECTORIO_CACHE_POR_DEFECTO) -> Optional[tuple[List[List[tuple[str, bool]]], Optional[Dict]]]:
+    """
+    Lee una maquetación cacheada (ver clave_cache_layout).
+    Retorna (paginas, ruido) o None si no existe o está corrupta: paginas es la lista de líneas
+    (texto_linea, marcado_linea) de cada página y ruido el ReglasRuidoDocumento.a_dict() con que
+    se extrajo (o None).
+    """
+    datos = _leer_entrada(clave, directorio)
+    if datos is None:
+        return None
+    # JSON guarda las tuplas como listas: restaurarlas
+    paginas = [[(texto, marcado) for texto, marcado in lineas] for lineas in datos.get('paginas', [])]
+    return paginas, datos.get('ruido')
+
+
+def escribir_cache_layout(clave: str, paginas: List[List[tuple[str, bool]]], ruido: Optional[Dict] = None,
+                          directorio: str = DIRECTORIO_CACHE_POR_DEFECTO,
+                          max_bytes: int = MAX_BYTES_CACHE_POR_DEFECTO) -> bool:
+    """
+    Guarda la maquetación de un PDF (extraer_layout_pdf) y recorta la caché a max_bytes.
+    ruido: resumen opcional de los encabezados/pies aprendidos, para mostrarlo en los aciertos.
+    Retorna True si se escribió correctamente (un fallo de caché nunca es fatal).
+    """
+    if max_bytes <= 0:
+        return False
+    
+    datos = {
+        'version_layout': VERSION_LAYOUT,
+        'paginas': paginas,
+        'ruido': ruido
+    }
+    return _escribir_entrada(clave, datos, directorio, max_bytes)
+
+
+def _escribir_entrada(clave: str, datos: Dict, directorio: str, max_bytes: int) -> bool:
+    """Escribe una entrada como JSON gzip de forma atómica y recorta la caché a max_bytes."""
+    contenido = gzip.compress(
+        json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    )
+    
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        # Escritura atómica: otro proceso nunca ve una entrada a medio escribir
+        fd, ruta_temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(contenido)
+            os.replace(ruta_temporal, _ruta_entrada(directorio, clave))
+        except BaseException:
+            try:
+                os.remove(ruta_temporal)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        return False
+    
+    recortar_cache_extraccion(directorio, max_bytes)
+    return True
+
+
+def recortar_cache_extraccion(directorio: str = DIRECTORIO_CACHE_POR_DEFECTO,
+                              max_bytes: int = MAX_BYTES_CACHE_POR_DEFECTO) -> int:
+    """
+    Elimina las entradas usadas hace más tiempo hasta que la caché ocupe como mucho max_bytes.
+    Retorna el número de entradas eliminadas.
+    """
+    entradas = []
+    total = 0
+    try:
+        with os.scandir(directorio) as it:
+            for entrada in it:
+                if not entrada.name.endswith(EXTENSION_CACHE):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, entrada.path))
+                total += info.st_size
+    except FileNotFoundError:
+        return 0
+    
+    eliminadas = 0
+    # Más antiguas primero
+    for _, tamano, ruta in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            eliminadas += 1
+        except FileNotFoundError:
+            # Otro proceso ya la eliminó
+            pass
+        except OSError:
+            continue
+        total -= tamano
+    
+    return eliminadas
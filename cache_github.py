@@ -0,0 +1,351 @@
+"""
+Caché en memoria, compartida por todo el proceso, del contenido de la biblioteca en GitHub.
+
+Dos niveles:
+    - Respuestas de la API de contenidos (biblioteca/index.json, listados de carpeta): durante
+      ttl segundos se sirven sin preguntar a GitHub; pasado ese tiempo se revalidan con una
+      petición condicional (If-None-Match con el ETag guardado). Un 304 no consume límite de
+      peticiones y reutiliza la respuesta guardada.
+    - Contenido de los archivos por SHA del blob: el SHA identifica el contenido, así que un
+      examen cuyo SHA ya se conoce (del índice) nunca se vuelve a descargar. Acotado a
+      MAX_BYTES_BLOBS con desalojo LRU. Por debajo está el espejo en disco de espejo_blobs,
+      compartido por todos los procesos del servidor: cada blob descargado o publicado se
+      escribe en él y lo que no está en memoria se busca allí antes de pedirlo a GitHub
+      (configurar_espejo cambia su directorio y tamaño máximo).
+
+Los archivos que no están en caché se descargan en crudo con la API de blobs de git
+(Accept: application/vnd.github.raw+json), por trozos y sin base64: abrir_blob entrega esos
+trozos para procesarlos a medida que llegan (decodificar_examen_flujo), que es la única forma
+de leer archivos de más de 1 MB, para los que la API de contenidos no incluye el contenido.
+Los blobs grandes (más de BYTES_BLOB_GRANDE) no se guardan en memoria, solo en el espejo.
+
+leer_blobs descarga (y procesa) varios archivos a la vez con un pool de hilos acotado.
+Los contadores de aciertos y fallos se consultan con estadisticas_cache_github().
+"""
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+import requests
+from github.GithubException import GithubException
+
+from cliente_github import SEGUNDOS_TIMEOUT_GITHUB
+from espejo_blobs import (
+    DIRECTORIO_ESPEJO_POR_DEFECTO,
+    MAX_BYTES_ESPEJO_POR_DEFECTO,
+    EscrituraEspejo,
+    abrir_espejo,
+    escribir_espejo,
+)
+
+
+TTL_CACHE_GITHUB = 30  # segundos sin revalidar una respuesta
+MAX_BYTES_BLOBS = 64 * 1024 * 1024  # 64 MB
+
+# Descargas simultáneas de leer_blobs (no más que POOL_CONEXIONES_GITHUB de cliente_github)
+MAX_DESCARGAS_CONCURRENTES = 8
+
+# La API de contenidos solo incluye el contenido de archivos de hasta 1 MB; los blobs mayores
+# se leen siempre por trozos y no ocupan la caché en memoria
+BYTES_BLOB_GRANDE = 1024 * 1024
+TAM_TROZO_DESCARGA = 64 * 1024
+
+
+class _RespuestaCacheada:
+    __slots__ = ('etag', 'datos', 'revalidada')
+    
+    def __init__(self, etag: Optional[str], datos, revalidada: float):
+        self.etag = etag
+        self.datos = datos
+        self.revalidada = revalidada
+
+
+_cerrojo = threading.Lock()
+_respuestas: Dict[tuple, _RespuestaCacheada] = {}
+_blobs: "OrderedDict[str, bytes]" = OrderedDict()
+_bytes_blobs = 0
+_espejo = {'directorio': DIRECTORIO_ESPEJO_POR_DEFECTO, 'max_bytes': MAX_BYTES_ESPEJO_POR_DEFECTO}
+_sesion = None
+_estadisticas = {
+    'aciertos_ttl': 0,
+    'no_modificadas_304': 0,
+    'descargas_api': 0,
+    'aciertos_blob': 0,
+    'fallos_blob': 0,
+    'aciertos_espejo': 0,
+    'descargas_grandes': 0,
+}
+
+
+def _contar(contador: str):
+    with _cerrojo:
+        _estadisticas[contador] += 1
+
+
+def _url_contenidos(repo, ruta: str) -> str:
+    return f"{repo.url}/contents/{quote(ruta)}"
+
+
+def _pedir_contenidos(repo, ruta: str, ttl: float):
+    """
+    GET de la API de contenidos con caché: dentro del TTL no hace petición y después la
+    revalida con If-None-Match. Retorna el JSON de la respuesta o None si la ruta no existe.
+    """
+    clave = (repo.url, ruta)
+    with _cerrojo:
+        cacheada = _respuestas.get(clave)
+    ahora = time.monotonic()
+    if cacheada is not None and ahora - cacheada.revalidada < ttl:
+        _contar('aciertos_ttl')
+        return cacheada.datos
+    
+    cabeceras = {"If-None-Match": cacheada.etag} if cacheada is not None and cacheada.etag else {}
+    estado, cabeceras_respuesta, salida = repo.requester.requestJson("GET", _url_contenidos(repo, ruta), headers=cabeceras)
+    if estado == 304 and cacheada is not None:
+        cacheada.revalidada = ahora
+        _contar('no_modificadas_304')
+        return cacheada.datos
+    if estado == 404:
+        olvidar(repo, ruta)
+        return None
+    try:
+        datos = json.loads(salida) if salida else None
+    except ValueError:
+        datos = salida
+    if estado >= 400:
+        raise GithubException(estado, datos, cabeceras_respuesta)
+    
+    _contar('descargas_api')
+    with _cerrojo:
+        _respuestas[clave] = _RespuestaCacheada(cabeceras_respuesta.get('etag'), datos, ahora)
+    return datos
+
+
+def configurar_espejo(directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO, max_bytes: int = MAX_BYTES_ESPEJO_POR_DEFECTO):
+    """Directorio y tamaño máximo del espejo en disco (max_bytes <= 0 lo desactiva)."""
+    with _cerrojo:
+        _espejo['directorio'] = directorio
+        _espejo['max_bytes'] = max_bytes
+
+
+def _guardar_blob(sha: str, contenido: bytes, en_espejo: bool = True):
+    global _bytes_blobs
+    if en_espejo:
+        escribir_espejo(sha, contenido, _espejo['directorio'], _espejo['max_bytes'])
+    if len(contenido) > MAX_BYTES_BLOBS:
+        return
+    with _cerrojo:
+        if sha in _blobs:
+            _blobs.move_to_end(sha)
+            return
+        _blobs[sha] = contenido
+        _bytes_blobs += len(contenido)
+        while _bytes_blobs > MAX_BYTES_BLOBS:
+            _, desalojado = _blobs.popitem(last=False)
+            _bytes_blobs -= len(desalojado)
+
+
+def _buscar_blob(sha: str) -> Optional[bytes]:
+    with _cerrojo:
+        contenido = _blobs.get(sha)
+        if contenido is not None:
+            _blobs.move_to_end(sha)
+        return contenido
+
+
+def _trozos_archivo(archivo: BinaryIO) -> Iterator[bytes]:
+    with archivo:
+        for trozo in iter(lambda: archivo.read(TAM_TROZO_DESCARGA), b""):
+            yield trozo
+
+
+def _sesion_descargas() -> requests.Session:
+    """Sesión HTTP (con su pool de conexiones) de las descargas en crudo, compartida por el proceso."""
+    global _sesion
+    with _cerrojo:
+        if _sesion is None:
+            _sesion = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_maxsize=MAX_DESCARGAS_CONCURRENTES)
+            _sesion.mount("https://", adaptador)
+            _sesion.mount("http://", adaptador)
+        return _sesion
+
+
+def _descargar_blob(repo, sha: str) -> Iterator[bytes]:
+    """
+    Descarga en crudo (API de blobs de git, sin base64) el blob sha por trozos. A la vez lo
+    escribe en el espejo en disco y, si no es grande, lo guarda en memoria; ambos solo si la
+    descarga se completa.
+    """
+    cabeceras = {"Accept": "application/vnd.github.raw+json"}
+    if repo.requester.auth is not None:
+        repo.requester.auth.authentication(cabeceras)
+    with _sesion_descargas().get(f"{repo.url}/git/blobs/{sha}", headers=cabeceras, stream=True,
+                                 timeout=SEGUNDOS_TIMEOUT_GITHUB) as respuesta:
+        if respuesta.status_code >= 400:
+            try:
+                datos = respuesta.json()
+            except ValueError:
+                datos = respuesta.text
+            raise GithubException(respuesta.status_code, datos, dict(respuesta.headers))
+        
+        escritura = EscrituraEspejo(sha, _espejo['directorio'], _espejo['max_bytes'])
+        trozos_memoria = []  # None en cuanto pasa de BYTES_BLOB_GRANDE
+        tamano = 0
+        try:
+            for trozo in respuesta.iter_content(TAM_TROZO_DESCARGA):
+                escritura.escribir(trozo)
+                tamano += len(trozo)
+                if trozos_memoria is not None:
+                    if tamano <= BYTES_BLOB_GRANDE:
+                        trozos_memoria.append(trozo)
+                    else:
+                        trozos_memoria = None
+                yield trozo
+        except BaseException:
+            # Descarga fallida o abandonada (p. ej. el examen no era válido): nada a medias
+            escritura.descartar()
+            raise
+        escritura.confirmar()
+        if trozos_memoria is None:
+            _contar('descargas_grandes')
+        else:
+            _guardar_blob(sha, b"".join(trozos_memoria), en_espejo=False)
+
+
+def abrir_blob(repo, ruta: str, sha: Optional[str] = None) -> tuple[Iterator[bytes], str]:
+    """
+    Como leer_blob, pero el contenido se entrega como un iterador de trozos de bytes, para
+    procesarlo mientras llega sin tenerlo entero en memoria. Busca el blob en memoria, después
+    en el espejo en disco (leído por trozos) y, si no está, lo descarga en crudo.
+    Retorna (trozos, sha del contenido).
+    """
+    if not sha:
+        # Sin SHA conocido: la API de contenidos lo da, y el contenido si no es grande
+        _contar('fallos_blob')
+        archivo = repo.get_contents(ruta)
+        if archivo.encoding == 'base64' and archivo.content:
+            contenido = archivo.decoded_content
+            _guardar_blob(archivo.sha, contenido)
+            return iter([contenido]), archivo.sha
+        return _descargar_blob(repo, archivo.sha), archivo.sha
+    
+    contenido = _buscar_blob(sha)
+    if contenido is not None:
+        _contar('aciertos_blob')
+        return iter([contenido]), sha
+    
+    archivo = abrir_espejo(sha, _espejo['directorio']) if _espejo['max_bytes'] > 0 else None
+    if archivo is not None:
+        _contar('aciertos_blob')
+        _contar('aciertos_espejo')
+        if os.fstat(archivo.fileno()).st_size > BYTES_BLOB_GRANDE:
+            return _trozos_archivo(archivo), sha
+        # Los pequeños se leen de una vez y suben a memoria
+        with archivo:
+            contenido = archivo.read()
+        _guardar_blob(sha, contenido, en_espejo=False)
+        return iter([contenido]), sha
+    
+    _contar('fallos_blob')
+    return _descargar_blob(repo, sha), sha
+
+
+def recordar_blob(sha: str, contenido: bytes):
+    """Guarda en la caché (memoria y espejo en disco) un archivo recién publicado desde este proceso."""
+    _guardar_blob(sha, contenido)
+
+
+def leer_archivo(repo, ruta: str, ttl: float = TTL_CACHE_GITHUB) -> Optional[tuple[bytes, str]]:
+    """
+    Lee un archivo del repositorio con caché condicional.
+    Retorna (contenido, sha) o None si no existe.
+    """
+    datos = _pedir_contenidos(repo, ruta, ttl)
+    if datos is None:
+        return None
+    if isinstance(datos, list):
+        raise ValueError(f"{ruta} es una carpeta, no un archivo")
+    
+    sha = datos['sha']
+    contenido = _buscar_blob(sha)
+    if contenido is None:
+        if datos.get('encoding') == 'base64' and datos.get('content'):
+            contenido = base64.b64decode(datos['content'])
+            _guardar_blob(sha, contenido)
+        else:
+            # La API de contenidos no incluye el contenido de archivos grandes: descargarlo en crudo
+            contenido = b"".join(abrir_blob(repo, ruta, sha)[0])
+    return contenido, sha
+
+
+def leer_directorio(repo, ruta: str, ttl: float = TTL_CACHE_GITHUB) -> Optional[List[Dict]]:
+    """
+    Lista una carpeta del repositorio con caché condicional.
+    Retorna los elementos (dicts con 'name', 'path', 'sha', 'type'...) o None si no existe.
+    """
+    datos = _pedir_contenidos(repo, ruta, ttl)
+    if datos is None:
+        return None
+    return datos if isinstance(datos, list) else [datos]
+
+
+def leer_blob(repo, ruta: str, sha: Optional[str] = None) -> tuple[bytes, str]:
+    """
+    Contenido de un archivo cuyo SHA se conoce (p. ej. del índice de la biblioteca): si ya se
+    descargó o publicó (en este proceso o, por el espejo en disco, en otro) no hace ninguna
+    petición. Si no, lo descarga (con SHA, ese blob; sin él, la versión actual de la ruta).
+    Retorna (contenido, sha del contenido retornado). Para archivos grandes, mejor abrir_blob.
+    """
+    trozos, sha = abrir_blob(repo, ruta, sha)
+    return b"".join(trozos), sha
+
+
+def leer_blobs(repo, archivos: List[tuple[str, Optional[str]]],
+               procesar: Optional[Callable[[Iterator[bytes]], Any]] = None,
+               max_hilos: int = MAX_DESCARGAS_CONCURRENTES) -> List[Any]:
+    """
+    leer_blob de varios archivos (ruta, sha) a la vez con un pool de hilos acotado.
+    procesar(trozos) recibe los trozos de abrir_blob en el mismo hilo que la descarga, para
+    procesarlos mientras llegan (p. ej. decodificar_examen_flujo); sin procesar, el resultado
+    es el contenido en bytes.
+    Retorna, en el orden de archivos, (resultado, sha) o la excepción de ese archivo: un fallo
+    no interrumpe a los demás. Cada petición está acotada por el timeout del cliente.
+    """
+    def _leer(ruta: str, sha: Optional[str]):
+        trozos, sha_leido = abrir_blob(repo, ruta, sha)
+        return (procesar(trozos) if procesar else b"".join(trozos)), sha_leido
+    
+    if not archivos:
+        return []
+    resultados = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_hilos, len(archivos)))) as executor:
+        futuros = [executor.submit(_leer, ruta, sha) for ruta, sha in archivos]
+        # En el orden de envío, no en el de llegada: el resultado es determinista
+        for futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                resultados.append(e)
+    return resultados
+
+
+def olvidar(repo, ruta: str):
+    """Descarta la respuesta cacheada de una ruta (tras escribirla desde este proceso)."""
+    with _cerrojo:
+        _respuestas.pop((repo.url, ruta), None)
+
+
+def estadisticas_cache_github() -> Dict[str, int]:
+    """Contadores de la caché y memoria ocupada por los blobs."""
+    with _cerrojo:
+        estadisticas = dict(_estadisticas)
+        estadisticas['blobs'] = len(_blobs)
+        estadisticas['bytes_blobs'] = _bytes_blobs
+    return estadisticas
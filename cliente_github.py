@@ -0,0 +1,98 @@
+"""
+Cliente de GitHub compartido por todo el proceso.
+
+Streamlit vuelve a ejecutar app_flashcards.py en cada interacción y cada sesión, pero los
+módulos importados se conservan: aquí se guardan un único Github y su Repository, creados una
+vez y reutilizados por todos los hilos (reruns y sesiones). Así cada operación se ahorra la
+petición de get_repo y reutiliza las conexiones HTTP del pool de requests en vez de abrir otras.
+
+El cliente se vuelve a crear solo si cambian el token o el repositorio, o si GitHub rechaza
+las credenciales (invalidar_si_fallo_autenticacion).
+"""
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from github import Github
+from github.GithubException import BadCredentialsException, GithubException
+
+
+# Conexiones HTTP que el cliente mantiene abiertas (hilos que pueden usarlo a la vez)
+POOL_CONEXIONES_GITHUB = 10
+
+# PyGithub espacia por defecto 0.25 s las peticiones de un mismo cliente; con un cliente nuevo
+# por operación esa espera nunca se notaba, compartido se convertiría en un cuello de botella
+SEGUNDOS_ENTRE_PETICIONES = 0.0
+
+# Límite de cada petición HTTP: una descarga colgada no bloquea indefinidamente su hilo
+SEGUNDOS_TIMEOUT_GITHUB = 10
+
+
+class _ClienteCompartido:
+    __slots__ = ('clave', 'github', 'repo')
+    
+    def __init__(self, clave: tuple, github: Github, repo):
+        self.clave = clave
+        self.github = github
+        self.repo = repo
+
+
+_cerrojo = threading.Lock()
+_cliente: Optional[_ClienteCompartido] = None
+_estadisticas = {'creados': 0, 'reutilizados': 0, 'invalidados': 0}
+
+
+def _clave_cliente(token: str, nombre_repo: str) -> tuple:
+    # Resumen del token: la clave no guarda el secreto en claro
+    return hashlib.sha256(token.encode('utf-8')).hexdigest(), nombre_repo
+
+
+def obtener_repositorio(token: str, nombre_repo: str):
+    """
+    Retorna el Repository compartido para (token, nombre_repo), creándolo la primera vez o
+    cuando cambian las credenciales. Lanza GithubException si no se puede acceder al repositorio.
+    """
+    global _cliente
+    clave = _clave_cliente(token, nombre_repo)
+    with _cerrojo:
+        if _cliente is not None and _cliente.clave == clave:
+            _estadisticas['reutilizados'] += 1
+            return _cliente.repo
+        
+        # Se crea dentro del cerrojo: varios hilos a la vez no abren clientes duplicados
+        github = Github(token, pool_size=POOL_CONEXIONES_GITHUB, timeout=SEGUNDOS_TIMEOUT_GITHUB,
+                        seconds_between_requests=SEGUNDOS_ENTRE_PETICIONES)
+        repo = github.get_repo(nombre_repo)
+        # El anterior no se cierra: otros hilos pueden estar usándolo, lo libera el recolector
+        _cliente = _ClienteCompartido(clave, github, repo)
+        _estadisticas['creados'] += 1
+        return repo
+
+
+def invalidar_cliente():
+    """Descarta el cliente compartido; la próxima llamada a obtener_repositorio crea otro."""
+    global _cliente
+    with _cerrojo:
+        if _cliente is not None:
+            _estadisticas['invalidados'] += 1
+        _cliente = None
+
+
+def invalidar_si_fallo_autenticacion(error: Exception) -> bool:
+    """
+    Si el error es un rechazo de credenciales (401), descarta el cliente compartido.
+    Retorna True si se descartó.
+    """
+    if isinstance(error, BadCredentialsException) or (isinstance(error, GithubException) and error.status == 401):
+        invalidar_cliente()
+        return True
+    return False
+
+
+def estadisticas_cliente() -> Dict[str, int]:
+    """
+    Contadores del cliente compartido: clientes creados, reutilizaciones (cada una evita crear
+    un cliente y su petición get_repo) e invalidaciones.
+    """
+    with _cerrojo:
+        return dict(_estadisticas)
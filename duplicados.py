@@ -0,0 +1,380 @@
+"""
+Detección de preguntas casi duplicadas (MinHash + LSH).
+
+Los exámenes mezclan preguntas de final de libro y de años anteriores, así que la misma
+pregunta aparece varias veces con pequeños cambios de redacción. Cada pregunta se reduce a
+los bigramas de palabras de su texto normalizado (enunciado + opciones) y se resume en una
+firma MinHash de NUM_PERMUTACIONES valores: la fracción de valores iguales entre dos firmas
+estima la similitud de Jaccard de sus bigramas. Las firmas se reparten en bandas (LSH) y solo
+se comparan las preguntas que coinciden en alguna banda, sin comparar todos los pares.
+
+No depende de Streamlit: lo usan la revisión, el modo test y los scripts.
+"""
+import random
+import re
+import zlib
+from collections import defaultdict
+from itertools import combinations, count
+from typing import List, Dict, Optional, Hashable
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él las firmas se calculan en Python puro (más lento)
+    np = None
+
+
+NUM_PERMUTACIONES = 72  # valores de cada firma MinHash
+FILAS_POR_BANDA = 3  # 24 bandas de 3 filas: pares con Jaccard >= 0.6 coinciden en alguna banda con p > 0.99
+UMBRAL_DUPLICADO = 0.6  # similitud de Jaccard estimada a partir de la cual dos preguntas son duplicadas
+SEMILLA_MINHASH = 20240607  # fija: las firmas son reproducibles entre procesos y ejecuciones
+PREGUNTAS_POR_BLOQUE = 512  # preguntas por bloque en el cálculo vectorizado (acota la memoria)
+# Tamaño de cubeta hasta el que se comparan todos sus pares; en una mayor (la misma pregunta
+# repetida muchas veces) cada una se compara solo con las MAX_TAM_CUBETA primeras de la cubeta
+MAX_TAM_CUBETA = 64
+
+NUM_BANDAS = NUM_PERMUTACIONES // FILAS_POR_BANDA
+_MASCARA_64 = (1 << 64) - 1
+
+# Coeficientes de las permutaciones (hash multiplicar-desplazar: ((a*h + b) mod 2^64) >> 32, a impar),
+# multiplicadores para combinar las filas de una banda en una sola clave de 64 bits y para
+# combinar los hashes de dos palabras en el de su bigrama
+_rng = random.Random(SEMILLA_MINHASH)
+_COEF_A = [_rng.getrandbits(64) | 1 for _ in range(NUM_PERMUTACIONES)]
+_COEF_B = [_rng.getrandbits(64) for _ in range(NUM_PERMUTACIONES)]
+_MULT_BANDA = [_rng.getrandbits(64) | 1 for _ in range(FILAS_POR_BANDA)]
+
+_MULT_BIGRAMA = (_rng.getrandbits(64) | 1, _rng.getrandbits(64) | 1)
+del _rng
+
+_SIN_TILDES = str.maketrans('áéíóúüàèìòùâêîôûäëïöç', 'aeiouuaeiouaeiouaeioc')
+_PATRON_NO_PALABRA = re.compile(r'\W+')
+_PATRON_NUMERACION = re.compile(r'\d+\W*')  # "12.", "5-", "10‐"
+
+
+def _tokens_pregunta(pregunta: Dict) -> List[str]:
+    """
+    Tokens (separados por espacios, en minúsculas) del enunciado seguido de sus opciones,
+    sin la numeración inicial ("12.", "5-"), que cambia entre exámenes.
+    """
+    texto = ' '.join((pregunta.get('pregunta') or '', *(pregunta.get('opciones') or ())))
+    tokens = texto.lower().split()
+    if tokens and _PATRON_NUMERACION.fullmatch(tokens[0]):
+        del tokens[0]
+    return tokens
+
+
+def _normalizar_token(token: str) -> str:
+    """Palabra de un token: sin tildes ni signos de puntuación ("distribución," -> "distribucion")."""
+    return _PATRON_NO_PALABRA.sub('', token.translate(_SIN_TILDES))
+
+
+def palabras_pregunta(pregunta: Dict) -> List[str]:
+    """Palabras normalizadas de la pregunta (enunciado y opciones, en orden); omite los signos sueltos."""
+    return [palabra for palabra in map(_normalizar_token, _tokens_pregunta(pregunta)) if palabra]
+
+
+def _hash_palabra(palabra: str) -> int:
+    """Hash de 32 bits de una palabra normalizada."""
+    return zlib.crc32(palabra.encode('utf-8'))
+
+
+def shingles_pregunta(pregunta: Dict) -> List[int]:
+    """
+    Hashes de 32 bits de los bigramas de palabras de la pregunta
+    (mismos valores que el cálculo vectorizado de _firmas_numpy).
+    Una pregunta de una sola palabra usa la palabra; una vacía no tiene shingles.
+    """
+    hashes = [_hash_palabra(palabra) for palabra in palabras_pregunta(pregunta)]
+    if len(hashes) < 2:
+        return hashes
+    m1, m2 = _MULT_BIGRAMA
+    return [((h1 * m1 + h2 * m2) & _MASCARA_64) >> 32 for h1, h2 in zip(hashes, hashes[1:])]
+
+
+def _firma_python(hashes: List[int]) -> tuple:
+    """Firma MinHash de una pregunta en Python puro (mismos valores que _firmas_numpy)."""
+    if not hashes:
+        return ()
+    return tuple(
+        min(((a * h + b) & _MASCARA_64) >> 32 for h in hashes)
+        for a, b in zip(_COEF_A, _COEF_B)
+    )
+
+
+def _claves_bandas_python(firma: tuple) -> List[int]:
+    claves = []
+    for inicio in range(0, NUM_PERMUTACIONES, FILAS_POR_BANDA):
+        clave = 0
+        for valor, mult in zip(firma[inicio:inicio + FILAS_POR_BANDA], _MULT_BANDA):
+            clave = (clave + valor * mult) & _MASCARA_64
+        claves.append(clave)
+    return claves
+
+
+def _firmas_numpy(listas_tokens: List[List[str]]):
+    """
+    Firmas MinHash de varias preguntas a la vez a partir de sus tokens (_tokens_pregunta).
+    Cada token distinto se normaliza y hashea una sola vez; bigramas, permutaciones y mínimos
+    se calculan con NumPy sobre todos los shingles del bloque.
+    Retorna (firmas, claves_bandas, con_texto): arrays uint64 de forma (n, NUM_PERMUTACIONES) y
+    (n, NUM_BANDAS) y máscara de las preguntas con alguna palabra (las demás quedan a cero).
+    """
+    n = len(listas_tokens)
+    # Identificador de cada token distinto, en orden de aparición (todo en C: sin bucle por token)
+    vocabulario = defaultdict(count().__next__)
+    ids = []
+    for tokens in listas_tokens:
+        ids.extend(map(vocabulario.__getitem__, tokens))
+    ids = np.array(ids, dtype=np.int64)
+    normalizados = [_normalizar_token(token) for token in vocabulario]
+    hashes_vocabulario = np.array([_hash_palabra(p) if p else 0 for p in normalizados], dtype=np.uint64)
+    validos_vocabulario = np.array([bool(p) for p in normalizados], dtype=bool)
+    
+    # Quitar los signos sueltos ("-", "?") y recontar las palabras de cada pregunta
+    pregunta_de_token = np.repeat(np.arange(n), np.fromiter(map(len, listas_tokens), dtype=np.int64, count=n))
+    validos = validos_vocabulario[ids] if len(ids) else np.zeros(0, dtype=bool)
+    palabras = hashes_vocabulario[ids[validos]]
+    longitudes = np.bincount(pregunta_de_token[validos], minlength=n).astype(np.int64)
+    
+    # Bigramas: cada palabra con la siguiente, salvo la última de cada pregunta; las preguntas
+    # de una palabra conservan la palabra como único shingle
+    fines = np.cumsum(longitudes)
+    siguientes = np.empty_like(palabras)
+    siguientes[:-1] = palabras[1:]
+    with np.errstate(over='ignore'):
+        shingles = (palabras * np.uint64(_MULT_BIGRAMA[0]) + siguientes * np.uint64(_MULT_BIGRAMA[1])) >> np.uint64(32)
+    conservar = np.ones(len(palabras), dtype=bool)
+    conservar[(fines - 1)[longitudes > 0]] = False
+    sueltas = (fines - 1)[longitudes == 1]
+    shingles[sueltas] = palabras[sueltas]
+    conservar[sueltas] = True
+    shingles = shingles[conservar]
+    num_shingles = np.where(longitudes >= 2, longitudes - 1, longitudes)
+    
+    firmas = np.zeros((n, NUM_PERMUTACIONES), dtype=np.uint64)
+    coef_a = np.array(_COEF_A, dtype=np.uint64)
+    coef_b = np.array(_COEF_B, dtype=np.uint64)
+    fin_shingles = np.cumsum(num_shingles)
+    for inicio in range(0, n, PREGUNTAS_POR_BLOQUE):
+        fin = min(inicio + PREGUNTAS_POR_BLOQUE, n)
+        desde = int(fin_shingles[inicio] - num_shingles[inicio])
+        hasta = int(fin_shingles[fin - 1])
+        if hasta == desde:
+            continue
+        # (shingles, permutaciones); el producto desborda a propósito (módulo 2^64)
+        with np.errstate(over='ignore'):
+            valores = np.multiply.outer(shingles[desde:hasta], coef_a)
+            valores += coef_b
+        valores >>= np.uint64(32)
+        # Mínimo por pregunta: reduceat sobre los inicios de las preguntas con shingles
+        # (las vacías no ocupan filas, así que cada tramo acaba donde empieza la siguiente)
+        con_shingles = num_shingles[inicio:fin] > 0
+        inicios = (fin_shingles[inicio:fin] - num_shingles[inicio:fin] - desde)[con_shingles]
+        firmas[inicio:fin][con_shingles] = np.minimum.reduceat(valores, inicios, axis=0)
+    
+    mult = np.array(_MULT_BANDA, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        claves = (firmas.reshape(n, NUM_BANDAS, FILAS_POR_BANDA) * mult).sum(axis=2, dtype=np.uint64)
+    return firmas, claves, longitudes > 0
+
+
+def calcular_firmas(preguntas: List[Dict]):
+    """
+    Firmas MinHash y claves de banda LSH de una lista de preguntas.
+    Retorna (firmas, claves_bandas, con_texto): con NumPy, arrays (ver _firmas_numpy); sin él,
+    listas de tuplas, de listas de claves y de booleanos. Las preguntas sin texto no deben indexarse.
+    """
+    if np is not None:
+        return _firmas_numpy([_tokens_pregunta(p) for p in preguntas])
+    firmas = [_firma_python(shingles_pregunta(p)) for p in preguntas]
+    return firmas, [_claves_bandas_python(f) if f else [] for f in firmas], [bool(f) for f in firmas]
+
+
+class IndiceDuplicados:
+    """
+    Índice LSH de firmas MinHash para buscar preguntas casi duplicadas.
+    - claves: identificador de cada pregunta añadida (posición en el índice o el que se indique)
+    - firmas, bandas, con_texto: salida de calcular_firmas de todas las preguntas añadidas
+    - cubetas: por banda, las claves de banda ordenadas y sus posiciones (con NumPy) o un dict
+      clave de banda -> posiciones (sin él); se reconstruye tras añadir preguntas
+    Con NumPy todo el agrupado es vectorizado; sin él, el resultado es el mismo pero más lento.
+    """
+    __slots__ = ('claves', 'firmas', 'bandas', 'con_texto', '_cubetas')
+    
+    def __init__(self):
+        self.claves = []
+        if np is not None:
+            self.firmas = np.zeros((0, NUM_PERMUTACIONES), dtype=np.uint64)
+            self.bandas = np.zeros((0, NUM_BANDAS), dtype=np.uint64)
+            self.con_texto = np.zeros(0, dtype=bool)
+        else:
+            self.firmas, self.bandas, self.con_texto = [], [], []
+        self._cubetas = None
+    
+    def __len__(self):
+        return len(self.claves)
+    
+    def agregar(self, preguntas: List[Dict], claves: Optional[List[Hashable]] = None):
+        """Añade preguntas al índice; claves por defecto: su posición en el índice."""
+        if claves is None:
+            claves = list(range(len(self.claves), len(self.claves) + len(preguntas)))
+        elif len(claves) != len(preguntas):
+            raise ValueError("Debe haber una clave por pregunta")
+        firmas, bandas, con_texto = calcular_firmas(preguntas)
+        self.claves.extend(claves)
+        if np is not None:
+            self.firmas = np.concatenate([self.firmas, firmas])
+            self.bandas = np.concatenate([self.bandas, bandas])
+            self.con_texto = np.concatenate([self.con_texto, con_texto])
+        else:
+            self.firmas.extend(firmas)
+            self.bandas.extend(bandas)
+            self.con_texto.extend(con_texto)
+        self._cubetas = None
+    
+    def _obtener_cubetas(self):
+        if self._cubetas is not None:
+            return self._cubetas
+        if np is not None:
+            posiciones = np.flatnonzero(self.con_texto)
+            self._cubetas = []
+            for banda in range(NUM_BANDAS):
+                claves = self.bandas[posiciones, banda]
+                orden = np.argsort(claves, kind='stable')  # estable: posiciones crecientes dentro de cada clave
+                self._cubetas.append((claves[orden], posiciones[orden]))
+        else:
+            self._cubetas = [{} for _ in range(NUM_BANDAS)]
+            for posicion, (bandas, con_texto) in enumerate(zip(self.bandas, self.con_texto)):
+                if con_texto:
+                    for cubetas_banda, clave in zip(self._cubetas, bandas):
+                        cubetas_banda.setdefault(clave, []).append(posicion)
+        return self._cubetas
+    
+    def _pares_candidatos(self) -> List[tuple[int, int]]:
+        """
+        Pares (i, j), i < j, de posiciones que comparten alguna cubeta: todos los pares de cada
+        cubeta de hasta MAX_TAM_CUBETA preguntas; en las mayores, los de cada pregunta con las
+        MAX_TAM_CUBETA primeras (las de posición menor, candidatas a representante), lo que
+        acota el coste a O(n · MAX_TAM_CUBETA).
+        """
+        cubetas = self._obtener_cubetas()
+        if np is None:
+            pares = set()
+            for cubetas_banda in cubetas:
+                for posiciones in cubetas_banda.values():
+                    if len(posiciones) <= MAX_TAM_CUBETA:
+                        pares.update(combinations(posiciones, 2))
+                    else:
+                        for desplazamiento, primera in enumerate(posiciones[:MAX_TAM_CUBETA]):
+                            pares.update((primera, otra) for otra in posiciones[desplazamiento + 1:])
+            return sorted(pares)
+        
+        bloques = []
+        for claves, posiciones in cubetas:
+            if len(claves) < 2:
+                continue
+            # Las claves están ordenadas: cada cubeta es un tramo de claves iguales. desplazamientos
+            # es la posición de cada elemento dentro de su tramo
+            nuevas = np.ones(len(claves), dtype=bool)
+            nuevas[1:] = claves[1:] != claves[:-1]
+            inicios = np.maximum.accumulate(np.where(nuevas, np.arange(len(claves)), 0))
+            desplazamientos = np.arange(len(claves)) - inicios
+            # Cada elemento con los d-ésimos de su tramo que están antes que él
+            for d in range(MAX_TAM_CUBETA):
+                detras = desplazamientos > d
+                if not detras.any():
+                    break
+                bloques.append(np.stack([posiciones[inicios[detras] + d], posiciones[detras]], axis=1))
+        pares = np.unique(np.concatenate(bloques), axis=0) if bloques else np.zeros((0, 2), dtype=np.int64)
+        return pares
+    
+    def grupos(self, umbral: float = UMBRAL_DUPLICADO) -> List[List[int]]:
+        """
+        Grupos de posiciones del índice duplicadas de un representante: la primera posición de
+        cada grupo, y todas las demás tienen similitud >= umbral con ella (no se encadena: si
+        A~B y B~C pero no A~C, C no entra en el grupo de A). Cada posición se une al primer
+        representante anterior al que se parece o, si no hay ninguno, pasa a ser representante.
+        Ordenados por su primera posición; omite las preguntas que no se repiten.
+        """
+        pares = self._pares_candidatos()
+        if np is not None:
+            if len(pares):
+                iguales = (self.firmas[pares[:, 0]] == self.firmas[pares[:, 1]]).sum(axis=1)
+                pares = pares[iguales >= umbral * NUM_PERMUTACIONES].tolist()
+            else:
+                pares = []
+        else:
+            pares = [(i, j) for i, j in pares if similitud_firmas(self.firmas[i], self.firmas[j]) >= umbral]
+        
+        anteriores = {}  # j -> posiciones i < j parecidas a j
+        for i, j in pares:
+            anteriores.setdefault(j, []).append(i)
+        
+        miembros = {}  # representante -> posiciones de su grupo
+        representante_de = {}  # posición que ya está en un grupo -> su representante
+        for j in sorted(anteriores):
+            # i < j ya tiene su papel decidido: representante salvo que esté en otro grupo
+            representantes = [i for i in anteriores[j] if i not in representante_de]
+            if representantes:
+                representante = min(representantes)
+                miembros.setdefault(representante, [representante]).append(j)
+                representante_de[j] = representante
+        return sorted(sorted(grupo) for grupo in miembros.values())
+    
+    def similares(self, preguntas: List[Dict], umbral: float = UMBRAL_DUPLICADO) -> List[List[tuple]]:
+        """
+        Para cada pregunta, las del índice con similitud estimada >= umbral.
+        Retorna una lista (una entrada por pregunta) de listas [(clave, similitud)] de mayor a menor.
+        """
+        cubetas = self._obtener_cubetas()
+        firmas, bandas, con_texto = calcular_firmas(preguntas)
+        resultados = []
+        for idx in range(len(preguntas)):
+            encontradas = []
+            if con_texto[idx]:
+                candidatos = set()
+                if np is not None:
+                    for (claves, posiciones), clave in zip(cubetas, bandas[idx]):
+                        izquierda = np.searchsorted(claves, clave, 'left')
+                        derecha = np.searchsorted(claves, clave, 'right')
+                        candidatos.update(posiciones[izquierda:derecha].tolist())
+                    if candidatos:
+                        candidatos = sorted(candidatos)
+                        iguales = (self.firmas[candidatos] == firmas[idx]).sum(axis=1).tolist()
+                        encontradas = [(self.claves[pos], n / NUM_PERMUTACIONES)
+                                       for pos, n in zip(candidatos, iguales) if n >= umbral * NUM_PERMUTACIONES]
+                else:
+                    for cubetas_banda, clave in zip(cubetas, bandas[idx]):
+                        candidatos.update(cubetas_banda.get(clave, ()))
+                    for pos in sorted(candidatos):
+                        similitud = similitud_firmas(firmas[idx], self.firmas[pos])
+                        if similitud >= umbral:
+                            encontradas.append((self.claves[pos], similitud))
+                encontradas.sort(key=lambda par: -par[1])
+            resultados.append(encontradas)
+        return resultados
+
+
+def similitud_firmas(firma_a: tuple, firma_b: tuple) -> float:
+    """Similitud de Jaccard estimada: fracción de valores iguales entre dos firmas MinHash."""
+    if not firma_a or not firma_b:
+        return 0.0
+    return sum(1 for x, y in zip(firma_a, firma_b) if x == y) / NUM_PERMUTACIONES
+
+
+def buscar_duplicados(preguntas: List[Dict], umbral: float = UMBRAL_DUPLICADO) -> List[List[int]]:
+    """
+    Grupos de índices de preguntas casi duplicadas dentro de la lista (cada grupo ordenado).
+    Las preguntas sin repetir no aparecen.
+    """
+    indice = IndiceDuplicados()
+    indice.agregar(preguntas)
+    return indice.grupos(umbral)
+
+
+def indices_sin_duplicados(preguntas: List[Dict], umbral: float = UMBRAL_DUPLICADO) -> List[int]:
+    """Índices de las preguntas que se conservan al quitar duplicadas (la primera de cada grupo)."""
+    repetidas = set()
+    for grupo in buscar_duplicados(preguntas, umbral):
+        repetidas.update(grupo[1:])
+    return [idx for idx in range(len(preguntas)) if idx not in repetidas]
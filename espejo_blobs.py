@@ -0,0 +1,193 @@
+"""
+Espejo en disco de los archivos de la biblioteca, direccionado por el SHA del blob de git.
+
+El SHA de git identifica el contenido, así que un examen cuyo SHA aparece en el índice se puede
+servir desde el disco sin ninguna petición mientras siga en el espejo. cache_github lo usa como
+segundo nivel por debajo de su caché de blobs en memoria: lo que se descarga o se publica se
+escribe aquí al momento.
+
+Cada archivo es <sha>.blob con el contenido tal cual está en el repositorio. El tamaño total
+está acotado con desalojo LRU (por fecha de último acceso). Igual que cache_extraccion, es
+seguro para varios procesos de Streamlit compartiendo el mismo directorio (todas las sesiones
+del servidor): las escrituras son atómicas (archivo temporal + os.replace) y las lecturas y
+desalojos toleran que otro proceso borre una entrada al mismo tiempo. Los archivos grandes se
+escriben y se leen por trozos (EscrituraEspejo, abrir_espejo) sin tenerlos enteros en memoria.
+"""
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+
+DIRECTORIO_ESPEJO_POR_DEFECTO = os.path.join(tempfile.gettempdir(), "flashcards_espejo_biblioteca")
+MAX_BYTES_ESPEJO_POR_DEFECTO = 512 * 1024 * 1024  # 512 MB
+
+EXTENSION_ESPEJO = ".blob"
+
+
+def _ruta_blob(directorio: str, sha: str) -> str:
+    return os.path.join(directorio, sha + EXTENSION_ESPEJO)
+
+
+def _sha_valido(sha: str) -> bool:
+    # Solo hexadecimal: el SHA es el nombre del archivo
+    return bool(sha) and all(c in "0123456789abcdef" for c in sha.lower())
+
+
+def abrir_espejo(sha: str, directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO) -> Optional[BinaryIO]:
+    """Archivo abierto (binario) del blob sha si está en el espejo (y lo marca como usado), o None."""
+    if not _sha_valido(sha):
+        return None
+    ruta = _ruta_blob(directorio, sha)
+    try:
+        archivo = open(ruta, "rb")
+    except OSError:
+        return None
+    
+    # Marcar como usado recientemente (para el desalojo LRU)
+    try:
+        os.utime(ruta, None)
+    except OSError:
+        pass
+    return archivo
+
+
+def leer_espejo(sha: str, directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO) -> Optional[bytes]:
+    """Contenido del blob sha si está en el espejo (y lo marca como usado), o None."""
+    archivo = abrir_espejo(sha, directorio)
+    if archivo is None:
+        return None
+    try:
+        with archivo:
+            return archivo.read()
+    except OSError:
+        return None
+
+
+class EscrituraEspejo:
+    """
+    Escritura por trozos de un blob en el espejo. El blob solo aparece en el espejo al
+    confirmar(); descartar() (o superar max_bytes) borra lo escrito. Los fallos del disco
+    desactivan la escritura en silencio: el espejo nunca es imprescindible.
+    """
+    __slots__ = ('sha', 'directorio', 'max_bytes', '_archivo', '_ruta_temporal', '_bytes')
+    
+    def __init__(self, sha: str, directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO,
+                 max_bytes: int = MAX_BYTES_ESPEJO_POR_DEFECTO):
+        self.sha = sha
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._archivo = None
+        self._ruta_temporal = None
+        self._bytes = 0
+        if max_bytes <= 0 or not _sha_valido(sha):
+            return
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            # Escritura atómica: otro proceso nunca ve un blob a medio escribir
+            fd, self._ruta_temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+            self._archivo = os.fdopen(fd, "wb")
+        except OSError:
+            self.descartar()
+    
+    def escribir(self, trozo: bytes):
+        if self._archivo is None:
+            return
+        self._bytes += len(trozo)
+        if self._bytes > self.max_bytes:
+            # No cabría en el espejo aunque se desalojara todo lo demás
+            self.descartar()
+            return
+        try:
+            self._archivo.write(trozo)
+        except OSError:
+            self.descartar()
+    
+    def confirmar(self) -> bool:
+        """Publica el blob en el espejo y lo recorta a max_bytes. Retorna True si quedó guardado."""
+        if self._archivo is None:
+            return False
+        try:
+            self._archivo.close()
+            os.replace(self._ruta_temporal, _ruta_blob(self.directorio, self.sha))
+        except OSError:
+            self.descartar()
+            return False
+        self._archivo = None
+        recortar_espejo(self.directorio, self.max_bytes)
+        return True
+    
+    def descartar(self):
+        if self._archivo is not None:
+            try:
+                self._archivo.close()
+            except OSError:
+                pass
+            self._archivo = None
+        if self._ruta_temporal is not None:
+            try:
+                os.remove(self._ruta_temporal)
+            except OSError:
+                pass
+            self._ruta_temporal = None
+
+
+def escribir_espejo(sha: str, contenido: bytes, directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO,
+                    max_bytes: int = MAX_BYTES_ESPEJO_POR_DEFECTO) -> bool:
+    """
+    Guarda el blob sha en el espejo y lo recorta a max_bytes.
+    Retorna True si se escribió (un fallo del espejo nunca es fatal).
+    """
+    if max_bytes <= 0 or len(contenido) > max_bytes or not _sha_valido(sha):
+        return False
+    ruta = _ruta_blob(directorio, sha)
+    if os.path.exists(ruta):
+        # Mismo SHA, mismo contenido: basta con marcarlo como usado
+        try:
+            os.utime(ruta, None)
+            return True
+        except OSError:
+            pass
+    
+    escritura = EscrituraEspejo(sha, directorio, max_bytes)
+    escritura.escribir(contenido)
+    return escritura.confirmar()
+
+
+def recortar_espejo(directorio: str = DIRECTORIO_ESPEJO_POR_DEFECTO,
+                    max_bytes: int = MAX_BYTES_ESPEJO_POR_DEFECTO) -> int:
+    """
+    Elimina los blobs usados hace más tiempo hasta que el espejo ocupe como mucho max_bytes.
+    Retorna el número de blobs eliminados.
+    """
+    entradas = []
+    total = 0
+    try:
+        with os.scandir(directorio) as it:
+            for entrada in it:
+                if not entrada.name.endswith(EXTENSION_ESPEJO):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, entrada.path))
+                total += info.st_size
+    except FileNotFoundError:
+        return 0
+    
+    eliminados = 0
+    # Más antiguos primero
+    for _, tamano, ruta in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            eliminados += 1
+        except FileNotFoundError:
+            # Otro proceso ya lo eliminó
+            pass
+        except OSError:
+            continue
+        total -= tamano
+    
+    return eliminados
@@ -0,0 +1,318 @@
+"""
+Formato de los exámenes de la biblioteca (biblioteca/*.json).
+
+Construcción del JSON que se publica, nombre de archivo a partir del título y
+aplanado de preguntas agrupadas en casos. No depende de Streamlit, de modo que
+lo comparten la app y la ingesta por lotes (ingesta_lote.py).
+
+Un examen se guarda en uno de dos formatos (codificar_examen / decodificar_examen):
+    - clásico: el dict del examen como JSON indentado (el de siempre).
+    - columnar (version_formato 2): los campos de las preguntas en listas paralelas
+      (enunciados, opciones, índices de respuesta, tipos codificados...), sin repetir las
+      claves en cada pregunta. Los casos se guardan aparte con la fila en la que empiezan.
+      Un null en una columna es un campo ausente; los campos presentes con valor None se
+      anotan aparte en 'nulos' (campo -> filas), de modo que el examen se reconstruye igual.
+Cualquiera de los dos puede comprimirse con gzip; el archivo conserva la extensión .json y
+decodificar_examen reconoce el formato por su contenido, así que los archivos antiguos se
+siguen leyendo igual.
+
+Se escribe en clásico por defecto: las versiones de la app anteriores a este módulo solo leen
+ese formato. El columnar solo ahorra un 25 % de bytes y decodifica en un tiempo parecido; lo
+que reduce la transferencia es gzip (columnar+gzip ocupa unas 6 veces menos en el examen de
+biblioteca/), a cambio de decodificar algo más despacio por la descompresión (ver
+benchmarks/benchmark_formato_examen.py). Conviene activarlo cuando todas las instancias que
+leen la biblioteca tengan este módulo. decodificar_examen_flujo hace lo mismo con un archivo que llega por
+trozos (una descarga por streaming) sin juntarlo entero en memoria.
+"""
+import gzip
+import itertools
+import json
+import re
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Dict, Union
+
+from json_incremental import leer_json_incremental, texto_utf8
+
+
+CARPETA_BIBLIOTECA = "biblioteca"
+
+FORMATO_CLASICO = "clasico"
+FORMATO_COLUMNAR = "columnar"
+FORMATOS_EXAMEN = (FORMATO_CLASICO, FORMATO_COLUMNAR)
+FORMATO_EXAMEN_POR_DEFECTO = FORMATO_CLASICO  # el que leen también las versiones anteriores de la app
+VERSION_FORMATO_COLUMNAR = 2
+
+# Campos de pregunta con columna propia (un valor null en la columna = campo ausente, salvo
+# las filas anotadas en 'nulos', donde el campo está con valor None)
+CAMPOS_PREGUNTA = ('pregunta', 'opciones', 'correcta', 'tipo', 'vf_detectado_enunciado', 'caso')
+CAMPOS_CASO = ('tipo', 'numero_caso', 'texto_caso', 'preguntas_caso')
+
+CABECERA_GZIP = b"\x1f\x8b"
+NIVEL_GZIP = 6
+
+# Hasta este tamaño decodificar_examen_flujo junta los trozos y usa json.loads (más rápido)
+BYTES_DECODIFICACION_DIRECTA = 1024 * 1024  # 1 MB
+TAM_TROZO_DESCOMPRIMIDO = 256 * 1024
+
+
+def sanitizar_nombre_archivo(titulo: str) -> str:
+    """
+    Sanitiza el título para usarlo como nombre de archivo.
+    Elimina caracteres especiales y espacios.
+    """
+    # Reemplazar espacios y caracteres especiales
+    nombre = re.sub(r'[^\w\s-]', '', titulo)
+    nombre = re.sub(r'[-\s]+', '_', nombre)
+    return nombre.strip('_')
+
+
+def nombre_archivo_examen(titulo: str) -> str:
+    """
+    Nombre de archivo (sin extensión) con el que se guarda un examen.
+    Si el título no deja ningún carácter válido, usa uno basado en la fecha.
+    """
+    nombre_archivo = sanitizar_nombre_archivo(titulo)
+    if not nombre_archivo:
+        nombre_archivo = f"examen_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    return nombre_archivo
+
+
+def construir_examen(titulo: str, descripcion: str, preguntas: List[Dict]) -> Dict:
+    """
+    Crea la estructura del examen con metadata tal y como se guarda en la biblioteca.
+    """
+    return {
+        'titulo': titulo,
+        'descripcion': descripcion,
+        'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'num_preguntas': len(preguntas),
+        'preguntas': preguntas
+    }
+
+
+def serializar_examen(examen_data: Dict) -> str:
+    """Convierte un examen a JSON (mismo formato que los archivos de biblioteca/)."""
+    return json.dumps(examen_data, ensure_ascii=False, indent=2)
+
+
+def examen_a_columnas(examen_data: Dict) -> Dict:
+    """
+    Convierte un examen (dict de construir_examen) al formato columnar.
+    Las preguntas de los casos se guardan como filas normales con la columna 'grupo' (índice
+    en 'casos'); los campos que no están en CAMPOS_PREGUNTA van a la columna 'extra'. Las
+    filas en las que un campo está con valor None (no ausente) van en 'nulos'.
+    """
+    filas = []  # (pregunta, grupo)
+    casos = []
+    for item in examen_data.get('preguntas', []):
+        if item.get('tipo') == 'caso':
+            caso = {k: v for k, v in item.items() if k not in ('tipo', 'preguntas_caso')}
+            caso['fila'] = len(filas)
+            filas.extend((pregunta, len(casos)) for pregunta in item.get('preguntas_caso', []))
+            casos.append(caso)
+        else:
+            filas.append((item, None))
+
+    # Los tipos se codifican como índices en la lista 'tipos'
+    tipos = []
+    codigos_tipo = {}
+    columnas = {campo: [] for campo in CAMPOS_PREGUNTA}
+    columnas['grupo'] = []
+    columnas['extra'] = []
+    nulos = {}
+    for fila, (pregunta, grupo) in enumerate(filas):
+        for campo in CAMPOS_PREGUNTA:
+            valor = pregunta.get(campo)
+            if valor is None and campo in pregunta:
+                nulos.setdefault(campo, []).append(fila)
+            elif campo == 'tipo' and valor is not None:
+                if valor not in codigos_tipo:
+                    codigos_tipo[valor] = len(tipos)
+                    tipos.append(valor)
+                valor = codigos_tipo[valor]
+            columnas[campo].append(valor)
+        columnas['grupo'].append(grupo)
+        extra = {k: v for k, v in pregunta.items() if k not in CAMPOS_PREGUNTA}
+        columnas['extra'].append(extra or None)
+
+    # Las columnas sin ningún valor no se guardan
+    columnas = {campo: valores for campo, valores in columnas.items() if any(v is not None for v in valores)}
+
+    datos = {k: v for k, v in examen_data.items() if k != 'preguntas'}
+    datos['version_formato'] = VERSION_FORMATO_COLUMNAR
+    datos['num_filas'] = len(filas)
+    datos['tipos'] = tipos
+    datos['casos'] = casos
+    datos['columnas'] = columnas
+    if nulos:
+        datos['nulos'] = nulos
+    return datos
+
+
+def examen_de_columnas(datos: Dict) -> Dict:
+    """Reconstruye el examen (mismo dict que construir_examen) a partir del formato columnar."""
+    num_filas = datos['num_filas']
+    columnas = datos['columnas']
+    tipos = datos.get('tipos', [])
+    vacia = [None] * num_filas
+    valores_campos = [(campo, columnas.get(campo, vacia)) for campo in CAMPOS_PREGUNTA]
+    grupos = columnas.get('grupo', vacia)
+    extras = columnas.get('extra', vacia)
+    # Archivos anteriores a 'nulos': todo null es un campo ausente
+    nulos = {campo: set(filas) for campo, filas in datos.get('nulos', {}).items()}
+
+    casos_por_fila = {}
+    for indice, caso in enumerate(datos.get('casos', [])):
+        casos_por_fila.setdefault(caso['fila'], []).append(indice)
+    items_caso = {}
+
+    preguntas = []
+    for fila in range(num_filas + 1):
+        # Los casos se abren en la fila de su primera pregunta (o al final si están vacíos)
+        for indice in casos_por_fila.get(fila, ()):
+            caso = {k: v for k, v in datos['casos'][indice].items() if k != 'fila'}
+            item = {'tipo': 'caso', **caso, 'preguntas_caso': []}
+            items_caso[indice] = item
+            preguntas.append(item)
+        if fila == num_filas:
+            break
+
+        pregunta = {}
+        for campo, valores in valores_campos:
+            valor = valores[fila]
+            if valor is not None:
+                pregunta[campo] = tipos[valor] if campo == 'tipo' else valor
+            elif fila in nulos.get(campo, ()):
+                pregunta[campo] = None
+        if extras[fila]:
+            pregunta.update(extras[fila])
+
+        if grupos[fila] is None:
+            preguntas.append(pregunta)
+        else:
+            items_caso[grupos[fila]]['preguntas_caso'].append(pregunta)
+
+    examen_data = {k: v for k, v in datos.items()
+                   if k not in ('version_formato', 'num_filas', 'tipos', 'casos', 'columnas', 'nulos')}
+    examen_data['preguntas'] = preguntas
+    return examen_data
+
+
+def codificar_examen(examen_data: Dict, formato: str = FORMATO_EXAMEN_POR_DEFECTO, comprimir: bool = False) -> bytes:
+    """
+    Bytes del archivo de un examen en el formato indicado (FORMATOS_EXAMEN), opcionalmente
+    comprimido con gzip. La compresión es determinista (sin fecha en la cabecera gzip), así que
+    el mismo examen da siempre el mismo SHA de blob.
+    """
+    if formato == FORMATO_CLASICO:
+        contenido = serializar_examen(examen_data).encode('utf-8')
+    elif formato == FORMATO_COLUMNAR:
+        contenido = json.dumps(examen_a_columnas(examen_data), ensure_ascii=False,
+                               separators=(',', ':')).encode('utf-8')
+    else:
+        raise ValueError(f"Formato de examen desconocido: {formato} (opciones: {', '.join(FORMATOS_EXAMEN)})")
+    if comprimir:
+        contenido = gzip.compress(contenido, compresslevel=NIVEL_GZIP, mtime=0)
+    return contenido
+
+
+def decodificar_examen(contenido: Union[bytes, str]) -> Dict:
+    """
+    Lee un archivo de examen en cualquier formato (clásico o columnar, con o sin gzip).
+    Lanza ValueError si no es un examen válido o su versión de formato es desconocida.
+    """
+    if isinstance(contenido, (bytes, bytearray)) and contenido[:2] == CABECERA_GZIP:
+        try:
+            contenido = gzip.decompress(contenido)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"Examen comprimido corrupto: {e}") from e
+    return _examen_de_datos(json.loads(contenido))
+
+
+def _descomprimir_gzip(trozos: Iterable[bytes]) -> Iterator[bytes]:
+    descompresor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        for trozo in trozos:
+            # Acotado: un trozo comprimido pequeño puede descomprimirse en muchos MB
+            while trozo:
+                datos = descompresor.decompress(trozo, TAM_TROZO_DESCOMPRIMIDO)
+                trozo = descompresor.unconsumed_tail
+                if datos:
+                    yield datos
+        datos = descompresor.flush()
+    except zlib.error as e:
+        raise ValueError(f"Examen comprimido corrupto: {e}") from e
+    if not descompresor.eof:
+        raise ValueError("Examen comprimido corrupto: archivo truncado")
+    if datos:
+        yield datos
+
+
+def decodificar_examen_flujo(trozos: Iterable[bytes]) -> Dict:
+    """
+    decodificar_examen de un archivo que llega en trozos de bytes (p. ej. abrir_blob de
+    cache_github). Si ocupa hasta BYTES_DECODIFICACION_DIRECTA (también descomprimido) se junta
+    y se decodifica de una vez; si no, se descomprime e interpreta a medida que llega
+    (leer_json_incremental), sin tener a la vez el archivo entero y las preguntas construidas.
+    """
+    trozos = iter(trozos)
+    iniciales = []
+    tamano = 0
+    for trozo in trozos:
+        iniciales.append(trozo)
+        tamano += len(trozo)
+        if tamano > BYTES_DECODIFICACION_DIRECTA:
+            break
+    else:
+        contenido = b"".join(iniciales)
+        # El tamaño descomprimido de un gzip está en sus 4 últimos bytes (módulo 4 GB)
+        if (contenido[:2] != CABECERA_GZIP or len(contenido) < 18
+                or int.from_bytes(contenido[-4:], 'little') <= BYTES_DECODIFICACION_DIRECTA):
+            return decodificar_examen(contenido)
+        iniciales = [contenido]
+
+    cabecera = b""
+    for trozo in iniciales:
+        cabecera += trozo[:len(CABECERA_GZIP) - len(cabecera)]
+        if len(cabecera) == len(CABECERA_GZIP):
+            break
+    flujo = itertools.chain(iniciales, trozos)
+    if cabecera == CABECERA_GZIP:
+        flujo = _descomprimir_gzip(flujo)
+    return _examen_de_datos(leer_json_incremental(texto_utf8(flujo)))
+
+
+def _examen_de_datos(datos) -> Dict:
+    """Comprueba el JSON de un archivo de examen y, si es columnar, lo convierte."""
+    if not isinstance(datos, dict):
+        raise ValueError("El archivo no contiene un examen")
+    if 'version_formato' not in datos:
+        return datos
+    if datos['version_formato'] != VERSION_FORMATO_COLUMNAR:
+        raise ValueError(f"Versión de formato de examen no soportada: {datos['version_formato']}")
+    try:
+        return examen_de_columnas(datos)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Examen columnar corrupto: {e}") from e
+
+
+def aplanar_preguntas_con_casos(preguntas_estructuradas):
+    """
+    Convierte la estructura de preguntas con casos agrupados en una lista plana.
+    Útil para contar preguntas totales, etc.
+    Asigna el campo 'caso' a cada pregunta que pertenece a un caso.
+    """
+    preguntas_planas = []
+    for item in preguntas_estructuradas:
+        if item.get('tipo') == 'caso':
+            numero_caso = item.get('numero_caso', '')
+            # Asegurar que cada pregunta del caso tenga el campo 'caso' asignado
+            for pregunta in item.get('preguntas_caso', []):
+                # Asignar el campo 'caso' si no existe o actualizarlo si es necesario
+                if 'caso' not in pregunta or pregunta.get('caso') != numero_caso:
+                    pregunta['caso'] = numero_caso
+                preguntas_planas.append(pregunta)
+        else:
+            preguntas_planas.append(item)
+    return preguntas_planas
@@ -0,0 +1,1550 @@
+"""
+Extracción de preguntas desde PDF (PyMuPDF).
+
+Contiene el filtrado de ruido de página, la limpieza de texto y la máquina de
+estados que convierte las líneas visuales del PDF en preguntas. No depende de
+Streamlit, de modo que puede usarse desde procesos auxiliares y scripts.
+"""
+import fitz  # PyMuPDF
+import re
+import math
+from array import array
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa el motor de líneas en Python puro
+    np = None
+
+
+# Versión de la etapa de maquetación (extraer_lineas_pagina: texto, marcado, ruido por línea,
+# agrupado y limpieza de líneas). Incrementar solo cuando cambien las líneas visuales que produce:
+# invalida las maquetaciones cacheadas. Los cambios en la máquina de estados no la afectan.
+VERSION_LAYOUT = 2
+
+# Ajustes por defecto de la etapa de análisis (analizar_paginas)
+MAX_OPCIONES = 4  # opciones por pregunta; las siguientes se fusionan con la última (etiquetas a-e)
+DETECTAR_VF = True  # buscar V/F al final del enunciado de las preguntas sin opciones
+
+# Flags de page.get_text("dict") sin TEXT_PRESERVE_IMAGES: los bloques de imagen no tienen
+# texto y, con ese flag, traen incrustados los bytes de cada imagen (enorme en PDFs escaneados)
+FLAGS_TEXTO_DICT = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+# Marcadores literales de ruido (se buscan en el texto en mayúsculas)
+MARCADORES_RUIDO = [
+    "PAG.",
+    "PÁGINA",
+    "DESCARGADO POR",
+    "PROFESORAS:",
+    "PROFESORES:",
+    "DEPARTAMENTO DE MARKETING",
+    "DIRECCIÓN COMERCIAL",
+    "DIRECCIÓN COMERCIAL I",
+    "SISTEMA DE PUNTUACIÓN",
+    "□",  # Símbolo de cuadro
+    "JOSEFA PARREÑO SELVA",
+    "ENAR RUIZ CONDE",
+    "ADEGO!",
+    "VERDADERO FALSO",
+    "FICHA DE AUTOEVALUACIÓN",
+]
+
+# Nombres de profesores: son ruido si aparecen todas las palabras del grupo (en cualquier orden)
+COMBINACIONES_RUIDO = [
+    ("JOSEFA", "PARREÑO"),
+    ("ENAR", "RUIZ", "CONDE"),
+]
+
+# Patrones regex para ruido más complejo (anclados al inicio de la línea, sin distinguir mayúsculas)
+PATRONES_RUIDO_REGEX = [
+    r'^\s*SISTEMA DE PUNTUACIÓN.*',  # Sistema de puntuación (captura todo el párrafo)
+    r'^\s*Las preguntas tienen una única respuesta correcta.*',  # Continuación del sistema de puntuación
+    r'^\s*Los desaciertos puntúan.*',  # Continuación del sistema de puntuación
+    r'^\s*Para aprobar el examen será necesario obtener.*',  # Final del sistema de puntuación
+    r'^\s*Los desaciertos puntúan -0,2 puntos.*',  # Variante del sistema de puntuación
+    r'^\s*las preguntas no contestadas.*puntos.*',  # Variante del sistema de puntuación
+    r'^\s*EXAMEN.*DIRECCIÓN DE MARKETING.*',  # Encabezados de examen
+    r'^\s*PREGUNTAS EXÁMENES TIPO TEST',  # Título de preguntas
+    r'^\s*EXAMEN FINAL.*DIRECCIÓN DE MARKETING.*',  # Examen final
+    r'^\s*EXAMEN ENERO \d{4}',  # Examen enero año
+    r'^\s*Ficha de autoevaluación.*',  # Ficha de autoevaluación (con o sin Tema:)
+    r'^\s*Ficha de autoevaluación\s+Tema:.*',  # Ficha de autoevaluación con Tema
+    r'^\s*Dirección Comercial I.*',  # Dirección Comercial I (con o sin número y departamento)
+    r'^\s*Dirección Comercial I\s+\d+.*',  # Dirección Comercial I seguido de número
+    r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing.*',  # Completo
+    r'^\s*Departamento de Marketing.*',  # Solo Departamento de Marketing
+    r'^\s*Tema:\s+.*',  # Tema: seguido de cualquier texto
+    r'^\s*Tema\s+\d+.*',  # Tema seguido de número y posiblemente más texto
+    r'^\s*Código:\s*\d+',  # Código con número
+    r'^\s*PAG\.\d+',  # PAG. seguido de número
+    r'^\s*Página\s+\d+',  # Página seguido de número
+    r'^\s*Tema\s+\d+\s*$',  # Solo "Tema X"
+    r'^\s*Profesoras?:.*',  # Profesoras: o Profesores: seguido de texto
+    r'^\s*Verdadero\s*$',  # Solo "Verdadero" (encabezado de columna)
+    r'^\s*Falso\s*$',  # Solo "Falso" (encabezado de columna)
+    r'^\s*\d+\s+Verdadero\s+Falso\s*$',  # Número seguido de "Verdadero Falso" (ej: "3 Verdadero Falso")
+    r'^\s*Dirección Comercial I\s+\d+\s+Departamento de Marketing\s+Verdadero\s+Falso\s*$',  # Completo con Verdadero Falso
+    r'^\s*lOMoARcPSD\|.*',  # ID de documento (ej: "lOMoARcPSD|11624338")
+    r'^\s*TEMA:\s+',  # Tema: seguido de texto (puede ser parte de ficha o encabezado)
+    r'^\s*(Verdadero|Falso)\s*$',  # "Verdadero" o "Falso" solos (encabezados de columnas V/F)
+]
+
+
+def _compilar_clasificador_ruido():
+    """
+    Compila las reglas de ruido una sola vez (al importar el módulo):
+    - Un único patrón con todos los literales y palabras de combinaciones. Se busca con un
+      lookahead para obtener también coincidencias solapadas, igual que varias búsquedas `in`.
+    - Una única alternancia con todos los patrones regex, evaluada con un solo match.
+    """
+    palabras_combinacion = sorted({palabra for grupo in COMBINACIONES_RUIDO for palabra in grupo})
+    # Los literales van primero: si hay uno en una posición, basta para clasificar la línea como ruido
+    literales = MARCADORES_RUIDO + [p for p in palabras_combinacion if p not in MARCADORES_RUIDO]
+    literales.sort(key=len, reverse=True)
+    patron_literales = re.compile(
+        '(?=(' + '|'.join(re.escape(literal) for literal in literales) + '))'
+    )
+    patron_regex = re.compile(
+        r'\s*(?:' + '|'.join(patron[len(r'^\s*'):] for patron in PATRONES_RUIDO_REGEX) + ')',
+        re.IGNORECASE
+    )
+    return patron_literales, frozenset(MARCADORES_RUIDO), patron_regex
+
+
+_PATRON_LITERALES_RUIDO, _MARCADORES_RUIDO_SET, _PATRON_REGEX_RUIDO = _compilar_clasificador_ruido()
+
+
+def es_ruido_pagina(texto: str) -> bool:
+    """
+    Detecta si una línea es ruido de página (header/footer) que debe ignorarse completamente.
+    Incluye detección de encabezados de examen, profesores, departamentos, etc.
+    
+    Las reglas (MARCADORES_RUIDO, COMBINACIONES_RUIDO, PATRONES_RUIDO_REGEX) se compilan al
+    importar el módulo en dos patrones, de modo que cada línea se recorre como mucho dos veces.
+    """
+    if not texto:
+        return True
+    
+    # 1. Marcadores literales y palabras de combinaciones (búsqueda en mayúsculas, una pasada)
+    palabras_encontradas = set()
+    for coincidencia in _PATRON_LITERALES_RUIDO.finditer(texto.upper()):
+        literal = coincidencia.group(1)
+        if literal in _MARCADORES_RUIDO_SET:
+            return True
+        palabras_encontradas.add(literal)
+    
+    # 2. Detección de nombres de profesores (pueden aparecer solos o con variaciones)
+    if palabras_encontradas:
+        for grupo in COMBINACIONES_RUIDO:
+            if palabras_encontradas.issuperset(grupo):
+                return True
+    
+    # 3. Patrones regex (una sola alternancia anclada al inicio)
+    return _PATRON_REGEX_RUIDO.match(texto.strip()) is not None
+
+
+# --- Pipeline de limpieza de texto ---
+# Todos los patrones se compilan una vez al importar el módulo. Las reglas de cada etapa se
+# aplican en el mismo orden que siempre (una regla puede dejar al descubierto otra referencia
+# al final del texto), pero cada etapa se salta entera cuando un único patrón "guarda" confirma
+# que el texto no contiene nada que sus reglas puedan eliminar. Así la mayoría de las líneas
+# solo se recorren un par de veces.
+
+# Guarda de referencias: toda regla de referencias/códigos necesita uno de estos fragmentos
+_PATRON_HAY_REFERENCIAS = re.compile(r'P(?:\s*\d|AG\.\s*\d|ágina\s+\d)|Código:\s*\d', re.IGNORECASE)
+# Guarda de "Tema X"
+_PATRON_HAY_TEMA = re.compile(r'Tema\s+\d', re.IGNORECASE)
+# Guarda de marcas V/F de opciones: toda regla de V/F necesita un espacio seguido de V/F o (V/F
+_PATRON_HAY_VF = re.compile(r'\s\(?[VF]', re.IGNORECASE)
+
+# Etapa 1: referencias de página al final del texto (P\d+, P \d+, Página \d+)
+# Incluye casos pegados a ":" o cualquier carácter final
+_PATRONES_REFERENCIAS_FINALES = [
+    re.compile(r'[:;]\s*P\s*\d+\s*$', re.IGNORECASE),  # Pegado a : o ;
+    re.compile(r'\s+P\s*\d+\s*$', re.IGNORECASE),  # Con espacio
+    re.compile(r'P\s*\d+\s*$', re.IGNORECASE),  # Sin espacio (pegado al final)
+    re.compile(r'\s+Página\s+\d+\s*$', re.IGNORECASE),
+]
+
+# Etapa 2 (solo opciones múltiples): marcas V/F aisladas al final
+_PATRON_VF_PUNTO = re.compile(r'\s+[VF]\.\s+.*$', re.IGNORECASE)  # "F. Ver libro"
+_PATRON_VF_ESPACIO = re.compile(r'\s+[VF]\s+[A-Za-z].*$', re.IGNORECASE)  # "F Ver libro"
+_PATRON_VF_AISLADA = re.compile(r'\s+[VF]\.?\s*$', re.IGNORECASE)  # "... V"
+_PATRON_VF_PARENTESIS = re.compile(r'\s+\([VF]\)\s*$', re.IGNORECASE)  # "... (F)"
+
+# Etapa 3: códigos y referencias de página dentro del texto (Código: \d+, PAG.\d+, Página \d+, :P\d+)
+_PATRONES_REFERENCIAS_INTERNAS = [
+    re.compile(r'Código:\s*\d+', re.IGNORECASE),
+    re.compile(r'[:;]\s*P\s*\d+', re.IGNORECASE),  # Pegado a : o ; dentro del texto
+    re.compile(r'PAG\.\s*\d+', re.IGNORECASE),
+    re.compile(r'Página\s+\d+', re.IGNORECASE),
+]
+
+# Marca V/F al final de un enunciado u opción: \s*[\(\-\s]*(V|F)[\)\s]*$
+PATRON_VF_FINAL = re.compile(r'\s*[\(\-\s]*(V|F)[\)\s]*$', re.IGNORECASE)
+
+_PATRON_TEMA_SOLO = re.compile(r'^\s*Tema\s+\d+\s*$', re.IGNORECASE)
+_PATRON_TEMA = re.compile(r'Tema\s+\d+', re.IGNORECASE)
+_PATRON_ETIQUETA_OPCION = re.compile(r'^\s*[a-eA-E][\.\)\-]\s*')
+
+# Inicio de pregunta y de opción para la máquina de estados (analizar_paginas)
+PATRON_INICIO_PREGUNTA = re.compile(r'^\s*(\d+)[\.\-\s]')  # Número seguido de punto, guion o espacio
+PATRON_INICIO_OPCION = re.compile(r'^\s*([a-eA-E])[\.\)\-]\s*')  # Letra a-e seguida de punto, paréntesis o guion
+
+
+def _normalizar_espacios(texto: str) -> str:
+    """Colapsa cualquier secuencia de espacios en uno solo y recorta los extremos (equivale a \\s+ → ' ')."""
+    return " ".join(texto.split())
+
+
+def _etapa_vf_opcion(texto: str) -> str:
+    """
+    Elimina marcas V/F aisladas al final de opciones múltiples.
+    Si después de V/F hay más texto, elimina todo desde V/F hasta el final.
+    """
+    if not _PATRON_HAY_VF.search(texto):
+        return texto
+    # Caso 1: V/F seguido de punto y más texto (ej: "F. Ver libro", "V. texto adicional")
+    match_vf_punto = _PATRON_VF_PUNTO.search(texto)
+    if match_vf_punto:
+        return texto[:match_vf_punto.start()].strip()
+    # Caso 2: V/F seguido de espacio y más texto (ej: "F Ver libro")
+    match_vf_espacio = _PATRON_VF_ESPACIO.search(texto)
+    if match_vf_espacio:
+        return texto[:match_vf_espacio.start()].strip()
+    # Caso 3: Solo V/F aislada al final (sin más texto)
+    texto = _PATRON_VF_AISLADA.sub('', texto)
+    return _PATRON_VF_PARENTESIS.sub('', texto)
+
+
+def _limpiar_referencias(texto: str, quitar_vf: bool) -> str:
+    """
+    Pipeline común de limpieza de ruido.
+    Etapas: referencias finales → (V/F de opción, solo si quitar_vf) → referencias internas → espacios.
+    """
+    if not _PATRON_HAY_REFERENCIAS.search(texto):
+        # Ninguna regla de referencias puede aplicarse (y recortar el final no crea referencias nuevas)
+        if quitar_vf:
+            texto = _etapa_vf_opcion(texto)
+        return _normalizar_espacios(texto)
+    
+    for patron in _PATRONES_REFERENCIAS_FINALES:
+        texto = patron.sub('', texto)
+    if quitar_vf:
+        texto = _etapa_vf_opcion(texto)
+    for patron in _PATRONES_REFERENCIAS_INTERNAS:
+        texto = patron.sub('', texto)
+    return _normalizar_espacios(texto)
+
+
+def limpiar_ruido_sin_vf(texto: str) -> str:
+    """
+    Limpia texto de ruido EXCEPTO marcas V/F (para no interferir con detección de V/F en enunciados).
+    Se usa para limpiar el texto antes de determinar el tipo de pregunta.
+    
+    Reglas:
+    1. Elimina referencias de página al final (P\d+, P \d+, Página \d+)
+    2. Limpia códigos y referencias de página dentro del texto
+    3. NO elimina V/F (se procesará después según el tipo de pregunta)
+    """
+    if not texto:
+        return texto
+    return _limpiar_referencias(texto, quitar_vf=False)
+
+
+def limpiar_ruido(texto: str) -> str:
+    """
+    Limpia texto de ruido: referencias de página, marcas V/F en opciones múltiples,
+    códigos, y otros elementos basura que no deben aparecer en preguntas/respuestas.
+    
+    IMPORTANTE: Esta función se usa SOLO para opciones de preguntas múltiples.
+    Para enunciados de preguntas V/F, NO usar esta función (usar detectar_vf_en_enunciado).
+    
+    Reglas:
+    1. Elimina referencias de página al final (P\d+, P \d+, Página \d+)
+    2. Elimina marcas V/F aisladas al final de opciones múltiples
+    3. Elimina todo el contenido después de V/F si hay texto adicional
+    4. Limpia códigos y referencias de página dentro del texto
+    """
+    if not texto:
+        return texto
+    return _limpiar_referencias(texto, quitar_vf=True)
+
+
+def limpiar_tema_x(texto: str) -> str:
+    """
+    Elimina menciones de "Tema X" (Tema 1, Tema 2, etc.) del texto.
+    Si el texto contiene solo "Tema X", retorna cadena vacía.
+    Si está dentro de una frase, elimina la mención y limpia espacios extra.
+    """
+    if not texto:
+        return texto
+    
+    if not _PATRON_HAY_TEMA.search(texto):
+        return _normalizar_espacios(texto)
+    
+    # Si el texto completo es solo "Tema X", retornar cadena vacía
+    if _PATRON_TEMA_SOLO.match(texto.strip()):
+        return ""
+    
+    # Eliminar "Tema X" del texto y limpiar espacios extra
+    return _normalizar_espacios(_PATRON_TEMA.sub('', texto))
+
+
+def limpiar_linea_visual(texto: str) -> str:
+    """
+    Limpieza de una línea visual antes de la máquina de estados (SIN eliminar V/F).
+    Equivale a limpiar_ruido_sin_vf(limpiar_tema_x(texto)), recorriendo la línea una sola vez
+    cuando no contiene "Tema X" ni referencias de página.
+    """
+    if not texto:
+        return texto
+    texto = limpiar_tema_x(texto)
+    if not texto or not _PATRON_HAY_REFERENCIAS.search(texto):
+        # limpiar_tema_x ya normalizó los espacios
+        return texto
+    return _limpiar_referencias(texto, quitar_vf=False)
+
+
+def detectar_subrayado_resaltado(span: dict) -> bool:
+    """
+    Detecta si un span está subrayado o resaltado (incluyendo colores de fondo como verde).
+    Busca específicamente underline (línea por debajo) y resaltado (fondo de color).
+    Retorna True si está marcado de alguna forma.
+    """
+    
+    flags = span.get("flags", 0)
+    
+    # Detectar underline (flag 4 y 8388608) - línea por debajo del texto
+    is_underlined = (flags & 4) != 0 or (flags & 8388608) != 0
+    
+    # Buscar atributo s_line o underline explícito
+    if "s_line" in span or "underline" in span:
+        is_underlined = True
+    
+    # Detectar resaltado por color de fondo
+    back_color = span.get("back_color", None)
+    is_highlighted = False
+    
+    if back_color is not None:
+        try:
+            if isinstance(back_color, (list, tuple)) and len(back_color) >= 3:
+                r, g, b = float(back_color[0]), float(back_color[1]), float(back_color[2])
+                # Verificar si NO es blanco (1,1,1) ni negro/transparente (0,0,0)
+                if not (abs(r - 1.0) < 0.01 and abs(g - 1.0) < 0.01 and abs(b - 1.0) < 0.01):
+                    if not (abs(r) < 0.01 and abs(g) < 0.01 and abs(b) < 0.01):
+                        is_highlighted = True
+            elif isinstance(back_color, (int, float)):
+                # Formato entero: 16777215 es blanco (0xFFFFFF)
+                if back_color != 16777215 and back_color != 0:
+                    is_highlighted = True
+        except (ValueError, TypeError):
+            pass
+    
+    return is_underlined or is_highlighted
+
+
+# Subrayado geométrico: líneas dibujadas (page.get_drawings) bajo el texto.
+# Muchos PDFs marcan la respuesta con un trazo vectorial en lugar de un flag de fuente.
+DETECTAR_SUBRAYADO_GEOMETRICO = True
+GROSOR_MAX_SUBRAYADO = 2.0  # puntos: alto máximo de un trazo/rectángulo para contar como línea
+LONGITUD_MIN_SUBRAYADO = 3.0  # puntos: descarta puntos y trazos diminutos
+FRACCION_MAX_ANCHO_PAGINA = 0.9  # reglas que cruzan toda la página no son subrayados
+MARGEN_BAJO_SUBRAYADO = 3.0  # puntos que el trazo puede quedar por debajo de la bbox
+TAM_CELDA_SUBRAYADO = 32.0  # lado de la celda de la rejilla espacial
+
+
+class IndiceSubrayados:
+    """
+    Rejilla espacial uniforme con los segmentos horizontales dibujados en una página.
+    - segmentos: (x0, x1, y) de cada segmento
+    - celdas: (columna, fila) -> índices de los segmentos que pasan por esa celda
+    Cada consulta solo mira las celdas bajo la bbox del span, no todos los trazos de la página.
+    """
+    __slots__ = ('segmentos', 'celdas')
+    
+    def __init__(self):
+        self.segmentos = []
+        self.celdas = {}
+    
+    def __len__(self):
+        return len(self.segmentos)
+    
+    def agregar(self, x0: float, x1: float, y: float):
+        indice = len(self.segmentos)
+        self.segmentos.append((x0, x1, y))
+        fila = int(y // TAM_CELDA_SUBRAYADO)
+        for columna in range(int(x0 // TAM_CELDA_SUBRAYADO), int(x1 // TAM_CELDA_SUBRAYADO) + 1):
+            self.celdas.setdefault((columna, fila), []).append(indice)
+    
+    def subraya(self, bbox) -> bool:
+        """
+        True si algún segmento queda en la mitad inferior de la bbox (o justo debajo)
+        y cubre al menos la mitad del ancho del span, o cae entero bajo él.
+        """
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        ancho = x1 - x0
+        if ancho <= 0:
+            return False
+        # Mitad inferior: deja fuera los tachados, que van a media altura
+        y_min = y0 + (y1 - y0) * 0.6
+        y_max = y1 + MARGEN_BAJO_SUBRAYADO
+        vistos = set()
+        for fila in range(int(y_min // TAM_CELDA_SUBRAYADO), int(y_max // TAM_CELDA_SUBRAYADO) + 1):
+            for columna in range(int(x0 // TAM_CELDA_SUBRAYADO), int(x1 // TAM_CELDA_SUBRAYADO) + 1):
+                for indice in self.celdas.get((columna, fila), ()):
+                    if indice in vistos:
+                        continue
+                    vistos.add(indice)
+                    sx0, sx1, sy = self.segmentos[indice]
+                    if not (y_min <= sy <= y_max):
+                        continue
+                    solape = min(x1, sx1) - max(x0, sx0)
+                    if solape <= 0:
+                        continue
+                    if solape >= ancho * 0.5 or solape >= (sx1 - sx0) * 0.8:
+                        return True
+        return False
+
+
+def indexar_subrayados_pagina(page) -> Optional[IndiceSubrayados]:
+    """
+    Lee page.get_drawings() una sola vez y guarda en un IndiceSubrayados los trazos
+    horizontales: líneas ("l") casi horizontales y rectángulos ("re") muy finos.
+    Retorna None si la página no tiene ninguno (el caso habitual: coste cero por span).
+    """
+    if not DETECTAR_SUBRAYADO_GEOMETRICO:
+        return None
+    try:
+        dibujos = page.get_drawings()
+    except Exception:
+        return None
+    if not dibujos:
+        return None
+    
+    ancho_maximo = page.rect.width * FRACCION_MAX_ANCHO_PAGINA
+    indice = IndiceSubrayados()
+    for dibujo in dibujos:
+        # En un trazado solo de relleno ("f") las "l" son bordes de una figura (p. ej. la
+        # apariencia de un resaltado), no líneas visibles
+        con_trazo = "s" in (dibujo.get("type") or "")
+        for item in dibujo.get("items", ()):
+            tipo = item[0]
+            if tipo == "l":
+                if not con_trazo:
+                    continue
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) > GROSOR_MAX_SUBRAYADO:
+                    continue
+                x0, x1 = min(p1.x, p2.x), max(p1.x, p2.x)
+                y = (p1.y + p2.y) / 2
+            elif tipo == "re":
+                rect = item[1]
+                if rect.height > GROSOR_MAX_SUBRAYADO:
+                    continue
+                x0, x1 = rect.x0, rect.x1
+                y = (rect.y0 + rect.y1) / 2
+            else:
+                continue
+            longitud = x1 - x0
+            if LONGITUD_MIN_SUBRAYADO <= longitud <= ancho_maximo:
+                indice.agregar(x0, x1, y)
+    
+    return indice if indice else None
+
+
+# Anotaciones de marcado (resaltado, subrayado, ondulado) que el alumno añade con el visor de PDF.
+# El tachado (StrikeOut) no cuenta: suele significar justo lo contrario.
+TIPOS_ANOTACION_MARCADO = (fitz.PDF_ANNOT_HIGHLIGHT, fitz.PDF_ANNOT_UNDERLINE, fitz.PDF_ANNOT_SQUIGGLY)
+TAM_CELDA_ANOTACION = 32.0  # lado de la celda de la rejilla espacial
+
+
+class IndiceAnotaciones:
+    """
+    Rejilla espacial uniforme con los cuadriláteros (quads) de las anotaciones de marcado de una página.
+    - rects: (x0, y0, x1, y1) de cada quad
+    - celdas: (columna, fila) -> índices de los quads que tocan esa celda
+    """
+    __slots__ = ('rects', 'celdas')
+    
+    def __init__(self):
+        self.rects = []
+        self.celdas = {}
+    
+    def __len__(self):
+        return len(self.rects)
+    
+    def agregar(self, x0: float, y0: float, x1: float, y1: float):
+        indice = len(self.rects)
+        self.rects.append((x0, y0, x1, y1))
+        for fila in range(int(y0 // TAM_CELDA_ANOTACION), int(y1 // TAM_CELDA_ANOTACION) + 1):
+            for columna in range(int(x0 // TAM_CELDA_ANOTACION), int(x1 // TAM_CELDA_ANOTACION) + 1):
+                self.celdas.setdefault((columna, fila), []).append(indice)
+    
+    def marca(self, bbox) -> bool:
+        """
+        True si algún quad cubre al menos la mitad del ancho del span y la mitad de su alto
+        (o del alto del quad, si es más bajo que el span).
+        """
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        ancho = x1 - x0
+        alto = y1 - y0
+        if ancho <= 0 or alto <= 0:
+            return False
+        vistos = set()
+        for fila in range(int(y0 // TAM_CELDA_ANOTACION), int(y1 // TAM_CELDA_ANOTACION) + 1):
+            for columna in range(int(x0 // TAM_CELDA_ANOTACION), int(x1 // TAM_CELDA_ANOTACION) + 1):
+                for indice in self.celdas.get((columna, fila), ()):
+                    if indice in vistos:
+                        continue
+                    vistos.add(indice)
+                    qx0, qy0, qx1, qy1 = self.rects[indice]
+                    solape_x = min(x1, qx1) - max(x0, qx0)
+                    solape_y = min(y1, qy1) - max(y0, qy0)
+                    if solape_x <= 0 or solape_y <= 0:
+                        continue
+                    if solape_x >= ancho * 0.5 and solape_y >= min(alto, qy1 - qy0) * 0.5:
+                        return True
+        return False
+
+
+def indexar_anotaciones_pagina(page) -> Optional[IndiceAnotaciones]:
+    """
+    Recorre page.annots() una sola vez y guarda en un IndiceAnotaciones los quads de las
+    anotaciones de resaltado, subrayado y ondulado (o su rect si no traen vértices).
+    Retorna None sin tocar nada más si la página no tiene anotaciones.
+    """
+    if page.first_annot is None:
+        return None
+    
+    indice = IndiceAnotaciones()
+    for anotacion in page.annots(types=TIPOS_ANOTACION_MARCADO):
+        vertices = anotacion.vertices
+        if not vertices or len(vertices) < 4:
+            rect = anotacion.rect
+            indice.agregar(rect.x0, rect.y0, rect.x1, rect.y1)
+            continue
+        # Cada quad son 4 vértices consecutivos
+        for i in range(0, len(vertices) - 3, 4):
+            xs = [v[0] for v in vertices[i:i + 4]]
+            ys = [v[1] for v in vertices[i:i + 4]]
+            indice.agregar(min(xs), min(ys), max(xs), max(ys))
+    
+    return indice if indice else None
+
+
+def limpiar_texto(texto: str) -> str:
+    """
+    Limpia espacios extra y normaliza el texto.
+    Preserva espacios simples entre palabras, pero elimina múltiples espacios consecutivos.
+    """
+    if not texto:
+        return ""
+    # Reemplazar múltiples espacios/tabs/newlines por un solo espacio y recortar extremos
+    return _normalizar_espacios(texto)
+
+
+def limpiar_etiqueta_opcion(texto: str) -> str:
+    """
+    Elimina la etiqueta de opción (a., b), A-, etc.) del inicio del texto.
+    Ejemplo: "a. Texto de la opción" → "Texto de la opción"
+    """
+    if not texto:
+        return ""
+    # Eliminar patrón de letra seguida de punto, paréntesis o guion al inicio
+    texto_limpio = _PATRON_ETIQUETA_OPCION.sub('', texto)
+    return texto_limpio.strip()
+
+
+def limpiar_opcion_multiple(texto: str) -> str:
+    """
+    Limpieza final de una opción de pregunta múltiple (etapa que SÍ elimina V/F):
+    espacios → etiqueta (a., b)...) → ruido y V/F aislada → V/F al final.
+    """
+    op_limpia = limpiar_etiqueta_opcion(limpiar_texto(texto))
+    # Aplicar limpieza de ruido (P139, V/F, referencias de página, etc.)
+    op_limpia = limpiar_ruido(op_limpia)
+    # Eliminar V/F al final de opciones (solo para opciones múltiples)
+    return PATRON_VF_FINAL.sub('', op_limpia).strip()
+
+
+def detectar_vf_en_enunciado(enunciado: str) -> tuple[str, Optional[int]]:
+    """
+    Detecta si al final del enunciado hay una marca V/F (Verdadero/Falso).
+    Busca patrones como "(V)", "- F", " V", etc.
+    
+    Retorna: (enunciado_limpio, respuesta_vf)
+    - enunciado_limpio: El enunciado sin la marca V/F
+    - respuesta_vf: 0 si es Verdadero (V), 1 si es Falso (F), None si no se encontró
+    """
+    if not enunciado:
+        return enunciado, None
+    
+    match = PATRON_VF_FINAL.search(enunciado)
+    
+    if match:
+        vf_encontrado = match.group(1).upper()
+        # Eliminar la marca del enunciado
+        enunciado_limpio = PATRON_VF_FINAL.sub('', enunciado).strip()
+        # Retornar respuesta: 0 = Verdadero (V), 1 = Falso (F)
+        respuesta = 0 if vf_encontrado == 'V' else 1
+        return enunciado_limpio, respuesta
+    
+    return enunciado, None
+
+
+# Aprendizaje de encabezados y pies de página por frecuencia.
+# Complementa a es_ruido_pagina (reglas fijas de las asignaturas conocidas): una línea que se
+# repite, con el mismo texto (salvo el número de página) y a la misma altura, en la franja de
+# margen de muchas páginas es un encabezado o pie de ese documento aunque ninguna regla fija la
+# reconozca. Las líneas que empiezan como una pregunta o una opción nunca se aprenden ni se
+# descartan: una opción repetida ("d) Todas las anteriores") es contenido del examen.
+APRENDER_RUIDO_DOCUMENTO = True
+FRACCION_MARGEN_RUIDO = 0.15  # franja superior/inferior (fracción del alto de página) que se examina
+FRACCION_MIN_PAGINAS_RUIDO = 0.5  # fracción de páginas de la muestra en la que debe repetirse
+MIN_PAGINAS_APRENDER_RUIDO = 4  # con menos páginas no hay frecuencia fiable
+MAX_PAGINAS_MUESTRA_RUIDO = 40  # páginas (repartidas por el documento) que mira la pasada previa
+TOLERANCIA_POSICION_RUIDO = 3.0  # puntos que puede moverse la línea respecto a su borde de página
+
+# Tokens que son enteros un número de página: "7", "7/20", "-7-", "(7)"
+_PATRON_TOKEN_PAGINA = re.compile(r'[\(\[\-–]?\d+(?:/\d+)?[\)\]\-–]?')
+
+
+def huella_linea(texto: str) -> str:
+    """
+    Normaliza una línea para compararla entre páginas: minúsculas, espacios simples y los
+    tokens que son enteros un número de página como '#'. El resto de dígitos se conservan.
+    """
+    return " ".join("#" if _PATRON_TOKEN_PAGINA.fullmatch(token) else token
+                    for token in texto.lower().split())
+
+
+def es_linea_contenido(texto: str) -> bool:
+    """True si la línea empieza como una pregunta o una opción (nunca es encabezado ni pie)."""
+    return bool(PATRON_INICIO_PREGUNTA.match(texto) or PATRON_INICIO_OPCION.match(texto))
+
+
+def _zona_margen(y0: float, y1: float, alto_pagina: float) -> Optional[tuple[str, float]]:
+    """
+    (zona, posicion) si la línea cae entera en la franja superior ('sup') o inferior ('inf')
+    de la página, None si no. posicion es la distancia al borde de su zona, para comparar
+    páginas de distinto alto.
+    """
+    if y1 <= alto_pagina * FRACCION_MARGEN_RUIDO:
+        return 'sup', y0
+    if y0 >= alto_pagina * (1 - FRACCION_MARGEN_RUIDO):
+        return 'inf', alto_pagina - y1
+    return None
+
+
+class ReglasRuidoDocumento:
+    """
+    Encabezados y pies aprendidos de un documento (ver aprender_ruido_documento).
+    - huellas: (zona, huella_linea) -> posición (distancia al borde) de las líneas que se descartan
+    - ejemplos: (zona, huella) -> (texto de ejemplo, páginas de la muestra en que aparece)
+    - paginas_muestra: páginas examinadas en la pasada previa
+    """
+    __slots__ = ('huellas', 'ejemplos', 'paginas_muestra')
+    
+    def __init__(self):
+        self.huellas = {}
+        self.ejemplos = {}
+        self.paginas_muestra = 0
+    
+    def __len__(self):
+        return len(self.huellas)
+    
+    def es_ruido(self, texto: str, y0: float, y1: float, alto_pagina: float) -> bool:
+        margen = _zona_margen(y0, y1, alto_pagina)
+        if margen is None:
+            return False
+        zona, posicion = margen
+        posicion_regla = self.huellas.get((zona, huella_linea(texto)))
+        return (posicion_regla is not None and abs(posicion - posicion_regla) <= TOLERANCIA_POSICION_RUIDO
+                and not es_linea_contenido(texto))
+    
+    def a_dict(self) -> Dict:
+        """Resumen serializable de lo aprendido."""
+        return {
+            'paginas_muestra': self.paginas_muestra,
+            'lineas': [
+                {'zona': zona, 'huella': huella, 'posicion': round(self.huellas[(zona, huella)], 1),
+                 'ejemplo': ejemplo, 'paginas': paginas}
+                for (zona, huella), (ejemplo, paginas) in sorted(self.ejemplos.items())
+            ],
+        }
+
+
+def aprender_ruido_documento(pdf, perfil=None) -> ReglasRuidoDocumento:
+    """
+    Pasada previa sobre una muestra de páginas (todas si hay pocas, MAX_PAGINAS_MUESTRA_RUIDO
+    repartidas si hay muchas): cuenta en cuántas páginas aparece cada (zona, huella) de las
+    franjas de margen a la misma altura (±TOLERANCIA_POSICION_RUIDO) y convierte en regla las
+    que superan FRACCION_MIN_PAGINAS_RUIDO. Las líneas de contenido (es_linea_contenido) no cuentan.
+    pdf: bytes, ruta o documento ya abierto de PyMuPDF.
+    perfil: PerfilExtraccion opcional donde sumar el tiempo de la etapa 'aprender_ruido'.
+    """
+    inicio = time.perf_counter()
+    reglas = ReglasRuidoDocumento()
+    doc = pdf if isinstance(pdf, fitz.Document) else abrir_pdf(pdf)
+    try:
+        num_paginas = len(doc)
+        if num_paginas < MIN_PAGINAS_APRENDER_RUIDO:
+            return reglas
+        if num_paginas <= MAX_PAGINAS_MUESTRA_RUIDO:
+            muestra = range(num_paginas)
+        else:
+            paso = num_paginas / MAX_PAGINAS_MUESTRA_RUIDO
+            muestra = [int(i * paso) for i in range(MAX_PAGINAS_MUESTRA_RUIDO)]
+        
+        apariciones = {}  # (zona, huella) -> [(posicion, page_num)]
+        ejemplos = {}
+        for page_num in muestra:
+            page = doc[page_num]
+            alto = page.rect.height
+            for block in page.get_text("dict", flags=FLAGS_TEXTO_DICT).get("blocks", []):
+                for line in block.get("lines", ()):
+                    margen = _zona_margen(line["bbox"][1], line["bbox"][3], alto)
+                    if margen is None:
+                        continue
+                    texto = " ".join(span.get("text", "").strip() for span in line.get("spans", ())).strip()
+                    huella = huella_linea(texto)
+                    if not huella or es_linea_contenido(texto):
+                        continue
+                    zona, posicion = margen
+                    clave = (zona, huella)
+                    apariciones.setdefault(clave, []).append((posicion, page_num))
+                    ejemplos.setdefault(clave, texto)
+        
+        reglas.paginas_muestra = len(muestra)
+        minimo = max(2, math.ceil(len(muestra) * FRACCION_MIN_PAGINAS_RUIDO))
+        for clave, lista in apariciones.items():
+            if len(lista) < minimo:
+                continue
+            # Altura más repetida: cada página cuenta una vez por cada posición candidata
+            mejores = set()
+            for candidata, _ in lista:
+                paginas = {page_num for posicion, page_num in lista
+                           if abs(posicion - candidata) <= TOLERANCIA_POSICION_RUIDO}
+                if len(paginas) > len(mejores):
+                    mejores, posicion_regla = paginas, candidata
+            if len(mejores) >= minimo:
+                reglas.huellas[clave] = posicion_regla
+                reglas.ejemplos[clave] = (ejemplos[clave], len(mejores))
+    finally:
+        if doc is not pdf:
+            doc.close()
+        if perfil is not None:
+            perfil.sumar('aprender_ruido', time.perf_counter() - inicio)
+    return reglas
+
+
+# Perfilado por etapas (opcional). Sin perfil (None) el único coste son comprobaciones
+# "perfil is not None" por página: las funciones cronometradas solo se envuelven si hay perfil.
+ETAPAS_PERFIL = (
+    'aprender_ruido',    # pasada previa de aprender_ruido_documento
+    'get_text',          # page.get_text("dict")
+    'indices_marcado',   # get_drawings + annots: IndiceSubrayados / IndiceAnotaciones
+    'ruido',             # es_ruido_pagina sobre cada línea del dict
+    'recorrido_spans',   # resto del recorrido de spans (strip, marcado por span, arrays)
+    'agrupar_lineas',    # agrupar_lineas_visuales_indices
+    'limpiar',           # limpiar_linea_visual sobre cada línea visual
+    'maquina_estados',   # analizar_paginas (incluye la limpieza final de cada pregunta)
+)
+
+
+class PerfilExtraccion:
+    """
+    Acumula tiempos de una extracción: segundos y llamadas por etapa (ETAPAS_PERFIL)
+    y segundos por página. Se pasa como perfil= a extraer_texto_con_subrayado.
+    - segundos, llamadas: etapa -> total acumulado
+    - paginas: lista de (numero_pagina, segundos) en el orden en que se procesaron
+    """
+    __slots__ = ('segundos', 'llamadas', 'paginas')
+    
+    def __init__(self):
+        self.segundos = dict.fromkeys(ETAPAS_PERFIL, 0.0)
+        self.llamadas = dict.fromkeys(ETAPAS_PERFIL, 0)
+        self.paginas = []
+    
+    def sumar(self, etapa: str, segundos: float, llamadas: int = 1):
+        self.segundos[etapa] = self.segundos.get(etapa, 0.0) + segundos
+        self.llamadas[etapa] = self.llamadas.get(etapa, 0) + llamadas
+    
+    def cronometrar(self, etapa: str, funcion):
+        """Retorna funcion envuelta para sumar el tiempo de cada llamada a la etapa."""
+        reloj = time.perf_counter
+        segundos, llamadas = self.segundos, self.llamadas
+        
+        def cronometrada(*args):
+            inicio = reloj()
+            try:
+                return funcion(*args)
+            finally:
+                segundos[etapa] += reloj() - inicio
+                llamadas[etapa] += 1
+        
+        return cronometrada
+    
+    def fusionar(self, datos: Dict):
+        """Suma un perfil exportado con a_dict() (p. ej. el de un proceso auxiliar)."""
+        for etapa, valores in datos.get('etapas', {}).items():
+            self.sumar(etapa, valores['segundos'], valores['llamadas'])
+        self.paginas.extend((p['pagina'], p['segundos']) for p in datos.get('paginas', []))
+    
+    def paginas_mas_lentas(self, num: int = 10) -> List[tuple[int, float]]:
+        return sorted(self.paginas, key=lambda pagina: pagina[1], reverse=True)[:num]
+    
+    def a_dict(self, num_lentas: int = 10) -> Dict:
+        """Exporta el perfil como dict serializable a JSON (páginas numeradas desde 1)."""
+        return {
+            'motor_lineas': MOTOR_LINEAS,
+            'segundos_paginas': sum(segundos for _, segundos in self.paginas),
+            'num_paginas': len(self.paginas),
+            'etapas': {
+                etapa: {'segundos': self.segundos[etapa], 'llamadas': self.llamadas[etapa]}
+                for etapa in self.segundos
+            },
+            'paginas': [{'pagina': num, 'segundos': segundos} for num, segundos in sorted(self.paginas)],
+            'paginas_mas_lentas': [
+                {'pagina': num, 'segundos': segundos} for num, segundos in self.paginas_mas_lentas(num_lentas)
+            ],
+        }
+
+
+class SpansPagina:
+    """
+    Almacén compacto de los spans de una página: arrays paralelos en lugar de un dict por span.
+    - textos: texto de cada span (lista)
+    - ys, xs: coordenadas del origen de la bbox (array de doubles)
+    - marcados: 1 si el span está subrayado/resaltado, 0 si no (un byte por span)
+    """
+    __slots__ = ('textos', 'ys', 'xs', 'marcados')
+    
+    def __init__(self):
+        self.textos = []
+        self.ys = array('d')
+        self.xs = array('d')
+        self.marcados = bytearray()
+    
+    def __len__(self):
+        return len(self.textos)
+
+
+def extraer_spans_pagina(page, perfil: Optional[PerfilExtraccion] = None,
+                         reglas_ruido: Optional[ReglasRuidoDocumento] = None) -> SpansPagina:
+    """
+    Extrae los spans de texto de una página en un SpansPagina (sin ordenar; el orden lo decide
+    agrupar_lineas_visuales_indices). Conserva los textos cortos y descarta las líneas que son
+    enteras ruido de página (encabezados/pies).
+    Además de los flags de fuente, marca los spans con un subrayado dibujado debajo (IndiceSubrayados)
+    o cubiertos por una anotación de resaltado/subrayado (IndiceAnotaciones).
+    reglas_ruido: encabezados/pies aprendidos del documento, que se descartan junto al ruido fijo.
+    """
+    spans = SpansPagina()
+    alto_pagina = page.rect.height if reglas_ruido else 0.0
+    es_ruido = es_ruido_pagina
+    if perfil is not None:
+        reloj = time.perf_counter
+        t0 = reloj()
+        texto_dict = page.get_text("dict", flags=FLAGS_TEXTO_DICT)
+        t1 = reloj()
+        subrayados = indexar_subrayados_pagina(page)
+        anotaciones = indexar_anotaciones_pagina(page)
+        t2 = reloj()
+        perfil.sumar('get_text', t1 - t0)
+        perfil.sumar('indices_marcado', t2 - t1)
+        es_ruido = perfil.cronometrar('ruido', es_ruido_pagina)
+        segundos_ruido_antes = perfil.segundos['ruido']
+    else:
+        texto_dict = page.get_text("dict", flags=FLAGS_TEXTO_DICT)
+        subrayados = indexar_subrayados_pagina(page)
+        anotaciones = indexar_anotaciones_pagina(page)
+    # Métodos ligados en locales: este bucle se ejecuta una vez por span
+    agregar_texto = spans.textos.append
+    agregar_y = spans.ys.append
+    agregar_x = spans.xs.append
+    agregar_marcado = spans.marcados.append
+    
+    for block in texto_dict.get("blocks", []):
+        if "lines" not in block:
+            continue
+        for line in block["lines"]:
+            textos_linea = []
+            spans_linea = []
+            for span in line.get("spans", []):
+                texto = span.get("text", "").strip()
+                if texto:
+                    textos_linea.append(texto)
+                    spans_linea.append(span)
+            
+            # Filtrar ruido de página (solo si toda la línea es ruido)
+            if not textos_linea or es_ruido(" ".join(textos_linea)):
+                continue
+            if reglas_ruido and reglas_ruido.es_ruido(" ".join(textos_linea), line["bbox"][1], line["bbox"][3], alto_pagina):
+                continue
+            
+            for texto, span in zip(textos_linea, spans_linea):
+                bbox = span.get("bbox", (0, 0, 0, 0))
+                agregar_texto(texto)
+                agregar_y(bbox[1])
+                agregar_x(bbox[0])
+                marcado = detectar_subrayado_resaltado(span)
+                if not marcado and subrayados is not None:
+                    marcado = subrayados.subraya(bbox)
+                if not marcado and anotaciones is not None:
+                    marcado = anotaciones.marca(bbox)
+                agregar_marcado(1 if marcado else 0)
+    
+    if perfil is not None:
+        # El tiempo de es_ruido_pagina ya está en su propia etapa
+        perfil.sumar('recorrido_spans', reloj() - t2 - (perfil.segundos['ruido'] - segundos_ruido_antes))
+    return spans
+
+
+# Tolerancia vertical para agrupar spans en una misma línea visual
+TOLERANCIA_Y = 5  # píxeles
+
+# Por debajo de este número de páginas no compensa arrancar procesos auxiliares
+MIN_PAGINAS_PARALELO = 16
+
+
+def _agrupar_lineas_indices_python(spans: SpansPagina) -> tuple[array, List[tuple[int, int]]]:
+    """
+    Motor "python" (implementación de referencia): agrupa los spans ordenados por (Y, X) en
+    líneas visuales (misma Y con tolerancia TOLERANCIA_Y), sin copiar spans.
+    Retorna (orden, rangos):
+    - orden: índices de los spans ordenados por línea y, dentro de cada línea, por X
+    - rangos: (inicio, fin) de cada línea visual dentro de orden
+    """
+    ys, xs = spans.ys, spans.xs
+    # Orden estable por (Y, X): arriba a abajo y de izquierda a derecha
+    orden = array('l', sorted(range(len(spans)), key=lambda i: (ys[i], xs[i])))
+    rangos = []
+    
+    if orden:
+        inicio = 0
+        y_actual = ys[orden[0]]
+        for pos in range(1, len(orden)):
+            y_pos = ys[orden[pos]]
+            if abs(y_pos - y_actual) > TOLERANCIA_Y:
+                rangos.append((inicio, pos))
+                inicio = pos
+                y_actual = y_pos
+        rangos.append((inicio, len(orden)))
+        
+        # Ordenar spans dentro de cada línea por X (izquierda a derecha)
+        for inicio, fin in rangos:
+            if fin - inicio > 1:
+                orden[inicio:fin] = array('l', sorted(orden[inicio:fin], key=xs.__getitem__))
+    
+    return orden, rangos
+
+
+def _agrupar_lineas_indices_numpy(spans: SpansPagina) -> tuple[List[int], List[tuple[int, int]]]:
+    """
+    Motor "numpy": mismo resultado que _agrupar_lineas_indices_python, vectorizado.
+    
+    - Un único argsort estable por (Y, X).
+    - Cortes seguros: si la diferencia con el span anterior supera TOLERANCIA_Y, también la supera
+      con el primer span de la línea (la Y de referencia), así que ahí siempre empieza línea nueva.
+    - Solo los tramos entre cortes seguros cuya altura total supera la tolerancia necesitan ir
+      desplazando la Y de referencia; se resuelven con searchsorted sobre (y - y_referencia).
+    - Un segundo orden estable por (línea, X) deja cada línea ordenada de izquierda a derecha.
+    """
+    num_spans = len(spans)
+    if num_spans == 0:
+        return [], []
+    
+    ys = np.frombuffer(spans.ys, dtype=np.float64)
+    xs = np.frombuffer(spans.xs, dtype=np.float64)
+    
+    orden = np.lexsort((xs, ys))
+    ys_ordenadas = ys[orden]
+    
+    cortes_seguros = np.flatnonzero(np.diff(ys_ordenadas) > TOLERANCIA_Y) + 1
+    limites = np.concatenate(([0], cortes_seguros, [num_spans]))
+    
+    inicios = []
+    for inicio, fin in zip(limites[:-1].tolist(), limites[1:].tolist()):
+        inicios.append(inicio)
+        if ys_ordenadas[fin - 1] - ys_ordenadas[inicio] <= TOLERANCIA_Y:
+            continue
+        # Tramo más alto que la tolerancia: avanzar línea a línea desde la Y de referencia
+        while True:
+            relativas = ys_ordenadas[inicio:fin] - ys_ordenadas[inicio]
+            inicio += int(np.searchsorted(relativas, TOLERANCIA_Y, side='right'))
+            if inicio >= fin:
+                break
+            inicios.append(inicio)
+    
+    finales = inicios[1:] + [num_spans]
+    
+    # Ordenar por X dentro de cada línea (lexsort es estable: empates mantienen el orden por Y)
+    id_linea = np.repeat(np.arange(len(inicios)), np.diff(np.asarray(inicios + [num_spans])))
+    orden = orden[np.lexsort((xs[orden], id_linea))]
+    
+    return orden.tolist(), list(zip(inicios, finales))
+
+
+# Motores disponibles para agrupar spans en líneas visuales
+MOTORES_LINEAS = {
+    'python': _agrupar_lineas_indices_python,
+}
+if np is not None:
+    MOTORES_LINEAS['numpy'] = _agrupar_lineas_indices_numpy
+
+# Motor por defecto: NumPy si está instalado
+MOTOR_LINEAS = 'numpy' if np is not None else 'python'
+
+
+def agrupar_lineas_visuales_indices(spans: SpansPagina, motor: Optional[str] = None):
+    """
+    Agrupa los spans de un SpansPagina en líneas visuales sin copiar spans.
+    Retorna (orden, rangos):
+    - orden: índices de los spans ordenados por línea y, dentro de cada línea, por X
+    - rangos: (inicio, fin) de cada línea visual dentro de orden
+    motor: 'numpy' o 'python' (None = MOTOR_LINEAS). Ambos dan el mismo resultado.
+    """
+    return MOTORES_LINEAS[motor or MOTOR_LINEAS](spans)
+
+
+def extraer_lineas_pagina(page, perfil: Optional[PerfilExtraccion] = None,
+                          reglas_ruido: Optional[ReglasRuidoDocumento] = None) -> List[tuple[str, bool]]:
+    """
+    Convierte una página en la lista de líneas visuales que consume la máquina de estados.
+    Retorna tuplas (texto_linea, marcado_linea) con el texto ya limpio de ruido (SIN eliminar V/F).
+    Las líneas que quedan vacías tras la limpieza se descartan.
+    perfil: PerfilExtraccion opcional donde acumular los tiempos de la página.
+    reglas_ruido: encabezados/pies aprendidos del documento (ver aprender_ruido_documento).
+    """
+    limpiar_linea = limpiar_linea_visual
+    if perfil is not None:
+        reloj = time.perf_counter
+        inicio_pagina = reloj()
+        spans = extraer_spans_pagina(page, perfil, reglas_ruido)
+        t0 = reloj()
+        orden, rangos = agrupar_lineas_visuales_indices(spans)
+        perfil.sumar('agrupar_lineas', reloj() - t0)
+        limpiar_linea = perfil.cronometrar('limpiar', limpiar_linea_visual)
+    else:
+        spans = extraer_spans_pagina(page, reglas_ruido=reglas_ruido)
+        orden, rangos = agrupar_lineas_visuales_indices(spans)
+    textos, marcados = spans.textos, spans.marcados
+    
+    lineas = []
+    for inicio, fin in rangos:
+        indices_linea = orden[inicio:fin]
+        # Unir todos los textos de la línea
+        texto_completo = " ".join([textos[i] for i in indices_linea]).strip()
+        
+        # FILTRADO DE RUIDO: Limpiar "Tema X" y ruido general (referencias de página, códigos, etc.)
+        # IMPORTANTE: NO eliminamos V/F aquí porque necesitamos detectarlo después
+        # según el tipo de pregunta (V/F vs opción múltiple)
+        texto_completo = limpiar_linea(texto_completo)
+        
+        # Si después de limpiar el texto está vacío, saltar esta línea
+        if not texto_completo:
+            continue
+        
+        # Si alguna parte está marcada, toda la línea está marcada
+        marcado_linea = any(marcados[i] for i in indices_linea)
+        lineas.append((texto_completo, marcado_linea))
+    
+    if perfil is not None:
+        perfil.paginas.append((page.number + 1, reloj() - inicio_pagina))
+    return lineas
+
+
+def abrir_pdf(pdf: Union[bytes, str]):
+    """
+    Abre un PDF a partir de sus bytes o de la ruta a un archivo.
+    Abierto por ruta, MuPDF lee del disco bajo demanda en lugar de retener el documento entero en memoria.
+    """
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf, filetype="pdf")
+
+
+# Cada cuántas páginas vacía el modo de baja memoria la caché de recursos de MuPDF.
+# Vaciarla en cada página obligaría a recargar las fuentes cada vez (~2.5x más lento).
+PAGINAS_ENTRE_LIMPIEZAS_MUPDF = 16
+
+
+def _liberar_memoria_mupdf(page_num: int):
+    """Vacía la caché de recursos de MuPDF (fuentes, imágenes decodificadas) cada pocas páginas."""
+    if (page_num + 1) % PAGINAS_ENTRE_LIMPIEZAS_MUPDF == 0:
+        fitz.TOOLS.store_shrink(100)
+
+
+# Documento abierto por cada proceso auxiliar (uno por proceso, ver _inicializar_worker_pdf)
+_doc_worker = None
+_baja_memoria_worker = False
+_perfilar_worker = False
+_reglas_ruido_worker = None
+
+
+def _inicializar_worker_pdf(pdf: Union[bytes, str], baja_memoria: bool = False, perfilar: bool = False,
+                            reglas_ruido: Optional[ReglasRuidoDocumento] = None):
+    """Abre el PDF una sola vez en cada proceso auxiliar del pool."""
+    global _doc_worker, _baja_memoria_worker, _perfilar_worker, _reglas_ruido_worker
+    _doc_worker = abrir_pdf(pdf)
+    _baja_memoria_worker = baja_memoria
+    _perfilar_worker = perfilar
+    _reglas_ruido_worker = reglas_ruido
+
+
+def _extraer_lineas_rango(rango: tuple[int, int]) -> tuple[List[List[tuple[str, bool]]], Optional[Dict]]:
+    """
+    Extrae las líneas visuales de las páginas [inicio, fin) en un proceso auxiliar.
+    Retorna (líneas de cada página, perfil del rango exportado con a_dict() o None si no se perfila).
+    """
+    inicio, fin = rango
+    perfil = PerfilExtraccion() if _perfilar_worker else None
+    lineas_rango = []
+    for page_num in range(inicio, fin):
+        lineas_rango.append(extraer_lineas_pagina(_doc_worker[page_num], perfil, _reglas_ruido_worker))
+        if _baja_memoria_worker:
+            _liberar_memoria_mupdf(page_num)
+    return lineas_rango, (perfil.a_dict() if perfil is not None else None)
+
+
+def resolver_num_workers(num_workers: Optional[int], num_paginas: int) -> int:
+    """
+    Determina cuántos procesos usar para extraer un documento.
+    None o 0 usa todos los núcleos disponibles. Devuelve 1 (modo serie) para documentos pequeños.
+    """
+    if not num_workers or num_workers < 0:
+        num_workers = os.cpu_count() or 1
+    if num_paginas < MIN_PAGINAS_PARALELO:
+        return 1
+    return max(1, min(num_workers, num_paginas))
+
+
+def extraer_lineas_documento(pdf: Union[bytes, str], num_workers: Optional[int] = None,
+                             baja_memoria: bool = False, perfil: Optional[PerfilExtraccion] = None,
+                             reglas_ruido: Optional[ReglasRuidoDocumento] = None):
+    """
+    Genera, en orden de página, la lista de líneas visuales de cada página del PDF.
+    pdf: bytes del PDF o ruta a un archivo (preferible para documentos grandes).
+    
+    Con más de un worker, las páginas se reparten por rangos contiguos entre procesos
+    auxiliares (cada uno abre su propio documento a partir de los bytes o la ruta) y los
+    resultados se devuelven en el mismo orden que el camino serie.
+    
+    baja_memoria: vacía la caché de MuPDF cada PAGINAS_ENTRE_LIMPIEZAS_MUPDF páginas para que el
+    pico de memoria no crezca con el número de páginas (algo más lento: las fuentes se recargan).
+    
+    perfil: PerfilExtraccion opcional; con workers, cada uno perfila su rango y se fusiona aquí.
+    
+    reglas_ruido: encabezados/pies del documento ya aprendidos (p. ej. para mostrarlos). Si es None
+    y APRENDER_RUIDO_DOCUMENTO está activo, se aprenden aquí con una pasada previa.
+    """
+    doc = abrir_pdf(pdf)
+    num_paginas = len(doc)
+    workers = resolver_num_workers(num_workers, num_paginas)
+    
+    if reglas_ruido is None and APRENDER_RUIDO_DOCUMENTO:
+        reglas_ruido = aprender_ruido_documento(doc, perfil)
+    if not reglas_ruido:
+        reglas_ruido = None  # sin reglas aprendidas: ni siquiera se consulta por línea
+    
+    if workers <= 1:
+        try:
+            for page_num in range(num_paginas):
+                lineas_pagina = extraer_lineas_pagina(doc[page_num], perfil, reglas_ruido)
+                if baja_memoria:
+                    _liberar_memoria_mupdf(page_num)
+                yield lineas_pagina
+        finally:
+            doc.close()
+        return
+    
+    doc.close()
+    
+    # Varios rangos por worker para repartir mejor páginas de coste desigual
+    tam_rango = max(1, -(-num_paginas // (workers * 4)))
+    rangos = [(inicio, min(inicio + tam_rango, num_paginas)) for inicio in range(0, num_paginas, tam_rango)]
+    
+    # "spawn" evita hacer fork de un servidor con hilos (Streamlit)
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto,
+                             initializer=_inicializar_worker_pdf, initargs=(pdf, baja_memoria, perfil is not None, reglas_ruido)) as executor:
+        for lineas_rango, datos_perfil in executor.map(_extraer_lineas_rango, rangos):
+            if datos_perfil is not None:
+                perfil.fusionar(datos_perfil)
+            yield from lineas_rango
+
+
+def _cerrar_pregunta(pregunta_actual: str, opciones_actuales: List[str], opciones_marcadas: List[bool],
+                     max_opciones: int = MAX_OPCIONES, detectar_vf: bool = DETECTAR_VF) -> tuple[Dict, bool]:
+    """
+    Clasificación final de una pregunta acumulada por la máquina de estados.
+    Retorna (pregunta, tiene_subrayado).
+    """
+    if len(opciones_actuales) > 0:
+        # Pregunta con opciones → Opción Múltiple
+        # Limitar a máximo max_opciones si hay más
+        if len(opciones_actuales) > max_opciones:
+            # Fusionar opciones adicionales con la última
+            texto_extra = " ".join(opciones_actuales[max_opciones:])
+            opciones_actuales[max_opciones - 1] += " " + texto_extra
+            opciones_actuales = opciones_actuales[:max_opciones]
+            opciones_marcadas = opciones_marcadas[:max_opciones]
+        
+        respuesta_correcta = 0
+        tiene_subrayado = False
+        for idx, esta_marcada in enumerate(opciones_marcadas):
+            if esta_marcada:
+                respuesta_correcta = idx
+                tiene_subrayado = True
+                break
+        
+        # Limpiar etiquetas, V/F y ruido de todas las opciones
+        opciones_limpias = [limpiar_opcion_multiple(op) for op in opciones_actuales]
+        
+        return {
+            'pregunta': limpiar_texto(pregunta_actual),
+            'opciones': opciones_limpias,
+            'correcta': respuesta_correcta,
+            'tipo': 'opcion_multiple'
+        }, tiene_subrayado
+    
+    # Pregunta sin opciones → Verdadero/Falso
+    # ORDEN: 1) Detectar V/F, 2) Limpiar ruido del enunciado (sin V/F)
+    if detectar_vf:
+        enunciado_limpio, respuesta_vf = detectar_vf_en_enunciado(limpiar_texto(pregunta_actual))
+    else:
+        enunciado_limpio, respuesta_vf = limpiar_texto(pregunta_actual), None
+    # Aplicar limpieza de ruido al enunciado (sin V/F, ya fue eliminado)
+    enunciado_limpio = limpiar_ruido_sin_vf(enunciado_limpio)
+    respuesta_correcta = respuesta_vf if respuesta_vf is not None else 0
+    vf_detectado_enunciado = respuesta_vf is not None
+    
+    return {
+        'pregunta': enunciado_limpio,
+        'opciones': [],
+        'correcta': respuesta_correcta,
+        'tipo': 'V/F',
+        'vf_detectado_enunciado': vf_detectado_enunciado
+    }, False
+
+
+def analizar_paginas(paginas, perfil: Optional[PerfilExtraccion] = None,
+                     max_opciones: int = MAX_OPCIONES, detectar_vf: bool = DETECTAR_VF):
+    """
+    Máquina de estados pregunta/opción sobre las líneas visuales del documento, página a página.
+    paginas: iterable (en orden) con la lista de líneas (texto_linea, marcado_linea) de cada página,
+    tal y como las produce extraer_lineas_pagina (o una maquetación guardada, ver extraer_layout_pdf).
+    
+    Es un generador: tras consumir cada página genera la lista de tuplas (pregunta, tiene_subrayado)
+    que quedaron cerradas en ella. Al agotarse las páginas genera una última lista con la pregunta
+    final del documento (vacía si no había ninguna abierta).
+    
+    perfil: PerfilExtraccion opcional donde sumar el tiempo de la etapa 'maquina_estados'.
+    max_opciones: opciones que se aceptan por pregunta (1-5, etiquetas a-e); el texto de las
+    siguientes se fusiona con la última.
+    detectar_vf: si es False, las preguntas sin opciones no toman la respuesta de un V/F final.
+    """
+    if not 1 <= max_opciones <= 5:
+        raise ValueError(f"max_opciones debe estar entre 1 y 5 (etiquetas a-e): {max_opciones}")
+    ultima = max_opciones - 1
+    reloj = time.perf_counter
+    # Patrones de detección
+    patron_pregunta = PATRON_INICIO_PREGUNTA
+    patron_opcion = PATRON_INICIO_OPCION
+    
+    # Estado actual de la pregunta que estamos procesando
+    pregunta_actual = None
+    opciones_actuales = []
+    opciones_marcadas = []  # Lista de booleanos indicando si cada opción está marcada
+    estado_actual = "enunciado"  # "enunciado" o "opciones"
+    pregunta_cerrada = False  # Indica si la pregunta ya está cerrada
+    
+    # Ya no se detectan casos automáticamente - el usuario los creará manualmente
+    
+    for lineas_pagina in paginas:
+        inicio = reloj() if perfil is not None else 0.0
+        preguntas_cerradas = []
+        
+        for texto_completo, marcado_linea in lineas_pagina:
+            # Verificar si es pregunta u opción (después de la limpieza)
+            es_pregunta = patron_pregunta.match(texto_completo)
+            es_opcion = patron_opcion.match(texto_completo)
+            
+            # NO DESCARTAR TEXTOS CORTOS - Si es parte de una pregunta/respuesta iniciada, conservarlo siempre
+            
+            # Si la pregunta ya está cerrada, solo procesar si es nueva pregunta
+            if pregunta_cerrada:
+                # Si es ruido, descartarlo
+                if es_ruido_pagina(texto_completo):
+                    continue
+                # Si es nueva pregunta, reiniciar
+                if es_pregunta:
+                    pregunta_cerrada = False
+                    # Continuar con la lógica de nueva pregunta más abajo
+                else:
+                    # Texto después de pregunta cerrada que no es ruido ni nueva pregunta
+                    # NO hacer nada, esperar a nueva pregunta
+                    continue
+            
+            # 1. IDENTIFICADOR DE PREGUNTA: Si empieza por número, crear nueva pregunta
+            if es_pregunta:
+                # Guardar pregunta anterior si existe (CLASIFICACIÓN FINAL)
+                if pregunta_actual and not pregunta_cerrada:
+                    preguntas_cerradas.append(_cerrar_pregunta(pregunta_actual, opciones_actuales, opciones_marcadas,
+                                                                max_opciones, detectar_vf))
+                
+                # Nueva pregunta (resetear estado)
+                pregunta_actual = texto_completo
+                opciones_actuales = []
+                opciones_marcadas = []
+                estado_actual = "enunciado"
+                pregunta_cerrada = False
+                continue
+            
+            # 2. IDENTIFICADOR DE OPCIÓN: Si empieza por letra a-e, añadir a opciones
+            if es_opcion:
+                # Extraer la letra de la opción
+                match_opcion = patron_opcion.match(texto_completo)
+                if match_opcion:
+                    letra_opcion = match_opcion.group(1).lower()
+                    
+                    # LÍMITE ESTRICTO DE OPCIONES: con max_opciones=4 solo se aceptan a, b, c, d
+                    if ord(letra_opcion) - ord('a') >= max_opciones:
+                        # Si ya tenemos todas las opciones, fusionar con la última (opción d por defecto)
+                        if len(opciones_actuales) >= max_opciones:
+                            # Fusionar el texto con la última opción
+                            opcion_limpia = limpiar_etiqueta_opcion(texto_completo)
+                            opciones_actuales[ultima] += " " + opcion_limpia
+                            # Si está marcada, también marcar la última opción
+                            if marcado_linea:
+                                opciones_marcadas[ultima] = True
+                            continue
+                    
+                    # Cambiar a estado "opciones" si aún estábamos en "enunciado"
+                    if estado_actual == "enunciado":
+                        estado_actual = "opciones"
+                        # Si no había pregunta iniciada, ignorar esta opción
+                        # (Todas las preguntas deben empezar con número)
+                        if not pregunta_actual:
+                            continue
+                    
+                    # Nueva opción - Limpiar etiqueta (a., b), etc.)
+                    opcion_limpia = limpiar_etiqueta_opcion(texto_completo)
+                    
+                    # Detectar y limpiar V/F al final de la línea de la opción
+                    # Buscar V/F al final del texto de la opción
+                    vf_match = PATRON_VF_FINAL.search(opcion_limpia)
+                    if vf_match:
+                        # En opciones múltiples, si encontramos V/F, solo limpiamos el texto
+                        opcion_limpia = opcion_limpia[:vf_match.start()].strip()
+                    
+                    opciones_actuales.append(opcion_limpia)
+                    opciones_marcadas.append(marcado_linea)
+                    
+                    # NO CERRAR AUTOMÁTICAMENTE: La opción d) no cierra la pregunta
+                    # La pregunta solo se cerrará cuando se detecte una nueva pregunta válida
+                    continue
+            
+            # 3. ACUMULACIÓN PRIORITARIA: Si ya tenemos 4 opciones (incluyendo d), acumular a la opción d)
+            # REGLA DE ORO: Todo el texto después de la opción d) se acumula a ella a menos que sea nueva pregunta válida
+            if pregunta_actual and len(opciones_actuales) == max_opciones and estado_actual == "opciones":
+                # Verificar si es una nueva pregunta válida (patrón de número)
+                es_nueva_pregunta_valida = es_pregunta
+                
+                # Si NO es nueva pregunta válida, SIEMPRE acumular a la opción d)
+                if not es_nueva_pregunta_valida:
+                    # Acumular a opción d) sin excepciones (fuera o dentro del bloque)
+                    opciones_actuales[ultima] += " " + texto_completo
+                    # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
+                    if marcado_linea:
+                        opciones_marcadas[ultima] = True
+                    # La limpieza de ruido se aplicará al guardar la pregunta final
+                    continue
+                # Si es nueva pregunta válida, continuar con la lógica de guardar pregunta anterior
+            
+            # 4. ACUMULACIÓN DE TEXTO: Captura total según estado
+            # Solo procesar si no se procesó en las secciones anteriores
+            if pregunta_actual and not pregunta_cerrada:
+                # Si ya tenemos 4 opciones, solo acumular si no es nueva pregunta válida
+                # (esto evita duplicar el procesamiento de la sección 3)
+                if estado_actual == "opciones" and len(opciones_actuales) > 0:
+                    # Ya encontramos opciones → añadir a la última opción (CAPTURA TOTAL)
+                    # Si ya tenemos 4 opciones, añadir a la última (opción d) - FUSIÓN DE HUÉRFANOS
+                    if len(opciones_actuales) >= max_opciones:
+                        # Solo acumular si no es nueva pregunta válida (ya se procesó en sección 3)
+                        if not es_pregunta:
+                            opciones_actuales[ultima] += " " + texto_completo
+                            # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
+                            if marcado_linea:
+                                opciones_marcadas[ultima] = True
+                    else:
+                        opciones_actuales[-1] += " " + texto_completo
+                        # REFUERZO DE SUBRAYADO: Si alguna parte está marcada, marcar toda la opción
+                        if marcado_linea:
+                            opciones_marcadas[-1] = True
+                else:
+                    # Aún no hay opciones → añadir al enunciado (CAPTURA TOTAL)
+                    pregunta_actual += " " + texto_completo
+        
+        if perfil is not None:
+            perfil.sumar('maquina_estados', reloj() - inicio)
+        yield preguntas_cerradas
+    
+    # Guardar última pregunta (CLASIFICACIÓN FINAL)
+    preguntas_cerradas = []
+    if pregunta_actual and not pregunta_cerrada:
+        preguntas_cerradas.append(_cerrar_pregunta(pregunta_actual, opciones_actuales, opciones_marcadas,
+                                                   max_opciones, detectar_vf))
+    yield preguntas_cerradas
+
+
+def recopilar_preguntas(lotes):
+    """
+    Reúne los lotes de (pregunta, tiene_subrayado) generados por analizar_paginas.
+    Retorna: (lista de preguntas, diccionario con índices de preguntas que tienen subrayado detectado)
+    """
+    todas_las_preguntas = []
+    subrayado_por_pregunta = {}
+    
+    for preguntas_cerradas in lotes:
+        for pregunta, tiene_subrayado in preguntas_cerradas:
+            subrayado_por_pregunta[len(todas_las_preguntas)] = tiene_subrayado
+            todas_las_preguntas.append(pregunta)
+    
+    # Normalizar: asegurar que todas las preguntas tengan un tipo asignado
+    for pregunta in todas_las_preguntas:
+        if 'tipo' not in pregunta:
+            if len(pregunta.get('opciones', [])) > 0:
+                pregunta['tipo'] = 'opcion_multiple'
+            else:
+                pregunta['tipo'] = 'V/F'
+    
+    # Ya no se reorganizan casos automáticamente - el usuario los creará y agrupará manualmente
+    return todas_las_preguntas, subrayado_por_pregunta
+
+
+def analizar_lineas(lineas):
+    """
+    Máquina de estados pregunta/opción sobre el flujo ordenado de líneas visuales.
+    lineas: iterable de tuplas (texto_linea, marcado_linea) tal y como las produce extraer_lineas_pagina.
+    
+    Retorna: (lista de preguntas, diccionario con índices de preguntas que tienen subrayado detectado)
+    """
+    return recopilar_preguntas(analizar_paginas([lineas]))
+
+
+def extraer_layout_pdf(pdf: Union[bytes, str], num_workers: Optional[int] = None, baja_memoria: bool = False,
+                       perfil: Optional[PerfilExtraccion] = None,
+                       reglas_ruido: Optional[ReglasRuidoDocumento] = None) -> List[List[tuple[str, bool]]]:
+    """
+    Etapa de maquetación (la cara): abre el PDF y retorna, por página, la lista de líneas visuales
+    (texto_linea, marcado_linea). Es todo lo que necesita analizar_layout, así que puede
+    guardarse (en la sesión o en disco, ver cache_extraccion) y re-analizarse con otros ajustes
+    sin volver a abrir el PDF. Los parámetros son los de extraer_lineas_documento.
+    """
+    return list(extraer_lineas_documento(pdf, num_workers, baja_memoria, perfil, reglas_ruido))
+
+
+def analizar_layout(paginas, perfil: Optional[PerfilExtraccion] = None,
+                    max_opciones: int = MAX_OPCIONES, detectar_vf: bool = DETECTAR_VF):
+    """
+    Etapa de análisis (la barata): máquina de estados pregunta/opción sobre una maquetación
+    (ver extraer_layout_pdf). No toca el PDF: con la maquetación ya extraída tarda milisegundos.
+    max_opciones y detectar_vf: ver analizar_paginas.
+    
+    Retorna: (lista de preguntas, diccionario con índices de preguntas que tienen subrayado detectado)
+    """
+    return recopilar_preguntas(analizar_paginas(paginas, perfil, max_opciones, detectar_vf))
+
+
+def contar_paginas_pdf(pdf: Union[bytes, str]) -> int:
+    """Retorna el número de páginas del PDF (bytes o ruta)."""
+    doc = abrir_pdf(pdf)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def _registrar_paginas(paginas, layout: list):
+    """Deja pasar las páginas de un generador guardando cada una en layout."""
+    for lineas_pagina in paginas:
+        layout.append(lineas_pagina)
+        yield lineas_pagina
+
+
+def iterar_preguntas_pdf(pdf: Union[bytes, str], num_workers: Optional[int] = None, baja_memoria: bool = False,
+                         perfil: Optional[PerfilExtraccion] = None,
+                         reglas_ruido: Optional[ReglasRuidoDocumento] = None,
+                         max_opciones: int = MAX_OPCIONES, detectar_vf: bool = DETECTAR_VF,
+                         layout: Optional[list] = None):
+    """
+    Versión incremental de extraer_texto_con_subrayado para mostrar resultados mientras se procesa.
+    
+    Genera, tras consumir cada página, una tupla (paginas_procesadas, num_paginas, preguntas_cerradas)
+    donde preguntas_cerradas es la lista de (pregunta, tiene_subrayado) terminadas hasta esa página.
+    Una pregunta se da por terminada cuando empieza la siguiente, así que la última del documento
+    llega en una tupla final con paginas_procesadas == num_paginas.
+    
+    layout: lista opcional a la que se añaden las líneas de cada página según se extraen (la
+    maquetación de extraer_layout_pdf), para re-analizar después sin abrir de nuevo el PDF.
+    """
+    num_paginas = contar_paginas_pdf(pdf)
+    paginas_procesadas = 0
+    paginas = extraer_lineas_documento(pdf, num_workers, baja_memoria, perfil, reglas_ruido)
+    if layout is not None:
+        paginas = _registrar_paginas(paginas, layout)
+    for preguntas_cerradas in analizar_paginas(paginas, perfil, max_opciones, detectar_vf):
+        paginas_procesadas = min(paginas_procesadas + 1, num_paginas)
+        yield paginas_procesadas, num_paginas, preguntas_cerradas
+
+
+def extraer_texto_con_subrayado(pdf: Union[bytes, str], num_workers: Optional[int] = None, baja_memoria: bool = False,
+                                perfil: Optional[PerfilExtraccion] = None,
+                                reglas_ruido: Optional[ReglasRuidoDocumento] = None,
+                                max_opciones: int = MAX_OPCIONES, detectar_vf: bool = DETECTAR_VF):
+    """
+    Extrae preguntas y opciones del PDF con lógica de contenedores robusta.
+    
+    LÓGICA DE CONTENEDORES:
+    - Pregunta: Empieza con patrón numérico, frase anclaje específica o texto nuevo tras cerrar pregunta anterior
+    - Captura Total: Todo el texto siguiente pertenece a la pregunta hasta que aparezca opción "a)"
+    - Opción: Una vez detectada "a)", todo el texto siguiente pertenece a esa opción hasta "b)", etc.
+    - Límite estricto: Solo se aceptan max_opciones opciones (4: a, b, c, d). La opción "e" o posteriores se fusionan con "d"
+    - Cierre automático: Después de la opción "d)", la pregunta se cierra automáticamente
+    
+    REGLAS:
+    1. NO descarta textos cortos (eliminado límite de 10 caracteres)
+    2. Filtra ruido de página (headers/footers): reglas fijas + encabezados/pies aprendidos del documento
+    3. Elimina V/F de opciones y lo usa para marcar respuesta correcta
+    4. Detecta subrayado específicamente (underline, no solo resaltado)
+    5. Detección por frase anclaje: Frases específicas fuerzan creación de nueva pregunta
+    
+    PARALELISMO:
+    - num_workers: número de procesos para la extracción por página (None = todos los núcleos)
+    - Documentos con menos de MIN_PAGINAS_PARALELO páginas se procesan en serie
+    - El resultado es idéntico al del camino serie
+    
+    MEMORIA:
+    - pdf puede ser la ruta a un archivo en lugar de sus bytes: MuPDF lo lee bajo demanda
+    - baja_memoria=True vacía la caché de MuPDF cada pocas páginas (pico de memoria plano)
+    
+    PERFILADO:
+    - perfil: PerfilExtraccion opcional que acumula tiempo y llamadas por etapa y tiempo por página
+    
+    ETAPAS:
+    - Equivale a analizar_layout(extraer_layout_pdf(...)) sin guardar la maquetación intermedia.
+      Para re-analizar el mismo PDF con otros max_opciones/detectar_vf, guardar la maquetación
+      con extraer_layout_pdf y llamar a analizar_layout.
+    
+    Retorna: (lista de preguntas, diccionario con índices de preguntas que tienen subrayado detectado)
+    """
+    paginas = extraer_lineas_documento(pdf, num_workers, baja_memoria, perfil, reglas_ruido)
+    return analizar_layout(paginas, perfil, max_opciones, detectar_vf)
@@ -0,0 +1,286 @@
+"""
+Índice (manifiesto) de la biblioteca: biblioteca/index.json.
+
+Guarda los metadatos de cada examen (título, descripción, fecha, número de preguntas) y el
+SHA del blob de su archivo, de modo que listar la biblioteca es leer un único archivo en vez
+de descargar todos los exámenes. AlmacenGithub y AlmacenLocal (almacen_biblioteca.py) lo
+mantienen al guardar y eliminar; si se desincroniza (exámenes subidos a mano, ingesta_lote.py...)
+se reconstruye con:
+
+    python indice_biblioteca.py [--repo usuario/repositorio] [--completo]
+    python indice_biblioteca.py --local biblioteca
+
+La reconstrucción solo descarga los exámenes cuyo SHA no coincide con el del índice anterior
+(--completo los descarga todos). En GitHub el token se lee de la variable GITHUB_TOKEN.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from github.GithubException import GithubException
+
+from cache_github import leer_archivo, leer_directorio, leer_blobs, olvidar
+from cliente_github import obtener_repositorio
+from examenes import CARPETA_BIBLIOTECA, decodificar_examen, decodificar_examen_flujo
+
+
+NOMBRE_INDICE = "index.json"
+RUTA_INDICE = f"{CARPETA_BIBLIOTECA}/{NOMBRE_INDICE}"
+VERSION_INDICE = 1
+
+# Archivos JSON de la carpeta que no son exámenes
+ARCHIVOS_NO_EXAMEN = {NOMBRE_INDICE, "metadata.json"}
+
+# Reintentos cuando otro proceso actualiza el índice a la vez (GitHub responde 409/422)
+REINTENTOS_CONFLICTO = 3
+
+
+def es_archivo_examen(nombre_archivo: str) -> bool:
+    """True si el archivo de biblioteca/ es un examen (JSON que no es el índice ni metadata.json)."""
+    return nombre_archivo.endswith('.json') and nombre_archivo not in ARCHIVOS_NO_EXAMEN
+
+
+def sha_blob_git(contenido: bytes) -> str:
+    """SHA del blob de git para un contenido (el mismo que GitHub devuelve como 'sha' del archivo)."""
+    return hashlib.sha1(b"blob %d\0" % len(contenido) + contenido).hexdigest()
+
+
+def entrada_indice(nombre_archivo: str, ruta: str, sha: str, examen_data: Dict) -> Dict:
+    """Entrada del índice de un examen, con los mismos campos que lista obtener_examenes_github."""
+    return {
+        'nombre_archivo': nombre_archivo,
+        'ruta': ruta,
+        'sha': sha,
+        'titulo': examen_data.get('titulo', nombre_archivo.replace('.json', '')),
+        'descripcion': examen_data.get('descripcion', 'Sin descripción'),
+        'fecha_creacion': examen_data.get('fecha_creacion', 'Fecha desconocida'),
+        'num_preguntas': examen_data.get('num_preguntas', len(examen_data.get('preguntas', [])))
+    }
+
+
+def crear_indice(entradas: Optional[List[Dict]] = None) -> Dict:
+    """Crea un índice con las entradas dadas (indexadas por nombre de archivo)."""
+    return {
+        'version': VERSION_INDICE,
+        'actualizado': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'examenes': {entrada['nombre_archivo']: entrada for entrada in entradas or []}
+    }
+
+
+def serializar_indice(indice: Dict) -> str:
+    """Convierte el índice a JSON con las claves ordenadas, para que los diffs sean legibles."""
+    return json.dumps(indice, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+
+
+def cargar_indice(texto: str) -> Dict:
+    """
+    Interpreta el JSON de un índice.
+    Lanza ValueError si no es un índice válido o es de una versión desconocida.
+    """
+    indice = json.loads(texto)
+    if not isinstance(indice, dict) or not isinstance(indice.get('examenes'), dict):
+        raise ValueError("El índice de la biblioteca no tiene el formato esperado")
+    if indice.get('version') != VERSION_INDICE:
+        raise ValueError(f"Versión del índice de la biblioteca no soportada: {indice.get('version')}")
+    return indice
+
+
+def poner_entrada(indice: Dict, entrada: Dict) -> Dict:
+    """Añade o reemplaza la entrada de un examen en el índice."""
+    indice['examenes'][entrada['nombre_archivo']] = entrada
+    indice['actualizado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return indice
+
+
+def quitar_entrada(indice: Dict, nombre_archivo: str) -> Dict:
+    """Quita la entrada de un examen del índice (si no estaba, no hace nada)."""
+    indice['examenes'].pop(nombre_archivo, None)
+    indice['actualizado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return indice
+
+
+def examenes_del_indice(indice: Dict) -> List[Dict]:
+    """Lista de exámenes del índice ordenada por fecha de creación (más recientes primero)."""
+    examenes = [dict(entrada) for entrada in indice['examenes'].values()]
+    examenes.sort(key=lambda x: x['fecha_creacion'], reverse=True)
+    return examenes
+
+
+def leer_indice_github(repo, ttl: float = 0) -> tuple[Optional[Dict], Optional[str]]:
+    """
+    Lee biblioteca/index.json del repositorio (con la caché condicional de cache_github: con
+    ttl=0 siempre se revalida, y si no cambió GitHub responde 304 sin gastar límite).
+    Retorna (indice, sha) o (None, None) si no existe o no se puede interpretar.
+    """
+    archivo = leer_archivo(repo, RUTA_INDICE, ttl)
+    if archivo is None:
+        return None, None
+    contenido, sha = archivo
+    try:
+        return cargar_indice(contenido.decode('utf-8')), sha
+    except ValueError:
+        # Índice corrupto o de otra versión: se trata como inexistente y se reconstruye
+        return None, sha
+
+
+def _escribir_indice_github(repo, indice: Dict, sha: Optional[str], mensaje: str):
+    """Crea o actualiza biblioteca/index.json (sha es el del índice leído, None si no existía)."""
+    contenido = serializar_indice(indice)
+    try:
+        if sha:
+            repo.update_file(path=RUTA_INDICE, message=mensaje, content=contenido, sha=sha)
+        else:
+            repo.create_file(path=RUTA_INDICE, message=mensaje, content=contenido)
+    finally:
+        # Que la próxima lectura de este proceso no sirva el índice anterior desde la caché
+        olvidar(repo, RUTA_INDICE)
+
+
+def reconstruir_indice_github(repo, completo: bool = False, escribir: bool = True) -> tuple[Dict, int]:
+    """
+    Reconstruye biblioteca/index.json a partir de los archivos de la carpeta.
+    Solo descarga los exámenes cuyo SHA no coincide con el del índice actual (todos si completo).
+    Con escribir=False solo lo construye en memoria, sin commit: para quien solo lee (un token
+    de solo lectura o una rama protegida no pueden escribirlo).
+    Retorna (indice, num_examenes_descargados).
+    """
+    indice_anterior, sha_indice = leer_indice_github(repo)
+    anteriores = {} if completo or indice_anterior is None else indice_anterior['examenes']
+    
+    contenido = leer_directorio(repo, CARPETA_BIBLIOTECA, ttl=0)
+    if contenido is None:
+        # La carpeta biblioteca no existe aún: índice vacío (sin escribirlo)
+        return crear_indice(), 0
+    
+    archivos = [archivo for archivo in contenido
+                if archivo.get('type') == 'file' and es_archivo_examen(archivo['name'])]
+    # Solo se descargan los exámenes nuevos o cambiados, varios a la vez
+    cambiados = [archivo for archivo in archivos
+                 if anteriores.get(archivo['name'], {}).get('sha') != archivo['sha']]
+    leidos = leer_blobs(repo, [(archivo['path'], archivo['sha']) for archivo in cambiados],
+                        procesar=decodificar_examen_flujo)
+    examenes_leidos = dict(zip((archivo['name'] for archivo in cambiados), leidos))
+    
+    entradas = []
+    descargados = 0
+    for archivo in archivos:
+        leido = examenes_leidos.get(archivo['name'])
+        if leido is None:
+            entradas.append(anteriores[archivo['name']])
+            continue
+        if isinstance(leido, Exception):
+            # Archivo que no es un examen válido o no se pudo descargar: fuera del índice
+            continue
+        examen_data, sha = leido
+        descargados += 1
+        entradas.append(entrada_indice(archivo['name'], archivo['path'], sha, examen_data))
+    
+    indice = crear_indice(entradas)
+    if indice_anterior is not None and indice_anterior['examenes'] == indice['examenes']:
+        # Sin cambios: no hace falta un commit nuevo
+        return indice_anterior, descargados
+    if not escribir:
+        return indice, descargados
+    _escribir_indice_github(repo, indice, sha_indice, "Reconstruir índice de la biblioteca")
+    return indice, descargados
+
+
+def actualizar_indice_github(repo, modificar: Callable[[Dict], Dict], mensaje: str) -> Dict:
+    """
+    Lee el índice, le aplica modificar(indice) y lo vuelve a escribir.
+    Si no existe se reconstruye desde la carpeta (que ya refleja el cambio). Si otro proceso
+    lo escribió entre la lectura y la escritura, se reintenta con el índice nuevo.
+    Retorna el índice escrito.
+    """
+    for intento in range(REINTENTOS_CONFLICTO):
+        indice, sha = leer_indice_github(repo)
+        if indice is None:
+            return reconstruir_indice_github(repo)[0]
+        indice = modificar(indice)
+        try:
+            _escribir_indice_github(repo, indice, sha, mensaje)
+            return indice
+        except GithubException as e:
+            if e.status not in (409, 422) or intento == REINTENTOS_CONFLICTO - 1:
+                raise
+    return indice
+
+
+def reconstruir_indice_local(directorio: str = CARPETA_BIBLIOTECA, completo: bool = False) -> tuple[Dict, int]:
+    """
+    Reconstruye el index.json de una carpeta local de exámenes (la salida de ingesta_lote.py o
+    una copia de trabajo del repositorio). Los SHA son los de los blobs de git, así que el índice
+    sigue siendo válido al subir la carpeta.
+    Retorna (indice, num_examenes_leidos).
+    """
+    ruta_indice = os.path.join(directorio, NOMBRE_INDICE)
+    indice_anterior = None
+    try:
+        with open(ruta_indice, encoding="utf-8") as f:
+            indice_anterior = cargar_indice(f.read())
+    except (OSError, ValueError):
+        pass
+    anteriores = {} if completo or indice_anterior is None else indice_anterior['examenes']
+    
+    entradas = []
+    leidos = 0
+    for nombre in sorted(os.listdir(directorio)):
+        ruta = os.path.join(directorio, nombre)
+        if not es_archivo_examen(nombre) or not os.path.isfile(ruta):
+            continue
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        sha = sha_blob_git(contenido)
+        anterior = anteriores.get(nombre)
+        if anterior and anterior.get('sha') == sha:
+            entradas.append(anterior)
+            continue
+        try:
+            examen_data = decodificar_examen(contenido)
+        except ValueError:
+            continue
+        leidos += 1
+        entradas.append(entrada_indice(nombre, f"{CARPETA_BIBLIOTECA}/{nombre}", sha, examen_data))
+    
+    indice = crear_indice(entradas)
+    if indice_anterior is not None and indice_anterior['examenes'] == indice['examenes']:
+        return indice_anterior, leidos
+    ruta_temporal = ruta_indice + ".tmp"
+    with open(ruta_temporal, "w", encoding="utf-8") as f:
+        f.write(serializar_indice(indice))
+    os.replace(ruta_temporal, ruta_indice)
+    return indice, leidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", default=os.environ.get("REPO_NAME"),
+                        help="Repositorio de GitHub (usuario/repositorio); por defecto $REPO_NAME")
+    parser.add_argument("--local", metavar="CARPETA", help="Reconstruir el índice de una carpeta local en vez de GitHub")
+    parser.add_argument("--completo", action="store_true", help="Volver a leer todos los exámenes aunque su SHA no cambie")
+    args = parser.parse_args()
+    
+    if args.local:
+        if not os.path.isdir(args.local):
+            parser.error(f"No existe la carpeta {args.local}")
+        indice, leidos = reconstruir_indice_local(args.local, args.completo)
+        destino = os.path.join(args.local, NOMBRE_INDICE)
+    else:
+        token = os.environ.get("GITHUB_TOKEN")
+        if not token or not args.repo:
+            parser.error("Hacen falta GITHUB_TOKEN (variable de entorno) y --repo o REPO_NAME")
+        repo = obtener_repositorio(token, args.repo)
+        indice, leidos = reconstruir_indice_github(repo, args.completo)
+        destino = f"{args.repo}:{RUTA_INDICE}"
+    
+    print(f"✅ Índice con {len(indice['examenes'])} exámenes escrito en {destino} "
+          f"({leidos} leídos, {len(indice['examenes']) - leidos} sin cambios)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
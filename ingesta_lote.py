@@ -0,0 +1,249 @@
+"""
+Ingesta por lotes: convierte una carpeta de PDFs en exámenes de la biblioteca sin pasar por Streamlit.
+
+Recorre el directorio indicado, extrae cada PDF con extraer_texto_con_subrayado en un pool de
+procesos (un PDF por proceso, en modo de baja memoria) y escribe cada examen en el formato de
+la biblioteca (JSON indentado por defecto; --formato columnar y --comprimir gzip, ver
+examenes.py). Al terminar genera un informe JSON con el número de preguntas de cada examen,
+las preguntas cuya respuesta no se detectó (para revisarlas a mano) y los encabezados/pies
+que se aprendieron y descartaron en cada PDF. El index.json de la carpeta
+de salida (ver indice_biblioteca.py) se actualiza con los exámenes escritos.
+
+Con --publicar, los exámenes escritos se publican además en el almacén de la biblioteca que
+configuren las variables de entorno (BIBLIOTECA_BACKEND, GITHUB_TOKEN, REPO_NAME..., ver
+almacen_biblioteca.py) en una sola operación: en GitHub, un único commit con todos los exámenes
+y el índice.
+
+Uso:
+    python ingesta_lote.py CARPETA_PDFS [--salida biblioteca] [--workers N] [--recursivo]
+        [--sobrescribir] [--descripcion "Importado de {archivo}"] [--informe informe_ingesta.json]
+        [--formato clasico|columnar] [--comprimir] [--publicar]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+
+from almacen_biblioteca import crear_almacen
+from extraccion_pdf import aprender_ruido_documento, extraer_texto_con_subrayado
+from examenes import (
+    CARPETA_BIBLIOTECA,
+    nombre_archivo_examen,
+    construir_examen,
+    FORMATOS_EXAMEN,
+    FORMATO_EXAMEN_POR_DEFECTO,
+    codificar_examen,
+    decodificar_examen,
+    aplanar_preguntas_con_casos,
+)
+from indice_biblioteca import reconstruir_indice_local
+
+
+def buscar_pdfs(directorio: str, recursivo: bool = False) -> List[str]:
+    """Retorna las rutas de los PDFs del directorio, ordenadas para que la salida sea reproducible."""
+    rutas = []
+    if recursivo:
+        for raiz, _, archivos in os.walk(directorio):
+            rutas.extend(os.path.join(raiz, nombre) for nombre in archivos if nombre.lower().endswith(".pdf"))
+    else:
+        for nombre in os.listdir(directorio):
+            ruta = os.path.join(directorio, nombre)
+            if nombre.lower().endswith(".pdf") and os.path.isfile(ruta):
+                rutas.append(ruta)
+    return sorted(rutas)
+
+
+def titulo_desde_archivo(ruta_pdf: str) -> str:
+    """Título del examen a partir del nombre del PDF ("Examen_Enero-2024.pdf" -> "Examen Enero-2024")."""
+    nombre = os.path.splitext(os.path.basename(ruta_pdf))[0]
+    return " ".join(nombre.replace("_", " ").split())
+
+
+def preguntas_sin_respuesta(preguntas: List[Dict], subrayado_por_pregunta: Dict[int, bool]) -> List[int]:
+    """
+    Índices (base 0) de las preguntas cuya respuesta correcta no se detectó en el PDF:
+    opción múltiple sin opción marcada y V/F sin V/F en el enunciado.
+    """
+    indices = []
+    for idx, pregunta in enumerate(preguntas):
+        if pregunta.get('tipo') == 'V/F' or len(pregunta.get('opciones', [])) == 0:
+            detectada = pregunta.get('vf_detectado_enunciado', False)
+        else:
+            detectada = subrayado_por_pregunta.get(idx, False)
+        if not detectada:
+            indices.append(idx)
+    return indices
+
+
+def procesar_pdf(ruta_pdf: str) -> Dict:
+    """
+    Extrae un PDF en un proceso auxiliar.
+    Retorna un dict con las preguntas planas y las estadísticas, o con 'error' si falla.
+    """
+    inicio = time.perf_counter()
+    try:
+        reglas_ruido = aprender_ruido_documento(ruta_pdf)
+        preguntas, subrayado_por_pregunta = extraer_texto_con_subrayado(
+            ruta_pdf, num_workers=1, baja_memoria=True, reglas_ruido=reglas_ruido
+        )
+    except Exception as e:
+        return {'pdf': ruta_pdf, 'error': f"{type(e).__name__}: {e}"}
+
+    sin_respuesta = preguntas_sin_respuesta(preguntas, subrayado_por_pregunta)
+    preguntas_planas = aplanar_preguntas_con_casos(preguntas)
+    return {
+        'pdf': ruta_pdf,
+        'preguntas': preguntas_planas,
+        'num_preguntas': len(preguntas_planas),
+        'num_opcion_multiple': sum(1 for p in preguntas_planas if p.get('tipo') == 'opcion_multiple'),
+        'num_vf': sum(1 for p in preguntas_planas if p.get('tipo') == 'V/F'),
+        'sin_respuesta': [idx + 1 for idx in sin_respuesta],  # numeración para humanos
+        'encabezados_aprendidos': [linea['ejemplo'] for linea in reglas_ruido.a_dict()['lineas']],
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def escribir_examen(resultado: Dict, directorio_salida: str, descripcion: str, sobrescribir: bool,
+                    nombres_usados: set, formato: str = FORMATO_EXAMEN_POR_DEFECTO, comprimir: bool = False) -> Dict:
+    """
+    Escribe el JSON del examen de un resultado de procesar_pdf y retorna su entrada del informe.
+    Los nombres repetidos dentro del mismo lote reciben un sufijo (_2, _3...).
+    """
+    entrada = {k: v for k, v in resultado.items() if k != 'preguntas'}
+    if 'error' in resultado:
+        entrada['estado'] = 'error'
+        return entrada
+    if not resultado['preguntas']:
+        entrada['estado'] = 'sin_preguntas'
+        return entrada
+
+    titulo = titulo_desde_archivo(resultado['pdf'])
+    nombre_base = nombre_archivo_examen(titulo)
+    nombre = nombre_base
+    sufijo = 2
+    while nombre in nombres_usados:
+        nombre = f"{nombre_base}_{sufijo}"
+        sufijo += 1
+    nombres_usados.add(nombre)
+
+    ruta_json = os.path.join(directorio_salida, f"{nombre}.json")
+    entrada['titulo'] = titulo
+    entrada['json'] = ruta_json
+    if os.path.exists(ruta_json) and not sobrescribir:
+        entrada['estado'] = 'omitido_existe'
+        return entrada
+
+    examen_data = construir_examen(titulo, descripcion.format(archivo=os.path.basename(resultado['pdf'])),
+                                   resultado['preguntas'])
+    ruta_temporal = ruta_json + ".tmp"
+    with open(ruta_temporal, "wb") as f:
+        f.write(codificar_examen(examen_data, formato, comprimir))
+    os.replace(ruta_temporal, ruta_json)
+    entrada['estado'] = 'escrito'
+    return entrada
+
+
+def publicar_examenes(examenes: List[Dict], formato: str, comprimir: bool):
+    """
+    Publica los exámenes escritos del lote en el almacén configurado por el entorno, todos en
+    una operación y con los mismos nombres de archivo. Retorna cuántos se publicaron o None si falló.
+    """
+    escritos = [entrada for entrada in examenes if entrada['estado'] == 'escrito']
+    if not escritos:
+        return 0
+    try:
+        almacen = crear_almacen(os.environ.get)
+        almacen.formato, almacen.comprimir = formato, comprimir
+        examenes_data = []
+        for entrada in escritos:
+            with open(entrada['json'], "rb") as f:
+                examenes_data.append(decodificar_examen(f.read()))
+        almacen.publicar_lote(examenes_data, [os.path.basename(entrada['json']) for entrada in escritos])
+    except Exception as e:
+        print(f"❌ No se pudieron publicar los exámenes: {e}")
+        return None
+    print(f"📤 {len(escritos)} exámenes publicados en {almacen.descripcion()}")
+    return len(escritos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directorio", help="Carpeta con los PDFs a importar")
+    parser.add_argument("--salida", default=CARPETA_BIBLIOTECA, help="Carpeta donde escribir los exámenes JSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="PDFs procesados a la vez")
+    parser.add_argument("--recursivo", action="store_true", help="Buscar PDFs también en subcarpetas")
+    parser.add_argument("--sobrescribir", action="store_true", help="Reemplazar exámenes que ya existan")
+    parser.add_argument("--descripcion", default="Importado de {archivo}",
+                        help="Descripción de cada examen ({archivo} = nombre del PDF)")
+    parser.add_argument("--informe", default="informe_ingesta.json", help="Fichero JSON con el resumen del lote")
+    parser.add_argument("--formato", choices=FORMATOS_EXAMEN, default=FORMATO_EXAMEN_POR_DEFECTO,
+                        help="Formato de los archivos de examen")
+    parser.add_argument("--comprimir", action="store_true", help="Comprimir los exámenes con gzip")
+    parser.add_argument("--publicar", action="store_true",
+                        help="Publicar los exámenes escritos en el almacén configurado (un solo commit en GitHub)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        parser.error(f"No existe la carpeta {args.directorio}")
+    rutas = buscar_pdfs(args.directorio, args.recursivo)
+    if not rutas:
+        print(f"No hay PDFs en {args.directorio}")
+        return 0
+    os.makedirs(args.salida, exist_ok=True)
+
+    inicio = time.perf_counter()
+    resultados = {}
+    workers = max(1, min(args.workers, len(rutas)))
+    # "spawn" como en extraer_lineas_documento: cada proceso abre su propio documento
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as executor:
+        futuros = {executor.submit(procesar_pdf, ruta): ruta for ruta in rutas}
+        for num, futuro in enumerate(as_completed(futuros), start=1):
+            resultado = futuro.result()
+            resultados[futuros[futuro]] = resultado
+            if 'error' in resultado:
+                print(f"[{num}/{len(rutas)}] ❌ {resultado['pdf']}: {resultado['error']}")
+            else:
+                print(f"[{num}/{len(rutas)}] {resultado['pdf']}: {resultado['num_preguntas']} preguntas, "
+                      f"{len(resultado['sin_respuesta'])} sin respuesta detectada")
+
+    # Escribir en el orden de los archivos (no en el de llegada) para que los sufijos sean reproducibles
+    nombres_usados = set()
+    examenes = [escribir_examen(resultados[ruta], args.salida, args.descripcion, args.sobrescribir, nombres_usados,
+                                args.formato, args.comprimir)
+                for ruta in rutas]
+
+    reconstruir_indice_local(args.salida)
+
+    publicados = None
+    if args.publicar:
+        publicados = publicar_examenes(examenes, args.formato, args.comprimir)
+
+    informe = {
+        'directorio': args.directorio,
+        'salida': args.salida,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'num_pdfs': len(rutas),
+        'escritos': sum(1 for e in examenes if e['estado'] == 'escrito'),
+        'errores': sum(1 for e in examenes if e['estado'] == 'error'),
+        'num_preguntas': sum(e.get('num_preguntas', 0) for e in examenes),
+        'num_sin_respuesta': sum(len(e.get('sin_respuesta', [])) for e in examenes),
+        'examenes': examenes,
+    }
+    if publicados is not None:
+        informe['publicados'] = publicados
+    with open(args.informe, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ {informe['escritos']}/{informe['num_pdfs']} exámenes escritos en {args.salida} "
+          f"({informe['num_preguntas']} preguntas, {informe['num_sin_respuesta']} sin respuesta detectada, "
+          f"{informe['errores']} errores) - informe en {args.informe}")
+    return 1 if informe['errores'] or (args.publicar and publicados is None) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
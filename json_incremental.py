@@ -0,0 +1,154 @@
+"""
+Lectura incremental de JSON a partir de trozos de texto.
+
+json.loads necesita el documento entero en memoria; leer_json_incremental lo construye a medida
+que llegan los trozos (p. ej. de una descarga por streaming), guardando solo el texto que aún
+no se ha interpretado. Cada valor que ya está entero en el texto leído se interpreta de una vez
+con el decodificador de json (en C); los objetos y listas que no caben (hasta profundidad
+niveles) se recorren elemento a elemento. Basta con que un elemento (una pregunta, un
+enunciado) quepa en memoria como texto, no el archivo entero.
+"""
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+
+PROFUNDIDAD_INCREMENTAL = 4
+
+_ESPACIOS = re.compile(r'[ \t\n\r]*')
+_SEPARADORES = frozenset(' \t\n\r,:]}')
+_decodificador = json.JSONDecoder()
+
+
+class _LectorJson:
+    __slots__ = ('_trozos', 'texto', 'pos', 'agotado')
+    
+    def __init__(self, trozos: Iterator[str]):
+        self._trozos = trozos
+        self.texto = ""
+        self.pos = 0
+        self.agotado = False
+    
+    def _mas(self, minimo: int = 1) -> bool:
+        """
+        Añade al texto pendiente (descartando lo ya interpretado) trozos hasta al menos minimo
+        caracteres más. Retorna False si el documento ya se había leído entero.
+        """
+        nuevos = []
+        leidos = 0
+        for trozo in self._trozos:
+            nuevos.append(trozo)
+            leidos += len(trozo)
+            if leidos >= minimo:
+                break
+        else:
+            self.agotado = True
+        if leidos:
+            self.texto = self.texto[self.pos:] + "".join(nuevos)
+            self.pos = 0
+        return leidos > 0
+    
+    def caracter(self) -> str:
+        """Siguiente carácter que no es espacio (sin consumirlo), o '' al final del documento."""
+        while True:
+            self.pos = _ESPACIOS.match(self.texto, self.pos).end()
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self._mas():
+                return ""
+    
+    def _esperar(self, esperado: str):
+        caracter = self.caracter()
+        if caracter != esperado:
+            raise ValueError(f"JSON inválido: se esperaba '{esperado}' y hay '{caracter}' (posición {self.pos})")
+        self.pos += 1
+    
+    def valor(self, profundidad: int) -> Any:
+        caracter = self.caracter()
+        if profundidad > 0 and caracter in ('{', '['):
+            try:
+                # Si ya está entero en el texto leído, de una vez (un contenedor no puede quedar
+                # cortado y parecer completo: termina en '}' o ']')
+                valor, self.pos = _decodificador.raw_decode(self.texto, self.pos)
+                return valor
+            except json.JSONDecodeError:
+                pass
+            return self._objeto(profundidad) if caracter == '{' else self._lista(profundidad)
+        return self._hoja()
+    
+    def _hoja(self) -> Any:
+        self.caracter()
+        while True:
+            try:
+                valor, fin = _decodificador.raw_decode(self.texto, self.pos)
+                # Un número puede estar cortado entre dos trozos ("2." + "5"): solo vale si le
+                # sigue un separador
+                if self.agotado or (fin < len(self.texto) and self.texto[fin] in _SEPARADORES):
+                    self.pos = fin
+                    return valor
+            except json.JSONDecodeError:
+                if self.agotado:
+                    raise
+            # Crecer al menos al doble: un valor largo no se vuelve a interpretar en cada trozo
+            self._mas(len(self.texto) - self.pos)
+    
+    def _objeto(self, profundidad: int) -> dict:
+        self.pos += 1
+        resultado = {}
+        if self.caracter() == '}':
+            self.pos += 1
+            return resultado
+        while True:
+            if self.caracter() != '"':
+                raise ValueError(f"JSON inválido: se esperaba una clave (posición {self.pos})")
+            clave = self._hoja()
+            self._esperar(':')
+            resultado[clave] = self.valor(profundidad - 1)
+            caracter = self.caracter()
+            self.pos += 1
+            if caracter == '}':
+                return resultado
+            if caracter != ',':
+                raise ValueError(f"JSON inválido: se esperaba ',' o '}}' y hay '{caracter}'")
+    
+    def _lista(self, profundidad: int) -> list:
+        self.pos += 1
+        resultado = []
+        if self.caracter() == ']':
+            self.pos += 1
+            return resultado
+        while True:
+            resultado.append(self.valor(profundidad - 1))
+            caracter = self.caracter()
+            self.pos += 1
+            if caracter == ']':
+                return resultado
+            if caracter != ',':
+                raise ValueError(f"JSON inválido: se esperaba ',' o ']' y hay '{caracter}'")
+
+
+def texto_utf8(trozos: Iterable[bytes]) -> Iterator[str]:
+    """Decodifica trozos de bytes UTF-8 (un carácter puede quedar partido entre dos trozos)."""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    for trozo in trozos:
+        texto = decodificador.decode(trozo)
+        if texto:
+            yield texto
+    final = decodificador.decode(b"", final=True)
+    if final:
+        yield final
+
+
+def leer_json_incremental(trozos: Iterable[str], profundidad: int = PROFUNDIDAD_INCREMENTAL) -> Any:
+    """
+    Interpreta un documento JSON que llega en trozos de texto (mismo resultado que json.loads).
+    Lanza ValueError si no es JSON válido o tiene contenido después del documento.
+    """
+    lector = _LectorJson(iter(trozos))
+    if lector.caracter() == "":
+        raise ValueError("JSON vacío")
+    resultado = lector.valor(profundidad)
+    if lector.caracter() != "":
+        raise ValueError(f"JSON inválido: contenido después del documento (posición {lector.pos})")
+    return resultado
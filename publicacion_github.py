@@ -0,0 +1,147 @@
+"""
+Publicación y eliminación de exámenes en GitHub con un único commit (API de datos de git).
+
+En vez de un create_file/update_file por examen (cada uno su commit, más el del índice), se
+construye un árbol nuevo sobre el del último commit de la rama con todos los exámenes y el
+biblioteca/index.json actualizado, se crea un commit y se avanza la rama. El número de
+peticiones no depende de cuántos exámenes se publiquen:
+
+    índice (condicional) -> get_branch -> POST git/trees -> POST git/commits -> PATCH git/refs
+
+Los exámenes de texto van dentro del árbol; los comprimidos (binarios) necesitan además un
+create_git_blob cada uno, que se hacen en paralelo. Si otro proceso avanza la rama entre medias,
+la actualización de la referencia falla (no es fast-forward) y se repite todo con la rama nueva.
+
+Eliminar sigue el mismo camino: el árbol nuevo quita el examen (elemento sin sha) y lleva el
+índice sin su entrada, así que nunca queda un examen borrado con el índice sin actualizar.
+"""
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from github.GithubException import GithubException
+from github.InputGitTreeElement import InputGitTreeElement
+
+from cache_github import MAX_DESCARGAS_CONCURRENTES, olvidar, recordar_blob
+from examenes import CARPETA_BIBLIOTECA
+from indice_biblioteca import (
+    RUTA_INDICE,
+    REINTENTOS_CONFLICTO,
+    entrada_indice,
+    poner_entrada,
+    quitar_entrada,
+    serializar_indice,
+    sha_blob_git,
+    leer_indice_github,
+    reconstruir_indice_github,
+)
+
+
+MODO_ARCHIVO = "100644"
+
+
+def _elemento_arbol(repo, ruta: str, contenido: bytes) -> InputGitTreeElement:
+    """Elemento del árbol para un archivo: el texto va en línea, lo binario como blob aparte."""
+    try:
+        return InputGitTreeElement(ruta, MODO_ARCHIVO, "blob", content=contenido.decode('utf-8'))
+    except UnicodeDecodeError:
+        blob = repo.create_git_blob(base64.b64encode(contenido).decode('ascii'), "base64")
+        return InputGitTreeElement(ruta, MODO_ARCHIVO, "blob", sha=blob.sha)
+
+
+def _elementos_arbol(repo, archivos: List[tuple[str, bytes]]) -> List[InputGitTreeElement]:
+    """Elementos de todos los archivos (los blobs binarios se crean varios a la vez)."""
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_DESCARGAS_CONCURRENTES, len(archivos)))) as executor:
+        return list(executor.map(lambda archivo: _elemento_arbol(repo, *archivo), archivos))
+
+
+def _confirmar_con_indice(repo, rama: str, mensaje: str, modificar_indice: Callable[[Dict], None],
+                          elementos_archivos: Callable[[object], List[InputGitTreeElement]]):
+    """
+    Crea un commit sobre la rama con los elementos_archivos(último commit) y el índice modificado
+    por modificar_indice, y avanza la rama solo si es fast-forward. Si otro proceso avanzó la
+    rama entre medias, se repite todo sobre la nueva (hasta REINTENTOS_CONFLICTO veces).
+    """
+    for intento in range(REINTENTOS_CONFLICTO):
+        indice, _ = leer_indice_github(repo)
+        if indice is None:
+            # Sin índice todavía: se construye en memoria desde la carpeta y va en este mismo
+            # commit (los exámenes que ya estaban en la caché de blobs no se vuelven a descargar)
+            indice, _ = reconstruir_indice_github(repo, escribir=False)
+        modificar_indice(indice)
+        
+        ultimo_commit = repo.get_branch(rama).commit
+        elementos = elementos_archivos(ultimo_commit) + [
+            InputGitTreeElement(RUTA_INDICE, MODO_ARCHIVO, "blob", content=serializar_indice(indice))
+        ]
+        arbol = repo.create_git_tree(elementos, base_tree=ultimo_commit.commit.tree)
+        # POST directo en vez de create_git_commit: el GitCommit que trae get_branch no incluye su
+        # sha y PyGithub lo completaría con otra petición
+        _, commit = repo.requester.requestJsonAndCheck("POST", f"{repo.url}/git/commits", input={
+            "message": mensaje, "tree": arbol.sha, "parents": [ultimo_commit.sha]})
+        try:
+            # Solo fast-forward: si la rama avanzó desde get_branch, se reintenta sobre la nueva
+            repo.requester.requestJsonAndCheck("PATCH", f"{repo.url}/git/refs/heads/{rama}",
+                                               input={"sha": commit["sha"], "force": False})
+            return
+        except GithubException as e:
+            if e.status not in (409, 422) or intento == REINTENTOS_CONFLICTO - 1:
+                raise
+        finally:
+            olvidar(repo, RUTA_INDICE)
+
+
+def publicar_examenes_github(repo, examenes: List[tuple[str, bytes, Dict]], mensaje: Optional[str] = None,
+                             rama: Optional[str] = None) -> List[Dict]:
+    """
+    Publica en un solo commit los exámenes (nombre_archivo, contenido codificado, examen_data)
+    en biblioteca/ junto con el índice actualizado. Los que ya existen se reemplazan.
+    Retorna la entrada de índice de cada examen, en el mismo orden.
+    """
+    if not examenes:
+        return []
+    rama = rama or repo.default_branch
+    if mensaje is None:
+        mensaje = (f"Agregar examen: {examenes[0][2].get('titulo', examenes[0][0])}" if len(examenes) == 1
+                   else f"Agregar {len(examenes)} exámenes")
+    
+    entradas = [entrada_indice(nombre, f"{CARPETA_BIBLIOTECA}/{nombre}", sha_blob_git(contenido), examen_data)
+                for nombre, contenido, examen_data in examenes]
+    # Los blobs no dependen de la rama: se crean una vez aunque haya que reintentar el commit
+    elementos_examenes = _elementos_arbol(repo, [(entrada['ruta'], contenido)
+                                                 for entrada, (_, contenido, _) in zip(entradas, examenes)])
+    
+    def poner_entradas(indice: Dict):
+        for entrada in entradas:
+            poner_entrada(indice, entrada)
+    
+    _confirmar_con_indice(repo, rama, mensaje, poner_entradas, lambda _ultimo_commit: elementos_examenes)
+    
+    # Lo publicado ya está en la caché (y en el espejo en disco): cargarlo no hace ninguna petición
+    for entrada, (_, contenido, _) in zip(entradas, examenes):
+        recordar_blob(entrada['sha'], contenido)
+    return entradas
+
+
+def eliminar_examen_github(repo, ruta: str, sha: Optional[str] = None, mensaje: Optional[str] = None,
+                           rama: Optional[str] = None):
+    """
+    Elimina de la rama el examen en ruta y su entrada del índice en un solo commit.
+    Si se da sha y el examen de la rama ya no es ese (cambió desde que se listó), lanza ValueError.
+    Lanza GithubException (404) si el examen no existe.
+    """
+    rama = rama or repo.default_branch
+    nombre_archivo = ruta.rsplit("/", 1)[-1]
+    if mensaje is None:
+        mensaje = f"Eliminar examen: {nombre_archivo}"
+    
+    def elementos_archivos(ultimo_commit) -> List[InputGitTreeElement]:
+        # Se comprueba contra el commit sobre el que se construye el árbol (también al reintentar)
+        sha_actual = repo.get_contents(ruta, ref=ultimo_commit.sha).sha
+        if sha is not None and sha_actual != sha:
+            raise ValueError(f"{ruta} cambió desde que se listó")
+        # Un elemento con sha nulo quita la ruta del árbol base
+        return [InputGitTreeElement(ruta, MODO_ARCHIVO, "blob", sha=None)]
+    
+    _confirmar_con_indice(repo, rama, mensaje, lambda indice: quitar_entrada(indice, nombre_archivo),
+                          elementos_archivos)
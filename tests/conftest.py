@@ -0,0 +1,26 @@
+"""
+Configuración común de las pruebas: los módulos del repositorio se importan desde la raíz,
+igual que en la app, y las implementaciones de referencia desde benchmarks/.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for ruta in (RAIZ_REPO, os.path.join(RAIZ_REPO, "benchmarks")):
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos")
+
+
+def cargar_corpus_lineas() -> list:
+    """
+    Corpus fijo de líneas: enunciados, opciones y textos de caso del examen de biblioteca/ más
+    encabezados y pies reales (benchmark_ruido.LINEAS_RUIDO_MUESTRA), congelado en datos/ para
+    que no cambie al añadir exámenes a la biblioteca.
+    """
+    with open(os.path.join(DIRECTORIO_DATOS, "corpus_lineas.json"), encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,67 @@
+"""
+Agrupado de duplicadas (IndiceDuplicados.grupos) con firmas y bandas fijadas a mano, con y
+sin NumPy: todos los pares de una cubeta se verifican y cada grupo se forma alrededor de un
+representante.
+"""
+import pytest
+
+import duplicados
+from duplicados import NUM_BANDAS, NUM_PERMUTACIONES, IndiceDuplicados
+
+# Firmas: A y B iguales en 50 valores (similares), B y C en 44 (similares), A y C en 22 (no)
+FIRMA_A = (0,) * NUM_PERMUTACIONES
+FIRMA_B = (0,) * 50 + (1,) * (NUM_PERMUTACIONES - 50)
+FIRMA_C = (0,) * 22 + (1,) * (NUM_PERMUTACIONES - 22)
+FIRMA_X = tuple(range(100, 100 + NUM_PERMUTACIONES))
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def motor(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(duplicados, 'np', None)
+    return request.param
+
+
+def _indice(firmas, banda_compartida=True):
+    """IndiceDuplicados con esas firmas; todas comparten la banda 0 y el resto de bandas son únicas."""
+    bandas = [[7 if banda == 0 and banda_compartida else 1000 * posicion + banda for banda in range(NUM_BANDAS)]
+              for posicion in range(len(firmas))]
+    indice = IndiceDuplicados()
+    indice.claves = list(range(len(firmas)))
+    if duplicados.np is not None:
+        np = duplicados.np
+        indice.firmas = np.array(firmas, dtype=np.uint64)
+        indice.bandas = np.array(bandas, dtype=np.uint64)
+        indice.con_texto = np.ones(len(firmas), dtype=bool)
+    else:
+        indice.firmas, indice.bandas, indice.con_texto = list(firmas), bandas, [True] * len(firmas)
+    return indice
+
+
+def test_compara_pares_no_consecutivos_de_una_cubeta(motor):
+    # La cubeta queda [A, X, A']: A y A' no son vecinas, pero son duplicadas
+    assert _indice([FIRMA_A, FIRMA_X, FIRMA_A]).grupos() == [[0, 2]]
+
+
+def test_grupos_no_encadenan_similitudes(motor):
+    # A~B y B~C, pero A no se parece a C: C no entra en el grupo de A (ni forma uno con B)
+    assert _indice([FIRMA_A, FIRMA_B, FIRMA_C]).grupos() == [[0, 1]]
+
+
+def test_cubetas_grandes_acotadas(motor):
+    # Muchas copias de la misma pregunta en una cubeta: un solo grupo con todas
+    num = duplicados.MAX_TAM_CUBETA * 3
+    assert _indice([FIRMA_A] * num).grupos() == [list(range(num))]
+
+
+def test_indices_sin_duplicados_conserva_el_representante():
+    preguntas = [
+        {'pregunta': "1. ¿Cuál es el objetivo principal de la segmentación del mercado en marketing?",
+         'opciones': ["Agrupar clientes", "Subir precios", "Reducir costes", "Ninguna"]},
+        {'pregunta': "2. ¿Qué es el posicionamiento de una marca?", 'opciones': ["Un lugar", "Una imagen"]},
+        {'pregunta': "7. ¿Cuál es el objetivo principal de la segmentación del mercado en marketing?",
+         'opciones': ["Agrupar clientes", "Subir precios", "Reducir costes", "Ninguna"]},
+    ]
+    assert duplicados.indices_sin_duplicados(preguntas) == [0, 1]
@@ -0,0 +1,33 @@
+"""
+La extracción en paralelo (varios procesos por rangos de páginas) devuelve exactamente lo
+mismo que el camino serie, sobre un examen sintético fijo de benchmark_extraccion.
+"""
+import pytest
+
+from benchmark_extraccion import generar_pdf_examen
+from extraccion_pdf import MIN_PAGINAS_PARALELO, extraer_layout_pdf, extraer_texto_con_subrayado
+
+NUM_PAGINAS = MIN_PAGINAS_PARALELO + 4
+
+
+@pytest.fixture(scope="module")
+def examen():
+    return generar_pdf_examen(NUM_PAGINAS, semilla=11)
+
+
+def test_paralelo_igual_que_serie(examen):
+    pdf, resumen = examen
+    serie = extraer_texto_con_subrayado(pdf, num_workers=1)
+    paralelo = extraer_texto_con_subrayado(pdf, num_workers=2)
+    assert paralelo == serie
+    assert len(serie[0]) == resumen["preguntas"]
+
+
+def test_layout_paralelo_igual_que_serie(examen, tmp_path):
+    pdf, _ = examen
+    ruta = tmp_path / "examen.pdf"
+    ruta.write_bytes(pdf)
+    serie = extraer_layout_pdf(pdf, num_workers=1)
+    assert len(serie) == NUM_PAGINAS
+    # Por ruta y con baja_memoria, como la app con PDFs grandes
+    assert extraer_layout_pdf(str(ruta), num_workers=2, baja_memoria=True) == serie
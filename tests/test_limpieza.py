@@ -0,0 +1,27 @@
+"""
+Las funciones de limpieza de extraccion_pdf devuelven exactamente lo mismo que las
+implementaciones originales (benchmark_limpieza.PARES) sobre el corpus fijo: todas las
+líneas tal cual y una muestra con todas las combinaciones de ruido de página.
+"""
+import pytest
+
+import extraccion_pdf
+from benchmark_limpieza import PARES, generar_corpus
+from benchmark_ruido import LINEAS_RUIDO_MUESTRA
+from conftest import cargar_corpus_lineas
+
+# Una de cada PASO_MUESTRA líneas recibe los 136 pares prefijo/sufijo (con todas tardaría minutos)
+PASO_MUESTRA = 6
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    lineas = cargar_corpus_lineas()
+    return lineas + generar_corpus(lineas[::PASO_MUESTRA] + LINEAS_RUIDO_MUESTRA)
+
+
+@pytest.mark.parametrize("nombre, referencia", PARES, ids=[nombre for nombre, _ in PARES])
+def test_misma_salida_que_la_referencia(corpus, nombre, referencia):
+    funcion = getattr(extraccion_pdf, nombre)
+    distintas = [texto for texto in corpus if funcion(texto) != referencia(texto)]
+    assert distintas == []
@@ -0,0 +1,48 @@
+"""
+Los dos motores de agrupado en líneas visuales (python y numpy) devuelven el mismo orden y
+los mismos rangos, sobre las páginas de un examen sintético y sobre spans aleatorios con Y
+muy próximas o empatadas (los casos en que la Y de referencia de la línea va avanzando).
+"""
+import random
+
+import fitz
+import pytest
+
+from benchmark_extraccion import generar_pdf_examen
+from extraccion_pdf import (TOLERANCIA_Y, SpansPagina, _agrupar_lineas_indices_numpy,
+                            _agrupar_lineas_indices_python, extraer_spans_pagina)
+
+pytest.importorskip("numpy")
+
+
+def _mismo_resultado(spans: SpansPagina) -> bool:
+    orden_python, rangos_python = _agrupar_lineas_indices_python(spans)
+    orden_numpy, rangos_numpy = _agrupar_lineas_indices_numpy(spans)
+    return (list(orden_python), rangos_python) == (list(orden_numpy), rangos_numpy)
+
+
+def _spans_aleatorios(rng: random.Random, num: int, paso_y: float) -> SpansPagina:
+    spans = SpansPagina()
+    for i in range(num):
+        spans.textos.append(str(i))
+        # Y en una rejilla de paso_y (empates exactos) más algo de ruido ocasional
+        spans.ys.append(rng.randrange(0, 40) * paso_y + (rng.random() if rng.random() < 0.3 else 0.0))
+        spans.xs.append(float(rng.randrange(0, 6) * 50))
+        spans.marcados.append(0)
+    return spans
+
+
+def test_mismo_resultado_en_paginas_de_examen():
+    pdf, _ = generar_pdf_examen(6, semilla=3)
+    doc = fitz.open(stream=pdf, filetype="pdf")
+    try:
+        assert all(_mismo_resultado(extraer_spans_pagina(page)) for page in doc)
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize("paso_y", [0.0, 1.0, TOLERANCIA_Y / 2, TOLERANCIA_Y, TOLERANCIA_Y + 0.5, 12.0])
+def test_mismo_resultado_con_y_proximas_o_empatadas(paso_y):
+    rng = random.Random(int(paso_y * 10))
+    for num in (0, 1, 2, 7, 60, 400):
+        assert _mismo_resultado(_spans_aleatorios(rng, num, paso_y)), (num, paso_y)
@@ -0,0 +1,77 @@
+"""
+Encabezados y pies aprendidos por frecuencia (aprender_ruido_documento): se descartan los
+que se repiten a la misma altura, pero nunca las preguntas ni las opciones, aunque se
+repitan en la franja de margen de todas las páginas.
+"""
+import fitz
+
+import extraccion_pdf
+from extraccion_pdf import aprender_ruido_documento, extraer_texto_con_subrayado, huella_linea
+
+NUM_PAGINAS = 10
+TAM_FUENTE = 9
+ALTO_LINEA = 11
+ENCABEZADO = "Universidad de Prueba - Examen final de Marketing"
+OPCION_REPETIDA = "d) Todas las anteriores son correctas"
+
+
+def _pregunta(page, numero: int, y: float, marcar_d: bool = False) -> float:
+    """Escribe una pregunta con cuatro opciones a partir de y (la d es OPCION_REPETIDA)."""
+    lineas = [f"{numero}. Pregunta numero {numero} sobre el mercado",
+              "a) El precio", "b) El producto", "c) La distribución", OPCION_REPETIDA]
+    for texto in lineas:
+        page.insert_text((50, y), texto, fontsize=TAM_FUENTE)
+        if marcar_d and texto == OPCION_REPETIDA:
+            ancho = fitz.get_text_length(texto, fontsize=TAM_FUENTE)
+            page.draw_line((50, y + 2), (50 + ancho, y + 2), width=0.6)
+        y += ALTO_LINEA
+    return y
+
+
+def _pdf_con_opcion_repetida_en_margenes() -> bytes:
+    """
+    Tres preguntas por página: una entera en la franja superior, otra en medio y otra entera
+    en la inferior (con la d subrayada en las páginas pares), más un encabezado y un pie fijos.
+    """
+    doc = fitz.open()
+    for num_pagina in range(1, NUM_PAGINAS + 1):
+        page = doc.new_page()
+        page.insert_text((40, 30), ENCABEZADO, fontsize=8)
+        page.insert_text((40, 825), f"Página {num_pagina} de {NUM_PAGINAS}", fontsize=8)
+        base = 3 * (num_pagina - 1)
+        _pregunta(page, base + 1, 60)
+        _pregunta(page, base + 2, 400)
+        _pregunta(page, base + 3, 740, marcar_d=num_pagina % 2 == 0)
+    contenido = doc.tobytes()
+    doc.close()
+    return contenido
+
+
+def test_huella_solo_normaliza_numeros_de_pagina():
+    assert huella_linea("Página 7 de 20") == huella_linea("Página  8 de 20")
+    assert huella_linea("Tema 3 - P139") != huella_linea("Tema 3 - P140")
+    assert huella_linea("12. Pregunta") != huella_linea("13. Pregunta")
+
+
+def test_no_aprende_preguntas_ni_opciones_repetidas_en_los_margenes():
+    reglas = aprender_ruido_documento(_pdf_con_opcion_repetida_en_margenes())
+    ejemplos = [linea['ejemplo'] for linea in reglas.a_dict()['lineas']]
+    assert ENCABEZADO in ejemplos
+    assert any(ejemplo.startswith("Página") for ejemplo in ejemplos)
+    assert not any(extraccion_pdf.es_linea_contenido(ejemplo) for ejemplo in ejemplos)
+
+
+def test_aprender_ruido_no_pierde_opciones_ni_respuestas(monkeypatch):
+    pdf = _pdf_con_opcion_repetida_en_margenes()
+    monkeypatch.setattr(extraccion_pdf, 'APRENDER_RUIDO_DOCUMENTO', True)
+    preguntas, _ = extraer_texto_con_subrayado(pdf, num_workers=1)
+
+    assert len(preguntas) == 3 * NUM_PAGINAS
+    assert all(len(pregunta['opciones']) == 4 for pregunta in preguntas)
+    assert all(pregunta['opciones'][3] == OPCION_REPETIDA[3:] for pregunta in preguntas)
+    # Las d subrayadas de la franja inferior siguen siendo la respuesta correcta
+    marcadas = [pregunta for pregunta in preguntas if pregunta.get('correcta') == 3]
+    assert len(marcadas) == NUM_PAGINAS // 2
+    # El encabezado aprendido no se cuela en ninguna pregunta
+    assert not any(ENCABEZADO in pregunta['pregunta'] or ENCABEZADO in " ".join(pregunta['opciones'])
+                   for pregunta in preguntas)
@@ -0,0 +1,27 @@
+"""
+El clasificador compilado de ruido de página (es_ruido_pagina) toma las mismas decisiones
+que la implementación original (benchmark_ruido.es_ruido_pagina_referencia).
+"""
+from benchmark_ruido import LINEAS_RUIDO_MUESTRA, es_ruido_pagina_referencia
+from conftest import cargar_corpus_lineas
+from extraccion_pdf import es_ruido_pagina
+
+
+def test_mismas_decisiones_que_la_referencia_en_el_corpus():
+    lineas = cargar_corpus_lineas()
+    distintas = [linea for linea in lineas if es_ruido_pagina(linea) != es_ruido_pagina_referencia(linea)]
+    assert distintas == []
+
+
+def test_variantes_de_mayusculas_y_espacios():
+    variantes = []
+    for linea in cargar_corpus_lineas()[:200] + LINEAS_RUIDO_MUESTRA:
+        variantes += [linea.upper(), linea.lower(), "  " + linea + "  ", linea.replace(" ", "\t")]
+    distintas = [linea for linea in variantes if es_ruido_pagina(linea) != es_ruido_pagina_referencia(linea)]
+    assert distintas == []
+
+
+def test_encabezados_conocidos_son_ruido():
+    assert all(es_ruido_pagina(linea) for linea in LINEAS_RUIDO_MUESTRA if linea.strip())
+    assert es_ruido_pagina("")
+    assert not es_ruido_pagina("1. Con relación a la política de fijación de precios de una empresa:")